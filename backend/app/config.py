@@ -14,9 +14,111 @@ class Settings(BaseSettings):
     
     # Database settings
     database_echo: bool = os.getenv("DATABASE_ECHO", "False").lower() == "true"
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
     
     # OpenAI settings
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    # Optional OpenAI-compatible endpoint, e.g. a local model server or fake_llm_server.py
+    openai_base_url: str | None = os.getenv("OPENAI_BASE_URL") or None
+
+    # LLM backends and routing
+    # Comma-separated name=base_url entries, e.g. "primary=default,backup=http://10.0.0.5:8000/v1,dev=local://".
+    # Empty uses a single OpenAI backend built from the settings above.
+    llm_backends: str = os.getenv("LLM_BACKENDS", "")
+    llm_model: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    llm_first_token_timeout_seconds: float = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT_SECONDS", "15"))
+    llm_request_timeout_seconds: float = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "30"))
+    # Circuit breaker: consecutive failures that open a backend's circuit, and seconds before a probe
+    llm_failure_threshold: int = int(os.getenv("LLM_FAILURE_THRESHOLD", "3"))
+    llm_failure_cooldown_seconds: float = float(os.getenv("LLM_FAILURE_COOLDOWN_SECONDS", "30"))
+    llm_explore_ratio: float = float(os.getenv("LLM_EXPLORE_RATIO", "0.05"))
+    # Connection pool shared by OpenAI-compatible backends; HTTP/2 needs the h2 package.
+    # The read timeout also bounds the gap between streamed chunks
+    llm_http_max_connections: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+    llm_http_max_keepalive_connections: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    llm_http_keepalive_expiry_seconds: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+    llm_http2: bool = os.getenv("LLM_HTTP2", "False").lower() == "true"
+    llm_connect_timeout_seconds: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+    llm_read_timeout_seconds: float = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "60"))
+    # Retries after every backend failed retryably: full-jitter exponential backoff, and at
+    # most ratio retries per request plus min_per_second so retries cannot multiply an outage
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    llm_retry_base_delay_seconds: float = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.25"))
+    llm_retry_max_delay_seconds: float = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "4"))
+    llm_retry_budget_ratio: float = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.2"))
+    llm_retry_budget_min_per_second: float = float(os.getenv("LLM_RETRY_BUDGET_MIN_PER_SECOND", "1"))
+
+    # LLM scheduler: concurrent upstream calls, lane weights when calls queue, per-user
+    # request budget (burst plus sustained rate, 0 disables) and how long a call may queue
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    llm_lane_weights: str = os.getenv("LLM_LANE_WEIGHTS", "admin=4,interactive=3,background=1")
+    llm_user_burst: int = int(os.getenv("LLM_USER_BURST", "20"))
+    llm_user_requests_per_minute: float = float(os.getenv("LLM_USER_REQUESTS_PER_MINUTE", "60"))
+    llm_max_queued: int = int(os.getenv("LLM_MAX_QUEUED", "500"))
+    llm_queue_deadline_seconds: float = float(os.getenv("LLM_QUEUE_DEADLINE_SECONDS", "10"))
+    llm_background_queue_deadline_seconds: float = float(os.getenv("LLM_BACKGROUND_QUEUE_DEADLINE_SECONDS", "60"))
+
+    # Context window settings (prompt history sent with each chat turn)
+    context_max_tokens: int = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+    context_max_messages: int = int(os.getenv("CONTEXT_MAX_MESSAGES", "200"))
+    tokenizer_encoding: str = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+    # Background title generation queue
+    title_queue_workers: int = int(os.getenv("TITLE_QUEUE_WORKERS", "4"))
+    title_queue_max_size: int = int(os.getenv("TITLE_QUEUE_MAX_SIZE", "1000"))
+    title_queue_max_retries: int = int(os.getenv("TITLE_QUEUE_MAX_RETRIES", "2"))
+    title_queue_retry_delay_seconds: float = float(os.getenv("TITLE_QUEUE_RETRY_DELAY_SECONDS", "1.0"))
+
+    # Streaming persistence settings (write-behind flush policy for assistant replies)
+    stream_flush_interval_seconds: float = float(os.getenv("STREAM_FLUSH_INTERVAL_SECONDS", "1.0"))
+    stream_flush_chars: int = int(os.getenv("STREAM_FLUSH_CHARS", "512"))
+
+    # Chat WebSocket: seconds to send the auth frame, concurrent replies per socket and
+    # outgoing frames buffered per socket before generations wait for the client
+    ws_auth_timeout_seconds: float = float(os.getenv("WS_AUTH_TIMEOUT_SECONDS", "10"))
+    ws_max_active_generations: int = int(os.getenv("WS_MAX_ACTIVE_GENERATIONS", "4"))
+    ws_send_queue_size: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+
+    # Resumable generations: replies kept for Last-Event-ID resume after they finish,
+    # how many are kept at most, and deltas buffered per reply
+    generation_buffer_ttl_seconds: float = float(os.getenv("GENERATION_BUFFER_TTL_SECONDS", "300"))
+    generation_buffer_max_entries: int = int(os.getenv("GENERATION_BUFFER_MAX_ENTRIES", "1000"))
+    generation_buffer_max_events: int = int(os.getenv("GENERATION_BUFFER_MAX_EVENTS", "4096"))
+    # Seconds an unfinished reply keeps generating with no client attached before it is cancelled
+    generation_abandon_grace_seconds: float = float(os.getenv("GENERATION_ABANDON_GRACE_SECONDS", "10"))
+
+    # Exact-match response cache for repeated prompts (off by default: replies are not re-sampled)
+    response_cache_enabled: bool = os.getenv("RESPONSE_CACHE_ENABLED", "False").lower() == "true"
+    response_cache_ttl_seconds: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    response_cache_max_entries: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    response_cache_max_chars: int = int(os.getenv("RESPONSE_CACHE_MAX_CHARS", "20000"))
+
+    # Rows fetched per server-side cursor batch when exporting conversations
+    export_batch_size: int = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+    # Messages written per transaction by the bulk conversation importer
+    import_batch_size: int = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+    # Password hashing: the first scheme hashes new passwords, the others are still accepted.
+    # Hashes in an older scheme or with a different cost are upgraded on the next login.
+    password_hash_schemes: str = os.getenv("PASSWORD_HASH_SCHEMES", "bcrypt")
+    password_bcrypt_rounds: int = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+    password_pbkdf2_rounds: int = int(os.getenv("PASSWORD_PBKDF2_ROUNDS", "600000"))
+    # Dedicated hashing processes (0 = use the shared threadpool) and how many more calls may wait
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    password_hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+    # Authenticated-principal cache (skips the user lookup on every request)
+    principal_cache_ttl_seconds: float = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+    principal_cache_max_entries: int = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+    token_cache_max_entries: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+    # Bearer token a Prometheus scraper sends to read /metrics; admins can always read it
+    metrics_token: str = os.getenv("METRICS_TOKEN", "")
 
     class Config:
         env_file = '.env'
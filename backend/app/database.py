@@ -1,25 +1,133 @@
-from sqlalchemy.engine import create_engine
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from sqlalchemy import create_engine
-from .config import settings 
+from .config import settings
+from .services.metrics import instrument_engine
 
-engine = create_engine(settings.database_url, echo=settings.database_echo)
+# Async drivers used by the request path, keyed by the sync backend name
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """Translate a sync database URL (e.g. postgresql://) into its async driver form"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS and url.get_driver_name() != ASYNC_DRIVERS[backend]:
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return url.render_as_string(hide_password=False)
+
+class PoolStats:
+    """Counters for connection checkouts from the async engine's pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_checkout(self, wait_seconds: float) -> None:
+        self.checkouts += 1
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited and how many timed out"""
+
+    stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record_checkout(time.perf_counter() - started)
+        return connection
+
+def get_pool_options(database_url: str) -> dict:
+    """Pool sizing options from settings; SQLite keeps its dialect default pool"""
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+def enable_sqlite_foreign_keys(engine) -> None:
+    """SQLite ignores ON DELETE CASCADE unless foreign keys are switched on for each connection"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _enable_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+# Sync engine, kept for scripts (setup_admin.py, create_tables) and migrations
+engine = create_engine(settings.database_url, echo=settings.database_echo, **get_pool_options(settings.database_url))
+
+enable_sqlite_foreign_keys(engine)
 
 SessionLocal = sessionmaker(bind=engine)
 
+# Async engine used by every API route
+async_pool_options = get_pool_options(settings.database_url)
+if async_pool_options:
+    async_pool_options["poolclass"] = InstrumentedAsyncQueuePool
+
+async_engine = create_async_engine(
+    get_async_database_url(settings.database_url),
+    echo=settings.database_echo,
+    **async_pool_options
+)
+
+instrument_engine(async_engine.sync_engine)
+enable_sqlite_foreign_keys(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
 class Base(DeclarativeBase):
-    pass 
+    pass
 
-def get_db():
-    db = SessionLocal()
-     
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def get_pool_status() -> dict:
+    """Current state of the async engine's connection pool plus checkout counters"""
+    pool = async_engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": settings.db_max_overflow,
+            "timeout_seconds": settings.db_pool_timeout,
+        })
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        stats = pool.stats
+        status.update({
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "avg_wait_ms": stats.total_wait_seconds / stats.checkouts * 1000 if stats.checkouts else 0.0,
+            "max_wait_ms": stats.max_wait_seconds * 1000,
+        })
+    return status
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
 def drop_tables():
-    Base.metadata.drop_all(bind=engine)
\ No newline at end of file
+    Base.metadata.drop_all(bind=engine)
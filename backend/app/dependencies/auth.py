@@ -1,17 +1,21 @@
+import secrets
 from fastapi import Request, HTTPException, status, Depends
 from starlette.status import HTTP_401_UNAUTHORIZED
+from ..config import settings
 from ..services.auth_service import auth_service  
 from ..database import get_db
 from ..models.user import User, UserRole
+from ..services.principal_cache import Principal, principal_cache
 from typing import Callable
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 class AuthMiddleware:
     @staticmethod
     async def authenticate_user(
         request: Request,
-        db: Session = Depends(get_db)
-    ):
+        db: AsyncSession = Depends(get_db)
+    ) -> Principal:
         auth_header = request.headers.get("Authorization")
         if not auth_header:
             raise HTTPException(
@@ -27,42 +31,13 @@ class AuthMiddleware:
         
         try:
             token = auth_header.split(" ")[1]
-            payload = auth_service.verify_token(token)
-
-            if not payload:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token"
-                )
-            
-            # Use user ID instead of email for token validation
-            user_id = payload.get('sub')
-            if not user_id:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token format"
-                )
-            
-            # Query user by ID instead of email
-            user = db.query(User).filter(User.id == int(user_id)).first()
-
-            if not user:
-                raise HTTPException(
-                    status_code=HTTP_401_UNAUTHORIZED,
-                    detail="User not found"
-                )
-            
-            if not user.is_active:
-                raise HTTPException(
-                    status_code=HTTP_401_UNAUTHORIZED,
-                    detail="User account is inactive"
-                )
+            principal = await AuthMiddleware.authenticate_token(token, db)
 
             # Store user info in request state for debugging
-            request.state.user = user 
-            request.state.role = user.role
+            request.state.user = principal 
+            request.state.role = principal.role
 
-            return user
+            return principal
         except HTTPException:
             raise
         except ValueError:
@@ -75,12 +50,57 @@ class AuthMiddleware:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Authentication failed"
             )
+
+    @staticmethod
+    async def authenticate_token(token: str, db: AsyncSession) -> Principal:
+        """Resolve a bearer token to an active principal; shared by HTTP routes and WebSockets"""
+        payload = auth_service.verify_token(token)
+
+        if not payload:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token"
+            )
+        
+        # Use user ID instead of email for token validation
+        user_id = payload.get('sub')
+        if not user_id:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token format"
+            )
+        
+        return await AuthMiddleware.load_principal(int(user_id), db)
+
+    @staticmethod
+    async def load_principal(user_id: int, db: AsyncSession) -> Principal:
+        # Only active principals are cached, so a hit skips the user query entirely
+        principal = principal_cache.get(user_id)
+        if principal is None:
+            # Query user by ID instead of email
+            user = await db.scalar(select(User).where(User.id == user_id))
+
+            if not user:
+                raise HTTPException(
+                    status_code=HTTP_401_UNAUTHORIZED,
+                    detail="User not found"
+                )
+            
+            if not user.is_active:
+                raise HTTPException(
+                    status_code=HTTP_401_UNAUTHORIZED,
+                    detail="User account is inactive"
+                )
+
+            principal = Principal.from_user(user)
+            principal_cache.set(principal)
+        return principal
     
     @staticmethod
     def require_role(allowed_roles: list[UserRole]):
         def role_checker(
             request: Request,
-            user: User = Depends(AuthMiddleware.authenticate_user)
+            user: Principal = Depends(AuthMiddleware.authenticate_user)
         ):
             if user.role not in allowed_roles:
                 raise HTTPException(
@@ -97,8 +117,36 @@ def require_admin():
 def require_user_or_admin():
     return AuthMiddleware.require_role([UserRole.ADMIN, UserRole.USER])
 
-async def require_authenticated(request: Request, db: Session = Depends(get_db)) -> User:
-    """Dependency to require authentication and return the current user"""
+async def require_authenticated(request: Request, db: AsyncSession = Depends(get_db)) -> Principal:
+    """Dependency to require authentication and return the current (possibly cached) principal"""
     return await AuthMiddleware.authenticate_user(request, db)
 
+async def require_current_user(
+    principal: Principal = Depends(require_authenticated),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Dependency for routes that need the full User row, e.g. to read or edit the profile"""
+    user = await db.get(User, principal.id)
+    if not user:
+        principal_cache.invalidate(principal.id)
+        raise HTTPException(
+            status_code=HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    return user
 
+
+
+async def require_metrics_access(request: Request, db: AsyncSession = Depends(get_db)) -> None:
+    """Dependency for /metrics: the configured scrape token, or an admin login"""
+    auth_header = request.headers.get("Authorization", "")
+    if settings.metrics_token and secrets.compare_digest(
+        auth_header.encode(), f"Bearer {settings.metrics_token}".encode()
+    ):
+        return
+    principal = await AuthMiddleware.authenticate_user(request, db)
+    if principal.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
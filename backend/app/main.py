@@ -1,7 +1,17 @@
-from fastapi import FastAPI 
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import auth, user_management, user_profile, chat
 from .config import settings
+from .database import async_engine
+from .models.message import ensure_search_index
+from .dependencies.auth import require_metrics_access
+from .services.title_queue import title_queue
+from .services.password_hasher import PasswordHasherBusyError, password_hasher
+from .services.generations import generation_registry
+from .services.llm_backends import llm_router
+from .services.metrics import registry
+from .middleware.metrics import MetricsMiddleware
 
 app = FastAPI(
     title="User Management System",
@@ -21,19 +31,54 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    # Lets the chat client learn which message to resume after a dropped stream,
+    # and the admin UI the cursors of the neighbouring user pages
+    expose_headers=["X-Message-Id", "X-Conversation-Id", "X-Next-Cursor", "X-Prev-Cursor"]
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router, prefix="/api/auth")
 app.include_router(user_management.router, prefix="/api")
 app.include_router(user_profile.router, prefix="/api")
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
 
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy(request: Request, exc: PasswordHasherBusyError):
+    # Shed login/registration bursts quickly rather than letting them queue
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many sign-in requests. Please try again shortly."},
+        headers={"Retry-After": "1"}
+    )
+
 @app.get("/")
 async def root():
     return {"message": "User Management System is running!"}
 
+@app.on_event("startup")
+async def prepare_search_index():
+    async with async_engine.begin() as connection:
+        await connection.run_sync(ensure_search_index)
+
+@app.on_event("startup")
+async def start_background_workers():
+    title_queue.start()
+    password_hasher.start()
+
+@app.on_event("shutdown")
+async def dispose_engine():
+    await generation_registry.stop()
+    await title_queue.stop()
+    password_hasher.stop()
+    await llm_router.aclose()
+    await async_engine.dispose()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+async def metrics():
+    """Prometheus text exposition of in-process HTTP, DB and LLM metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,49 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..services.metrics import (
+    RequestQueryStats,
+    current_request_queries,
+    db_queries_per_request,
+    db_query_seconds_per_request,
+    http_request_duration_seconds,
+    http_requests_total,
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency, status counts and SQL usage.
+    Routes are labelled by their template (e.g. /api/chat/conversations/{conversation_id})
+    so path parameters do not explode label cardinality.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        query_stats = RequestQueryStats()
+        token = current_request_queries.set(query_stats)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request_queries.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_requests_total.inc(method=method, route=route_path, status=status_code)
+            http_request_duration_seconds.observe(time.perf_counter() - started, method=method, route=route_path)
+            db_queries_per_request.observe(query_stats.count, route=route_path)
+            db_query_seconds_per_request.observe(query_stats.seconds, route=route_path)
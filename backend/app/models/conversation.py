@@ -1,13 +1,19 @@
 from ..database import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, String, DateTime, Integer, Boolean
+from sqlalchemy import ForeignKey, String, DateTime, Integer, Boolean, Index
 from sqlalchemy.sql import func
 
 import datetime
 
+LAST_MESSAGE_PREVIEW_CHARS = 200
+
 class Conversation(Base):
 
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Keyset pagination of a user's conversations on (updated_at, id)
+        Index("idx_conversations_user_updated_id", "user_id", "updated_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(
@@ -27,10 +33,37 @@ class Conversation(Base):
         onupdate=func.now(),
         nullable=False
     )
+    # Denormalized stats for the sidebar, maintained alongside message writes
+    message_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    last_message_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_message_preview: Mapped[str | None] = mapped_column(String(LAST_MESSAGE_PREVIEW_CHARS), nullable=True)
+    # Archived conversations are hidden from the default listing
+    archived_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="conversations")
-    messages: Mapped[list["Message"]] = relationship(back_populates="conversation", cascade="all, delete-orphan")
+    # passive_deletes: deleting a conversation leaves its messages to ON DELETE CASCADE instead of loading them
+    messages: Mapped[list["Message"]] = relationship(back_populates="conversation", cascade="all, delete-orphan", passive_deletes=True)
     
+    def record_message(self, content: str | None) -> None:
+        """Count a newly inserted message; the caller commits with the insert"""
+        # SQL-side increment so concurrent inserts into one conversation don't lose counts
+        self.message_count = Conversation.message_count + 1
+        self.last_message_at = func.now()
+        if content:
+            self.last_message_preview = make_preview(content)
+
+    def record_message_content(self, content: str | None) -> None:
+        """Refresh the preview once a streamed message has its final content"""
+        if content:
+            self.last_message_preview = make_preview(content)
+
     def __repr__(self):
-        return f"<Conversation(id={self.id}, title={self.title})>"
\ No newline at end of file
+        return f"<Conversation(id={self.id}, title={self.title})>"
+
+def make_preview(content: str) -> str:
+    """Single-line, truncated form of a message for last_message_preview"""
+    preview = " ".join(content.split())
+    if len(preview) > LAST_MESSAGE_PREVIEW_CHARS:
+        preview = preview[:LAST_MESSAGE_PREVIEW_CHARS - 3].rstrip() + "..."
+    return preview
\ No newline at end of file
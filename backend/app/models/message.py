@@ -1,11 +1,16 @@
 from ..database import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, String, Integer, DateTime, Text
+from sqlalchemy import DDL, ForeignKey, String, Integer, DateTime, Text, Index, event, inspect, text
+from sqlalchemy.engine import Connection
 from sqlalchemy.sql import func
 import datetime 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination of a conversation's messages on (timestamp, id)
+        Index("idx_messages_conversation_timestamp_id", "conversation_id", "timestamp", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     conversation_id: Mapped[int] = mapped_column(
@@ -20,6 +25,8 @@ class Message(Base):
     )
     role: Mapped[str] = mapped_column(String(20), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
+    # Cached token count of content, filled in lazily for the context window builder
+    token_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
     timestamp: Mapped[datetime.datetime] = mapped_column(
         DateTime(timezone=True), 
         server_default=func.now(),
@@ -33,3 +40,50 @@ class Message(Base):
     def __repr__(self):
         return (f"<Message(id={self.id}, conversation_id={self.conversation_id}, "
                 f"role='{self.role}', content='{self.content[:50]}...')>")
+
+
+# Full-text search over content (see services/search.py). These objects are not mapped:
+# Postgres gets a generated tsvector column with a GIN index, SQLite an FTS5 table kept in sync by triggers.
+SEARCH_TEXT_CONFIG = "english"
+
+SEARCH_INDEX_DDL = {
+    "postgresql": (
+        f"ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(content, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS idx_messages_search_vector ON messages USING GIN (search_vector)",
+    ),
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id')",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END""",
+    ),
+}
+
+for dialect, statements in SEARCH_INDEX_DDL.items():
+    for statement in statements:
+        event.listen(Message.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+
+
+def ensure_search_index(connection: Connection) -> None:
+    """
+    Create the search index on a database whose messages table predates it; run at startup.
+
+    after_create only fires for new tables. An FTS5 table created here is rebuilt
+    from the existing messages; the Postgres generated column fills itself in
+    (migration_chat_tables.sql does the same there).
+    """
+    tables = inspect(connection).get_table_names()
+    if "messages" not in tables:
+        return
+    for statement in SEARCH_INDEX_DDL.get(connection.dialect.name, ()):
+        connection.execute(text(statement))
+    if connection.dialect.name == "sqlite" and "messages_fts" not in tables:
+        connection.execute(text("INSERT INTO messages_fts(messages_fts) VALUES('rebuild')"))
@@ -1,10 +1,13 @@
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 from ..database import Base
-from sqlalchemy import String, Integer, DateTime, Boolean, Enum 
+from sqlalchemy import String, Integer, DateTime, Boolean, Enum, Index, literal
 from sqlalchemy.sql import func  
 import datetime
 import enum
 
+# Sort position of users who have never logged in (before everyone who has)
+NEVER_LOGGED_IN = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
 class UserRole(str, enum.Enum):
     USER = "user"
     ADMIN = "admin"
@@ -12,6 +15,10 @@ class UserRole(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination and range filters for the admin user listing
+        Index("idx_users_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     
@@ -35,5 +42,14 @@ class User(Base):
     last_login_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # Chat relationships
-    conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan")
-    messages = relationship("Message", back_populates="user", cascade="all, delete-orphan")
+    conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    messages = relationship("Message", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+
+
+# NULL-free last login key, so (last_login_sort, id) keysets and this index stay usable.
+# The sentinel is rendered inline so the query expression matches the index expression.
+last_login_sort = func.coalesce(
+    User.last_login_at,
+    literal(NEVER_LOGGED_IN, DateTime(timezone=True), literal_execute=True)
+)
+Index("idx_users_last_login_sort_id", last_login_sort, User.id)
@@ -1,22 +1,24 @@
 from ..database import get_db 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, HTTPException, status, Depends
 from ..schemas import UserCreate, UserLogin, UserResponse, TokenResponse
 from ..models.user import User, UserRole
 from ..services.auth_service import auth_service
-from ..dependencies.auth import require_authenticated
+from ..services.password_hasher import PasswordHasherBusyError, password_hasher
+from ..dependencies.auth import require_current_user
 
 
 router = APIRouter(tags=["Authentication"])
 
 @router.post("/setup", response_model=UserResponse)
-def setup_admin_user(db: Session = Depends(get_db)):
+async def setup_admin_user(db: AsyncSession = Depends(get_db)):
     """
     Create an admin user for testing purposes.
     This endpoint should only be used in development.
     """
     # Check if admin user already exists
-    admin_user = db.query(User).filter(User.email == "admin@example.com").first()
+    admin_user = await db.scalar(select(User).where(User.email == "admin@example.com"))
     
     if admin_user:
         return admin_user
@@ -25,7 +27,7 @@ def setup_admin_user(db: Session = Depends(get_db)):
     admin_user = User(
         email="admin@example.com",
         username="admin",
-        hashed_password=auth_service.hash_password("Admin123*"),
+        hashed_password=await password_hasher.hash("Admin123*"),
         can_chat=True,
         is_active=True,
         is_verified=True,
@@ -33,23 +35,23 @@ def setup_admin_user(db: Session = Depends(get_db)):
     )
     
     db.add(admin_user)
-    db.commit()
-    db.refresh(admin_user)
+    await db.commit()
+    await db.refresh(admin_user)
     
     return admin_user
 
 @router.post("/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     try:
-        existing_user_email = db.query(User).filter(User.email == user.email).first()
+        existing_user_email = await db.scalar(select(User).where(User.email == user.email))
         if existing_user_email:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email has already registered")
         
-        existing_user_username = db.query(User).filter(User.username == user.username).first()
+        existing_user_username = await db.scalar(select(User).where(User.username == user.username))
         if existing_user_username:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username has already registered")
         
-        hashed_password = auth_service.hash_password(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         db_user = User(
             email=user.email,
             username=user.username,
@@ -60,31 +62,35 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
 
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
-    except HTTPException:
+    except (HTTPException, PasswordHasherBusyError):
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to register user: {str(e)}"
         )
 
 @router.post("/login", response_model=TokenResponse)
-def login_user(user: UserLogin, db: Session = Depends(get_db)):
-    user_data = db.query(User).filter(User.email == user.email).first()
+async def login_user(user: UserLogin, db: AsyncSession = Depends(get_db)):
+    user_data = await db.scalar(select(User).where(User.email == user.email))
     if not user_data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Email does not exist") 
-    is_correct_password = auth_service.verify_password(user.password, user_data.hashed_password)
+    is_correct_password, new_hash = await password_hasher.verify_and_update(user.password, user_data.hashed_password)
     if not is_correct_password:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Password is incorrect")
     if not user_data.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not active")
 
+    # Upgrade a hash made with an outdated scheme or cost; committed with the login time
+    if new_hash:
+        user_data.hashed_password = new_hash
+
     # Update last login time
-    auth_service.update_last_login(db, user_data)
+    await auth_service.update_last_login(db, user_data)
     
     # Use user ID instead of email in token
     access_token = auth_service.create_access_token(data={"sub": str(user_data.id)})
@@ -96,11 +102,11 @@ def login_user(user: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/logout")
-def logout_user():
+async def logout_user():
     return {"response": "Sign out successfully"}
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user(user: User = Depends(require_authenticated)):
+async def get_current_user(user: User = Depends(require_current_user)):
     """
     Get current user information
     """
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+import asyncio
+import json
+import math
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Request, Response, WebSocket
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
-from ..schemas.conversation import ConversationUpdate, ConversationCreate, ConversationResponse, PaginatedConversationResponse
-from ..schemas.message import MessageCreate, MessageResponse, PaginatedMessageResponse
-from ..database import get_db
+from ..schemas.conversation import (
+    ConversationUpdate, ConversationCreate, ConversationResponse, PaginatedConversationResponse,
+    ConversationBulkAction, ConversationBulkRequest, ConversationBulkResponse
+)
+from ..schemas.message import MessageCreate, MessageResponse, PaginatedMessageResponse, PaginatedMessageSearchResponse
+from ..database import get_db, AsyncSessionLocal
 from ..models.conversation import Conversation
 from ..models.message import Message
 try:
@@ -13,18 +20,29 @@ except Exception as e:
     print(f"Warning: OpenAI service not available: {e}")
     openai_service = None
 from fastapi.responses import StreamingResponse
-from ..dependencies.auth import require_authenticated
-from ..models import User
+from ..dependencies.auth import require_authenticated, AuthMiddleware
+from ..services.chat_turns import ConversationNotFoundError, start_chat_turn
+from ..services.chat_socket import ChatSocket
+from ..services.generations import Generation, ResumeGapError, generation_registry
+from ..services.pagination import keyset_requested, paginate_keyset
+from ..services.search import search_messages
+from ..services.export import decode_export_cursor, stream_ndjson_export, stream_zip_export
+from ..services.title_queue import title_queue, TITLE_CONTEXT_MESSAGES
+from ..services.metrics import sse_active_streams
+from ..services.llm_backends import LLMUnavailableError
+from ..services.llm_scheduler import LLMRateLimitedError, lane_for
+from ..config import settings
+from ..services.principal_cache import Principal
 
 router = APIRouter()
 security = HTTPBearer()
 
 #Create new conversation 
 @router.post("/conversations", response_model=ConversationResponse)
-def create_conversation(
+async def create_conversation(
     conversation: ConversationCreate, 
-    db: Session = Depends(get_db), 
-    user: User = Depends(require_authenticated), 
+    db: AsyncSession = Depends(get_db), 
+    user: Principal = Depends(require_authenticated), 
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     # Check if user has chat permission
@@ -40,18 +58,22 @@ def create_conversation(
     conversation_data['user_id'] = user.id
     db_conversation = Conversation(**conversation_data)
     db.add(db_conversation)
-    db.commit()
-    db.refresh(db_conversation)
+    await db.commit()
+    await db.refresh(db_conversation)
     return db_conversation
 
 #Get all conversations with exclusion support
 @router.get("/conversations", response_model=PaginatedConversationResponse)
-def get_conversations(
+async def get_conversations(
     page: int = Query(1, ge=1, description="Page number starts from 1"), 
     limit: int = Query(10, ge=1, le=100, description="Number of conversations per page"),
     exclude_ids: str = Query(None, description="Comma-separated list of conversation IDs to exclude"),
-    db: Session = Depends(get_db),
-    user: User = Depends(require_authenticated),
+    mode: str | None = Query(None, pattern="^(offset|cursor)$", description="cursor for keyset pagination (implied by before/after)"),
+    before: str | None = Query(None, description="Cursor: return newer conversations than this one"),
+    after: str | None = Query(None, description="Cursor: return older conversations than this one"),
+    archived: bool = Query(False, description="List archived conversations instead of active ones"),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(require_authenticated),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     # Allow reading conversations even if can_chat is false
@@ -65,13 +87,31 @@ def get_conversations(
                 detail="Invalid exclude_ids format. Use comma-separated integers."
             )
     # Only get conversations for the current user
-    query = db.query(Conversation).filter(Conversation.user_id == user.id).order_by(Conversation.updated_at.desc())
+    query = select(Conversation).where(
+        Conversation.user_id == user.id,
+        Conversation.archived_at.is_not(None) if archived else Conversation.archived_at.is_(None)
+    ).order_by(Conversation.updated_at.desc())
     if exclude_conversation_ids:
-        query = query.filter(~Conversation.id.in_(exclude_conversation_ids))
-    total_conversations = query.count()
+        query = query.where(~Conversation.id.in_(exclude_conversation_ids))
+    if keyset_requested(mode, before, after):
+        # Keyset pagination on (updated_at, id), newest first, without COUNT(*)
+        try:
+            conversations, prev_cursor, next_cursor = await paginate_keyset(
+                db, query, Conversation.updated_at, Conversation.id, limit,
+                before=before, after=after, descending=True
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return PaginatedConversationResponse(
+            conversations=[ConversationResponse.model_validate(conv) for conv in conversations],
+            hasMore=(prev_cursor if before else next_cursor) is not None,
+            nextCursor=next_cursor,
+            prevCursor=prev_cursor
+        )
+    total_conversations = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
     total_pages = (total_conversations + limit - 1) // limit
     has_more = page < total_pages
-    conversations = query.offset((page-1) * limit).limit(limit).all()
+    conversations = (await db.scalars(query.offset((page-1) * limit).limit(limit))).all()
     return PaginatedConversationResponse(
         conversations=[ConversationResponse.model_validate(conv) for conv in conversations],
         hasMore=has_more,
@@ -82,14 +122,14 @@ def get_conversations(
 
 #Get a specific conversation
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
-def get_conversation(
+async def get_conversation(
     conversation_id: int, 
-    db: Session = Depends(get_db), 
-    user: User = Depends(require_authenticated), 
+    db: AsyncSession = Depends(get_db), 
+    user: Principal = Depends(require_authenticated), 
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     # Allow reading conversation even if can_chat is false
-    conversation = db.query(Conversation).filter(Conversation.user_id == user.id, Conversation.id == conversation_id).first()
+    conversation = await db.scalar(select(Conversation).where(Conversation.user_id == user.id, Conversation.id == conversation_id))
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,24 +139,43 @@ def get_conversation(
 
 #Get messages with pagination
 @router.get("/conversations/{conversation_id}/messages", response_model=PaginatedMessageResponse)
-def get_conversation_messages(
+async def get_conversation_messages(
     conversation_id: int, 
     page: int = Query(1, ge=1, description="Page number starts from 1"), 
     limit: int = Query(10, ge=1, le=100, description="Number of messages per page"), 
-    db: Session = Depends(get_db), 
-    user: User = Depends(require_authenticated), 
+    mode: str | None = Query(None, pattern="^(offset|cursor)$", description="cursor for keyset pagination (implied by before/after)"),
+    before: str | None = Query(None, description="Cursor: return messages older than this one"),
+    after: str | None = Query(None, description="Cursor: return messages newer than this one"),
+    db: AsyncSession = Depends(get_db), 
+    user: Principal = Depends(require_authenticated), 
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     # Allow reading messages even if can_chat is false
-    conversation = db.query(Conversation).filter(Conversation.user_id == user.id, Conversation.id == conversation_id).first()
+    conversation = await db.scalar(select(Conversation).where(Conversation.user_id == user.id, Conversation.id == conversation_id))
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversation not found"
         )
+    if keyset_requested(mode, before, after):
+        # Keyset pagination on (timestamp, id); without a cursor start from the newest messages
+        try:
+            messages, prev_cursor, next_cursor = await paginate_keyset(
+                db, select(Message).where(Message.conversation_id == conversation_id),
+                Message.timestamp, Message.id, limit,
+                before=before, after=after, start_at_end=True
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return PaginatedMessageResponse(
+            messages=[MessageResponse.model_validate(msg) for msg in messages],
+            hasMore=(next_cursor if after else prev_cursor) is not None,
+            nextCursor=next_cursor,
+            prevCursor=prev_cursor
+        )
     offset = (page-1) * limit 
-    total_messages =  db.query(Message).filter(Message.conversation_id == conversation_id).count()
-    messages = db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.timestamp.asc()).offset(offset).limit(limit).all()
+    total_messages = conversation.message_count
+    messages = (await db.scalars(select(Message).where(Message.conversation_id == conversation_id).order_by(Message.timestamp.asc()).offset(offset).limit(limit))).all()
     total_pages = (total_messages + limit - 1) // limit
     has_more = page < total_pages 
     return PaginatedMessageResponse(
@@ -127,13 +186,64 @@ def get_conversation_messages(
         totalPages=total_pages
     )
 
+#Search the current user's messages
+@router.get("/search", response_model=PaginatedMessageSearchResponse)
+async def search_conversation_messages(
+    q: str = Query(..., min_length=1, max_length=500, description="Words to search for"),
+    conversation_id: int | None = Query(None, description="Only search this conversation"),
+    page: int = Query(1, ge=1, description="Page number starts from 1"),
+    limit: int = Query(20, ge=1, le=100, description="Number of results per page"),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(require_authenticated),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    # Allow searching even if can_chat is false, like reading messages
+    if not q.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search query is empty")
+    # One extra row tells us whether another page exists without a COUNT(*)
+    results = await search_messages(
+        db, user.id, q, limit=limit + 1, offset=(page - 1) * limit, conversation_id=conversation_id
+    )
+    return PaginatedMessageSearchResponse(
+        results=results[:limit],
+        hasMore=len(results) > limit,
+        page=page
+    )
+
+#Export all of the current user's conversations and messages
+@router.get("/export")
+async def export_conversations(
+    format: str = Query("ndjson", pattern="^(ndjson|zip)$", description="ndjson stream or zip of JSON files"),
+    after: str | None = Query(None, description="Cursor: resume the export after this position"),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(require_authenticated),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    # Allow exporting even if can_chat is false, like reading messages
+    if after:
+        try:
+            decode_export_cursor(after)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if format == "zip":
+        return StreamingResponse(
+            stream_zip_export(db, user.id, after),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="conversations-{user.id}.zip"'}
+        )
+    return StreamingResponse(
+        stream_ndjson_export(db, user.id, after),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="conversations-{user.id}.ndjson"'}
+    )
+
 #Update a specific conversation 
 @router.put("/conversations/{conversation_id}", response_model=ConversationResponse)
-def update_conversation(
+async def update_conversation(
     conversation_id: int, 
     conversation_update: ConversationUpdate, 
-    db: Session = Depends(get_db), 
-    user: User = Depends(require_authenticated), 
+    db: AsyncSession = Depends(get_db), 
+    user: Principal = Depends(require_authenticated), 
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     # Check if user has chat permission
@@ -142,21 +252,21 @@ def update_conversation(
     #         status_code=status.HTTP_403_FORBIDDEN,
     #         detail="Chat access denied"
     #     )
-    conversation = db.query(Conversation).filter(Conversation.user_id == user.id, Conversation.id == conversation_id).first()
+    conversation = await db.scalar(select(Conversation).where(Conversation.user_id == user.id, Conversation.id == conversation_id))
     if not conversation:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
     if conversation_update.title is not None:
         conversation.title = conversation_update.title
         conversation.updated_at = func.now()
-    db.commit()
-    db.refresh(conversation)
+    await db.commit()
+    await db.refresh(conversation)
     return conversation
 
 @router.delete("/conversations/{conversation_id}")
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int, 
-    user: User = Depends(require_authenticated), 
-    db: Session = Depends(get_db), 
+    user: Principal = Depends(require_authenticated), 
+    db: AsyncSession = Depends(get_db), 
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     # # Check if user has chat permission
@@ -165,16 +275,62 @@ def delete_conversation(
     #         status_code=status.HTTP_403_FORBIDDEN,
     #         detail="Chat access denied"
     #     )
-    conversation = db.query(Conversation).filter(Conversation.user_id == user.id, Conversation.id == conversation_id).first()
-    if not conversation:
+    # Messages are removed by ON DELETE CASCADE rather than loaded and deleted one by one
+    result = await db.execute(delete(Conversation).where(Conversation.user_id == user.id, Conversation.id == conversation_id))
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversation not found"
         )
-    db.delete(conversation)
-    db.commit()
+    await db.commit()
     return {"ok": True}
 
+@router.post("/conversations/bulk", response_model=ConversationBulkResponse)
+async def bulk_update_conversations(
+    bulk_request: ConversationBulkRequest,
+    user: Principal = Depends(require_authenticated),
+    db: AsyncSession = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Delete, archive or unarchive many conversations with one set-based statement"""
+    if not bulk_request.ids and bulk_request.older_than is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select conversations with ids and/or older_than"
+        )
+    conditions = [Conversation.user_id == user.id]
+    if bulk_request.ids:
+        conditions.append(Conversation.id.in_(bulk_request.ids))
+    if bulk_request.older_than is not None:
+        # Last activity, which archiving and renaming don't touch (unlike updated_at)
+        conditions.append(
+            func.coalesce(Conversation.last_message_at, Conversation.created_at) < bulk_request.older_than
+        )
+    if bulk_request.action == ConversationBulkAction.ARCHIVE:
+        conditions.append(Conversation.archived_at.is_(None))
+    elif bulk_request.action == ConversationBulkAction.UNARCHIVE:
+        conditions.append(Conversation.archived_at.is_not(None))
+
+    # Affected messages come from the denormalized counts, not a scan of messages
+    message_total = await db.scalar(select(func.coalesce(func.sum(Conversation.message_count), 0)).where(*conditions))
+    if bulk_request.action == ConversationBulkAction.DELETE:
+        statement = delete(Conversation).where(*conditions)
+    else:
+        archived_at = func.now() if bulk_request.action == ConversationBulkAction.ARCHIVE else None
+        # updated_at is pinned so archiving doesn't move conversations in the sidebar ordering.
+        # Setting it explicitly skips the ORM's onupdate; migration_chat_tables.sql drops the
+        # Postgres trigger that used to overwrite it on every UPDATE
+        statement = update(Conversation).where(*conditions).values(
+            archived_at=archived_at, updated_at=Conversation.updated_at
+        )
+    result = await db.execute(statement.execution_options(synchronize_session=False))
+    await db.commit()
+    return ConversationBulkResponse(
+        action=bulk_request.action,
+        conversations=result.rowcount,
+        messages=message_total
+    )
+
 # @router.post("/send", response_model=MessageResponse)
 # def send_message(message: MessageCreate, user: User = Depends(AuthMiddleware.authenticate_user), db: Session = Depends(get_db), credentials: HTTPAuthorizationCredentials = Depends(security)):
 #     conversation = db.query(Conversation).filter(Conversation.user_id == user.id, Conversation.id == message.conversation_id).first()
@@ -224,10 +380,12 @@ def delete_conversation(
 #     return ai_message
 
 @router.post("/conversations/{conversation_id}/title", response_model=ConversationResponse)
-def create_conversation_title(
+async def create_conversation_title(
     conversation_id: int, 
-    db: Session = Depends(get_db), 
-    user: User = Depends(require_authenticated), 
+    response: Response,
+    wait: bool = Query(False, description="Wait for the title instead of returning 202 while it is generated"),
+    db: AsyncSession = Depends(get_db), 
+    user: Principal = Depends(require_authenticated), 
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     # Check if user has chat permission
@@ -236,13 +394,15 @@ def create_conversation_title(
     #         status_code=status.HTTP_403_FORBIDDEN,
     #         detail="Chat access denied"
     #     )
-    conversation = db.query(Conversation).filter(Conversation.user_id == user.id, Conversation.id == conversation_id).first()
+    conversation = await db.scalar(select(Conversation).where(Conversation.user_id == user.id, Conversation.id == conversation_id))
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversation not found"
         )
-    messages = db.query(Message).filter(Message.conversation_id == conversation_id).all()
+    messages = (await db.scalars(select(Message).where(
+        Message.conversation_id == conversation_id
+    ).order_by(Message.timestamp, Message.id).limit(TITLE_CONTEXT_MESSAGES))).all()
     if not messages:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -265,23 +425,32 @@ def create_conversation_title(
             detail="Conversation content is not substantial enough for title generation. Try adding more meaningful content to your conversation."
         )
     
-    try:
-        generated_title = openai_service.generate_conversation_title(messages_dict)
-        conversation.title = generated_title
-        db.commit()
-        db.refresh(conversation)
+    job = title_queue.enqueue(conversation_id, force=True)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Title generation is busy. Please try again later."
+        )
+    if not wait:
+        response.status_code = status.HTTP_202_ACCEPTED
         return conversation
+    
+    # Release the connection while the worker generates the title
+    await db.rollback()
+    try:
+        await job
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate title: {str(e)}"
         )
+    await db.refresh(conversation)
+    return conversation
 
 @router.post("/send_stream")
 async def send_message_stream(
     message: MessageCreate, 
-    db: Session = Depends(get_db), 
-    user: User = Depends(require_authenticated), 
+    user: Principal = Depends(require_authenticated), 
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     # Check if user has chat permission
@@ -290,89 +459,151 @@ async def send_message_stream(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Chat access denied"
         )
-    conversation = db.query(Conversation).filter(Conversation.user_id == user.id, Conversation.id == message.conversation_id).first()
-    if not conversation:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-    db_message = Message(**message.model_dump(), user_id=user.id) if hasattr(Message, 'user_id') else Message(**message.model_dump())
-    db.add(db_message)
-    conversation.updated_at = func.now()
-    db.commit()
-    db.refresh(db_message)
-    conversation_messages = db.query(Message).filter(
-        Message.conversation_id == message.conversation_id
-    ).order_by(Message.timestamp).all()
-    message_dicts = [
-        {"role": msg.role, "content": msg.content} 
-        for msg in conversation_messages
-    ]
-    
     # Check if OpenAI service is available
     if not openai_service:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="AI service is not available. Please try again later."
         )
-    
+    # The reply streams in a background task that outlives this request (so a dropped
+    # client can resume it), so it runs on its own session rather than the request's
+    turn_db = AsyncSessionLocal()
     try:
-        formatted_messages = openai_service.format_conversation_history(message_dicts)
-    except Exception as e:
+        turn = await start_chat_turn(turn_db, openai_service, user.id, message, lane=lane_for(user.role))
+    except ConversationNotFoundError:
+        await turn_db.close()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+    except LLMRateLimitedError as e:
+        await turn_db.close()
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to format conversation: {str(e)}"
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="You are sending messages too quickly. Please wait a moment.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
         )
-    assistant_message = Message(
-        conversation_id=message.conversation_id,
-        user_id=user.id,
-        content="",
-        role="assistant"
-    )
-    db.add(assistant_message)
-    db.commit()
-    db.refresh(assistant_message)
-    try:
-        if not openai_service.client:
-            raise Exception("OpenAI client not initialized")
-            
-        response = openai_service.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=formatted_messages,
-            max_tokens=1000,
-            temperature=0.7,
-            stream=True
+    except LLMUnavailableError:
+        await turn_db.close()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service is not available. Please try again later."
         )
-        full_content = ""
-        def event_generator():
-            nonlocal full_content
-            for chunk in response:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    full_content += content
-                    assistant_message.content = full_content
-                    db.commit()
-                    yield f"data: {content}\n\n"
-            assistant_message.content = full_content
-            conversation.updated_at = func.now()
-            db.commit()
-            if conversation.title == "New Chat" or conversation.title is None:
-                updated_messages = db.query(Message).filter(
-                    Message.conversation_id == message.conversation_id
-                ).order_by(Message.timestamp).all()
-                if len(updated_messages) >= 2:
-                    try:
-                        message_dicts = [
-                            {"role": msg.role, "content": msg.content} 
-                            for msg in updated_messages
-                        ]
-                        if openai_service.should_generate_title(message_dicts):
-                            generated_title = openai_service.generate_conversation_title(message_dicts)
-                            conversation.title = generated_title
-                            db.commit()
-                    except Exception as e:
-                        pass
-            yield f"data: [DONE]\n\n"
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
     except Exception as e:
-        db.delete(assistant_message)
-        db.commit()
+        await turn_db.close()
         raise HTTPException(status_code=500, detail="Streaming failed")
 
+    generation = generation_registry.start(turn, user.id, turn_db)
+    return generation_event_stream(generation)
+
+@router.post("/generations/{message_id}/cancel")
+async def cancel_generation(
+    message_id: int,
+    user: Principal = Depends(require_authenticated),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Stop a streaming reply; the partial content is kept. cancelled is false if it had already ended"""
+    generation = generation_registry.get(message_id, user.id)
+    if generation is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Generation not found or no longer buffered")
+    return {"message_id": message_id, "cancelled": generation.cancel("user")}
+
+@router.post("/conversations/{conversation_id}/cancel")
+async def cancel_conversation_generations(
+    conversation_id: int,
+    user: Principal = Depends(require_authenticated),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Stop every reply still streaming in a conversation"""
+    cancelled = [
+        generation.message_id for generation in generation_registry.in_flight(conversation_id, user.id)
+        if generation.cancel("user")
+    ]
+    return {"conversation_id": conversation_id, "cancelled": cancelled}
+
+def generation_event_stream(generation: Generation, after: int = 0) -> StreamingResponse:
+    """SSE response for a generation; each delta's event id can be sent back as Last-Event-ID"""
+    async def event_generator():
+        sse_active_streams.inc()
+        try:
+            async for event_id, content in generation.stream(after):
+                yield f"id: {event_id}\ndata: {content}\n\n"
+        except ResumeGapError:
+            # This reader fell further behind than the buffer holds; it can reload the message
+            return
+        finally:
+            sse_active_streams.dec()
+        if not generation.failed:
+            yield f"data: [DONE]\n\n"
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"X-Message-Id": str(generation.message_id), "X-Conversation-Id": str(generation.conversation_id)}
+    )
+
+@router.get("/generations/{message_id}/stream")
+async def resume_message_stream(
+    message_id: int,
+    last_event_id: int | None = Header(None, alias="Last-Event-ID"),
+    after: int | None = Query(None, ge=0, description="Event id to resume after, for clients that cannot set Last-Event-ID"),
+    user: Principal = Depends(require_authenticated),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Resume (or replay) a streaming reply from the generation buffer without calling the
+    model again. Returns 404 once the generation is no longer buffered; the persisted
+    message then has the full reply.
+    """
+    generation = generation_registry.get(message_id, user.id)
+    if generation is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Generation not found or no longer buffered")
+    position = last_event_id if last_event_id is not None else (after or 0)
+    if position < generation.first_buffered_id - 1 or position > generation.last_event_id:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Resume point is no longer buffered")
+    generation_registry.resumed += 1
+    return generation_event_stream(generation, position)
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Chat over one WebSocket for many conversations (frames are described on ChatSocket).
+
+    The connection authenticates once, with an Authorization: Bearer header on the
+    handshake or, for browsers, a first frame {"type": "auth", "token": "..."}.
+    """
+    await websocket.accept()
+    token = None
+    auth_header = websocket.headers.get("authorization", "")
+    if auth_header.startswith("Bearer "):
+        token = auth_header.split(" ")[1]
+    else:
+        try:
+            message = await asyncio.wait_for(websocket.receive(), settings.ws_auth_timeout_seconds)
+        except asyncio.TimeoutError:
+            message = {"type": "websocket.receive", "text": ""}
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("text") is None:
+            # Binary frames carry no "text"
+            await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA, reason="Frames must be JSON objects")
+            return
+        try:
+            frame = json.loads(message["text"])
+            if isinstance(frame, dict) and frame.get("type") == "auth":
+                token = frame.get("token")
+        except json.JSONDecodeError:
+            pass
+    if not isinstance(token, str) or not token:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Authentication required")
+        return
+    async with AsyncSessionLocal() as db:
+        try:
+            user = await AuthMiddleware.authenticate_token(token, db)
+        except (HTTPException, ValueError):
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
+            return
+    if not user.can_chat:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Chat access denied")
+        return
+    if not openai_service:
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="AI service is not available")
+        return
+    await websocket.send_json({"type": "ready", "user_id": user.id})
+    await ChatSocket(websocket, user, openai_service).run()
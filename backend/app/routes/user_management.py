@@ -1,21 +1,36 @@
+from datetime import datetime
+from typing import Literal
 from ..schemas.user import UserCanChatPermissionUpdate, UserCreate, UserResponse, UserRoleUpdate, UserLoginPermissionUpdate
-from ..database import get_db 
+from ..schemas.conversation import ConversationImportResponse
+from ..database import get_db, get_pool_status
 from ..dependencies.auth import require_authenticated, require_admin
-from sqlalchemy.orm import Session 
-from fastapi import APIRouter, HTTPException, status, Depends 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from ..models.user import User, UserRole
-from ..services.auth_service import auth_service
+from ..services.message_buffer import stream_write_stats
+from ..services.generations import generation_registry
+from ..services.principal_cache import Principal, principal_cache
+from ..services.password_hasher import PasswordHasherBusyError, password_hasher
+from ..services.title_queue import title_queue
+from ..services.llm_backends import llm_router
+from ..services.llm_scheduler import llm_scheduler
+from ..services.response_cache import response_cache
+from ..services.importer import import_jsonl
+from ..services.pagination import paginate_keyset
+from ..services.user_listing import USER_SORTS, filter_users, stream_users_csv, user_csv_query
 
 
 router = APIRouter(tags=["Admin"])
 security = HTTPBearer()
 
 @router.post("/users", response_model=UserResponse)
-def create_user(
+async def create_user(
     user_data: UserCreate,
-    current_user: User = Depends(require_authenticated),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_authenticated),
+    db: AsyncSession = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     try:
@@ -27,7 +42,7 @@ def create_user(
             )
 
         # Check if email already exists
-        existing_user_email = db.query(User).filter(User.email == user_data.email).first()
+        existing_user_email = await db.scalar(select(User).where(User.email == user_data.email))
         if existing_user_email:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT, 
@@ -35,7 +50,7 @@ def create_user(
             )
         
         # Check if username already exists
-        existing_user_username = db.query(User).filter(User.username == user_data.username).first()
+        existing_user_username = await db.scalar(select(User).where(User.username == user_data.username))
         if existing_user_username:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT, 
@@ -43,7 +58,7 @@ def create_user(
             )
 
         # Hash the password
-        hashed_password = auth_service.hash_password(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         
         # Create new user
         new_user = User(
@@ -57,14 +72,14 @@ def create_user(
 
         # Save to database
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         return new_user
-    except HTTPException:
+    except (HTTPException, PasswordHasherBusyError):
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create user: {str(e)}"
@@ -72,11 +87,11 @@ def create_user(
 
 
 @router.put("/users/{user_id}/role", response_model=UserResponse)
-def update_role(
+async def update_role(
     user_id: int,
     user_data: UserRoleUpdate,
-    db: Session = Depends(get_db),
-    user: User = Depends(require_authenticated),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(require_authenticated),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     if user.role == UserRole.USER:
@@ -85,7 +100,7 @@ def update_role(
             detail="Permission denied"
         )
     
-    user_in_db = db.query(User).filter(User.id == user_id).first()
+    user_in_db = await db.scalar(select(User).where(User.id == user_id))
     if not user_in_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -102,23 +117,24 @@ def update_role(
     
     
     # Save changes to database
-    db.commit()
-    db.refresh(user_in_db)
+    await db.commit()
+    await db.refresh(user_in_db)
+    principal_cache.invalidate(user_in_db.id)
     
     return user_in_db
 
 @router.put("/users/{user_id}/login_permission", response_model=UserResponse)
-def update_login_permission(
+async def update_login_permission(
     user_id: int,
     user_data: UserLoginPermissionUpdate,
-    db: Session = Depends(get_db),
-    user: User = Depends(require_authenticated),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(require_authenticated),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     if user.role != UserRole.ADMIN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied")
     
-    user_in_db = db.query(User).filter(User.id == user_id).first()
+    user_in_db = await db.scalar(select(User).where(User.id == user_id))
 
     if not user_in_db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -132,18 +148,19 @@ def update_login_permission(
 
     user_in_db.is_active = user_data.is_active 
 
-    db.commit()
-    db.refresh(user_in_db)
+    await db.commit()
+    await db.refresh(user_in_db)
+    principal_cache.invalidate(user_in_db.id)
 
     return user_in_db
 
 #Update user can chat permission
 @router.put("/users/{user_id}/can_chat", response_model=UserResponse)
-def update_can_chat_permission(
+async def update_can_chat_permission(
     user_id: int,
     user_data: UserCanChatPermissionUpdate, 
-    db: Session = Depends(get_db),
-    user: User = Depends(require_authenticated),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(require_authenticated),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     if user.role != UserRole.ADMIN:
@@ -152,7 +169,7 @@ def update_can_chat_permission(
             detail="Permission denied"
         )
     
-    user_in_db = db.query(User).filter(User.id == user_id).first()
+    user_in_db = await db.scalar(select(User).where(User.id == user_id))
 
     if not user_in_db:
         raise HTTPException(
@@ -167,15 +184,59 @@ def update_can_chat_permission(
 
     user_in_db.can_chat = user_data.can_chat
 
-    db.commit()
-    db.refresh(user_in_db)
+    await db.commit()
+    await db.refresh(user_in_db)
+    principal_cache.invalidate(user_in_db.id)
 
     return user_in_db
 
     
 
+class UserListFilters:
+    """Query parameters shared by the admin user listing and its CSV export"""
+
+    def __init__(
+        self,
+        role: UserRole | None = Query(None, description="Only users with this role"),
+        is_active: bool | None = Query(None, description="Only users that can (or cannot) log in"),
+        can_chat: bool | None = Query(None, description="Only users with (or without) chat access"),
+        created_after: datetime | None = Query(None, description="Created at or after this time"),
+        created_before: datetime | None = Query(None, description="Created before this time"),
+        last_login_after: datetime | None = Query(None, description="Last logged in at or after this time"),
+        last_login_before: datetime | None = Query(None, description="Last logged in before this time"),
+        sort: Literal["id", "created_at", "last_login_at", "username"] = Query("id", description="Sort field"),
+        order: Literal["asc", "desc"] = Query("asc", description="Sort direction")
+    ):
+        self.filters = dict(
+            role=role,
+            is_active=is_active,
+            can_chat=can_chat,
+            created_after=created_after,
+            created_before=created_before,
+            last_login_after=last_login_after,
+            last_login_before=last_login_before
+        )
+        self.sort = sort
+        self.descending = order == "desc"
+
+    def apply(self, query):
+        return filter_users(query, **self.filters)
+
+
+# Page size when a cursor is passed without a limit
+DEFAULT_USER_PAGE_SIZE = 50
+
 @router.get("/users", response_model=list[UserResponse])
-def get_users(db: Session = Depends(get_db), user: User = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_users(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=500, description="Number of users per page; omit (without a cursor) for every user"),
+    before: str | None = Query(None, description="Cursor: return the users ahead of this one"),
+    after: str | None = Query(None, description="Cursor: return the users past this one"),
+    listing: UserListFilters = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(require_authenticated),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
     #Only admin can get all users
     if user.role != UserRole.ADMIN:
         raise HTTPException(
@@ -183,19 +244,61 @@ def get_users(db: Session = Depends(get_db), user: User = Depends(require_authen
             detail="Permission denied"
         )
 
-    user_list = db.query(User).order_by(User.id).all()
-    # Convert to UserResponse schema for proper serialization
-    return [UserResponse.model_validate(user) for user in user_list]
+    sort_column, sort_value = USER_SORTS[listing.sort]
+    if limit is None and not (before or after):
+        direction = (lambda column: column.desc()) if listing.descending else (lambda column: column.asc())
+        user_list = (await db.scalars(
+            listing.apply(select(User)).order_by(direction(sort_column), direction(User.id))
+        )).all()
+        return [UserResponse.model_validate(user) for user in user_list]
+
+    # Keyset pagination on (sort field, id), without COUNT(*). The body stays a plain
+    # list; the cursors for the neighbouring pages are returned in headers
+    try:
+        users, prev_cursor, next_cursor = await paginate_keyset(
+            db, listing.apply(select(User)), sort_column, User.id, limit or DEFAULT_USER_PAGE_SIZE,
+            before=before, after=after, descending=listing.descending, sort_value=sort_value
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if prev_cursor:
+        response.headers["X-Prev-Cursor"] = prev_cursor
+    return [UserResponse.model_validate(user) for user in users]
+
+@router.get("/users/export")
+async def export_users(
+    listing: UserListFilters = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(require_authenticated),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Stream every user matching the listing filters as CSV, in the requested sort order"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+
+    sort_column, _ = USER_SORTS[listing.sort]
+    direction = (lambda column: column.desc()) if listing.descending else (lambda column: column.asc())
+    query = listing.apply(user_csv_query()).order_by(direction(sort_column), direction(User.id))
+    return StreamingResponse(
+        stream_users_csv(db, query),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'}
+    )
 
 @router.delete("/users/{user_id}")
-def delete_specific_user(user_id: int, db: Session = Depends(get_db), user: User = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def delete_specific_user(user_id: int, db: AsyncSession = Depends(get_db), user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
     if user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Permission denied"
         )
     
-    existed_user = db.query(User).filter(User.id == user_id).first()
+    existed_user = await db.scalar(select(User).where(User.id == user_id))
     if not existed_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -209,8 +312,119 @@ def delete_specific_user(user_id: int, db: Session = Depends(get_db), user: User
             detail="Cannot delete your own account"
         )
     
-    db.delete(existed_user)
-    db.commit()
+    await db.delete(existed_user)
+    await db.commit()
+    principal_cache.invalidate(user_id)
 
     return {"ok": True}
-    
\ No newline at end of file
+
+@router.get("/admin/stream_stats")
+async def get_stream_stats(user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Counters for buffered persistence of streamed assistant replies and resumable generations"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return {**stream_write_stats.snapshot(), "generations": generation_registry.snapshot()}
+
+@router.get("/admin/auth_cache_stats")
+async def get_auth_cache_stats(user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Hit/miss counters for the authenticated-principal cache"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return principal_cache.snapshot()
+
+@router.get("/admin/title_queue_stats")
+async def get_title_queue_stats(user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Depth and outcome counters for the background title generation queue"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return title_queue.snapshot()
+
+@router.get("/admin/password_hasher_stats")
+async def get_password_hasher_stats(user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Password hashing pool: operations in flight, rejections and hashes upgraded on login"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return password_hasher.snapshot()
+
+@router.get("/admin/db_pool_stats")
+async def get_db_pool_stats(user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Connection pool usage: checked-out connections, overflow, checkout wait time and timeouts"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return get_pool_status()
+
+@router.get("/admin/llm_backends")
+async def get_llm_backends(user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Routing order, latency and error-rate tracking and circuit state for each LLM backend, plus retry stats"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return llm_router.snapshot()
+
+@router.get("/admin/llm_scheduler")
+async def get_llm_scheduler(user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Upstream slots in use, queue depth per lane and scheduler rejections"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return llm_scheduler.snapshot()
+
+@router.get("/admin/response_cache_stats")
+async def get_response_cache_stats(user: Principal = Depends(require_authenticated), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Hit rate and upstream time saved by the exact-match response cache"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return response_cache.snapshot()
+
+@router.post("/admin/import/conversations", response_model=ConversationImportResponse)
+async def import_conversations(
+    request: Request,
+    user_id: int | None = Query(None, description="Owner for lines that do not set user_id"),
+    batch_size: int | None = Query(None, ge=1, le=100000, description="Messages per transaction"),
+    user: Principal = Depends(require_authenticated),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Bulk import conversations from a JSONL request body (one ConversationImport per line).
+    The body is read as it arrives, so uploads of any size use constant memory.
+    """
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+
+    async def body_lines():
+        pending = b""
+        async for chunk in request.stream():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8", errors="replace")
+        if pending:
+            yield pending.decode("utf-8", errors="replace")
+
+    stats = await import_jsonl(body_lines(), default_user_id=user_id, batch_size=batch_size)
+    return stats.as_dict()
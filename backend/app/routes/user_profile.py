@@ -1,9 +1,11 @@
 from ..database import get_db 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, HTTPException, status
 from ..schemas import UserResponse, UserUpdate
 from ..models.user import User
-from ..dependencies.auth import require_authenticated
+from ..dependencies.auth import require_current_user
+from ..services.principal_cache import principal_cache
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 router = APIRouter(tags=["User Profile"])
@@ -11,7 +13,7 @@ security = HTTPBearer()
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
-    current_user: User = Depends(require_authenticated),
+    current_user: User = Depends(require_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Get current user profile"""
@@ -20,18 +22,18 @@ async def get_current_user(
 @router.put("/me", response_model=UserResponse)
 async def update_user_profile(
     user_data: UserUpdate,
-    current_user: User = Depends(require_authenticated),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(require_current_user),
+    db: AsyncSession = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Update current user profile"""
     try:
         # Check if email is being updated and if it already exists
         if user_data.email and user_data.email != current_user.email:
-            existing_email = db.query(User).filter(
+            existing_email = await db.scalar(select(User).where(
                 User.email == user_data.email,
                 User.id != current_user.id
-            ).first()
+            ))
             if existing_email:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT, 
@@ -41,10 +43,10 @@ async def update_user_profile(
         
         # Check if username is being updated and if it already exists
         if user_data.username and user_data.username != current_user.username:
-            existing_username = db.query(User).filter(
+            existing_username = await db.scalar(select(User).where(
                 User.username == user_data.username,
                 User.id != current_user.id
-            ).first()
+            ))
             if existing_username:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT, 
@@ -54,15 +56,16 @@ async def update_user_profile(
         
         # Only commit if there are actual changes
         if user_data.email or user_data.username:
-            db.commit()
-            db.refresh(current_user)
+            await db.commit()
+            await db.refresh(current_user)
+            principal_cache.invalidate(current_user.id)
         
         return UserResponse.model_validate(current_user)
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update profile: {str(e)}"
@@ -70,17 +73,18 @@ async def update_user_profile(
 
 @router.delete("/me")
 async def delete_user_profile(
-    current_user: User = Depends(require_authenticated),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(require_current_user),
+    db: AsyncSession = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Delete current user profile"""
     try:
-        db.delete(current_user)
-        db.commit()
+        await db.delete(current_user)
+        await db.commit()
+        principal_cache.invalidate(current_user.id)
         return {"message": "User profile deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete profile: {str(e)}"
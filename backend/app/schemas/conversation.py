@@ -1,5 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from enum import Enum
+from .message import MessageImport
 
 
 class ConversationCreate(BaseModel):
@@ -14,6 +16,10 @@ class ConversationResponse(BaseModel):
     title: str | None
     created_at: datetime
     updated_at: datetime
+    message_count: int = 0
+    last_message_at: datetime | None = None
+    last_message_preview: str | None = None
+    archived_at: datetime | None = None
 
     class Config:
         from_attributes = True
@@ -21,7 +27,41 @@ class ConversationResponse(BaseModel):
 class PaginatedConversationResponse(BaseModel):
     conversations: list[ConversationResponse]
     hasMore: bool
-    page: int
-    total: int
-    totalPages: int
-    
\ No newline at end of file
+    # Offset pagination (the default)
+    page: int | None = None
+    total: int | None = None
+    totalPages: int | None = None
+    # Keyset pagination (with mode=cursor, or when a before/after cursor is passed)
+    nextCursor: str | None = None
+    prevCursor: str | None = None
+
+class ConversationBulkAction(str, Enum):
+    DELETE = "delete"
+    ARCHIVE = "archive"
+    UNARCHIVE = "unarchive"
+
+class ConversationBulkRequest(BaseModel):
+    action: ConversationBulkAction
+    # Conversations are selected by ids, older_than (last message, or creation if empty, before), or both combined
+    ids: list[int] | None = Field(None, max_length=1000)
+    older_than: datetime | None = None
+
+class ConversationBulkResponse(BaseModel):
+    action: ConversationBulkAction
+    conversations: int
+    messages: int
+
+class ConversationImport(ConversationCreate):
+    """One JSONL line of a bulk import: a conversation with its messages, oldest first"""
+    user_id: int | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+    messages: list[MessageImport] = []
+
+class ConversationImportResponse(BaseModel):
+    conversations: int
+    messages: int
+    skipped: int
+    errors: list[str]
+    elapsed_seconds: float
+    rows_per_second: float
@@ -14,7 +14,12 @@ class MessageBase(BaseModel):
 class MessageCreate(MessageBase):
     conversation_id: int
 
+class MessageImport(MessageBase):
+    timestamp: datetime | None = None
+
 class MessageResponse(MessageBase):
+    # Assistant replies start empty while they are being streamed
+    content: str
     id: int
     conversation_id: int
     user_id: int
@@ -26,6 +31,25 @@ class MessageResponse(MessageBase):
 class PaginatedMessageResponse(BaseModel):
     messages: list[MessageResponse]
     hasMore: bool
+    # Offset pagination (the default)
+    page: int | None = None
+    total: int | None = None
+    totalPages: int | None = None
+    # Keyset pagination (with mode=cursor, or when a before/after cursor is passed)
+    nextCursor: str | None = None
+    prevCursor: str | None = None
+
+class MessageSearchResult(BaseModel):
+    message_id: int
+    conversation_id: int
+    conversation_title: str | None
+    role: MessageRole
+    timestamp: datetime
+    rank: float
+    # HTML-escaped excerpt with matched terms wrapped in <mark></mark>
+    snippet: str
+
+class PaginatedMessageSearchResponse(BaseModel):
+    results: list[MessageSearchResult]
+    hasMore: bool
     page: int
-    total: int
-    totalPages: int
\ No newline at end of file
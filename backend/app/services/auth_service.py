@@ -1,24 +1,69 @@
 from ..config import settings
 from ..models.user import User
+from collections import OrderedDict
 from jose import JWTError, jwt
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from .password_hasher import hash_password, verify_and_update
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class VerifiedTokenCache:
+    """
+    LRU cache of verified JWT payloads keyed by a SHA-256 digest of the token.
+    Entries are dropped once the token's exp has passed.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])
+
+    def set(self, key: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        self._entries[key] = (float(exp), dict(payload))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        return {"size": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
 
 class AuthService:
     def __init__(self):
         self.secret_key = settings.secret_key
         self.algorithm = settings.algorithm
         self.access_token_expire_minutes = settings.access_token_expire_minutes
+        self.token_cache = VerifiedTokenCache(settings.token_cache_max_entries)
 
+    # Blocking versions for scripts; request handlers use password_hasher instead
     def hash_password(self, password: str) -> str:
-        return pwd_context.hash(password)
+        return hash_password(password)
 
     def verify_password(self, password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(password, hashed_password)
+        return verify_and_update(password, hashed_password)[0]
 
     def create_access_token(self, data: dict, expires_delta: timedelta | None = None) -> str:
         to_encode = data.copy()
@@ -33,15 +78,23 @@ class AuthService:
         return encoded_jwt
 
     def verify_token(self, token: str) -> dict | None:
+        # Tokens are reused for their whole lifetime, so skip re-verifying one we already trust
+        key = self.token_cache.digest(token)
+        payload = self.token_cache.get(key)
+        if payload is not None:
+            return payload
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return payload
         except JWTError:
             return None
+        self.token_cache.set(key, payload)
+        return payload
 
-    def update_last_login(self, db: Session, user: User) -> None:
+    async def update_last_login(self, db: AsyncSession, user: User) -> None:
         """Update the last login time for a user"""
-        user.last_login_at = datetime.now(timezone.utc)
-        db.commit()
+        # updated_at is set here rather than by its onupdate default, which would expire
+        # it on commit and cost another SELECT when the caller serializes the user
+        user.last_login_at = user.updated_at = datetime.now(timezone.utc)
+        await db.commit()
 
 auth_service = AuthService()
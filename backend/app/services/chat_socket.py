@@ -0,0 +1,201 @@
+import asyncio
+import json
+import math
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..dependencies.auth import AuthMiddleware
+from ..schemas.message import MessageCreate, MessageRole
+from .chat_turns import ConversationNotFoundError, start_chat_turn
+from .generations import Generation, ResumeGapError, generation_registry
+from .llm_backends import LLMUnavailableError
+from .llm_scheduler import LLMRateLimitedError, lane_for
+from .metrics import ws_active_connections, ws_active_generations
+from .openai_service import OpenAIService
+from .principal_cache import Principal
+
+
+class ChatSocket:
+    """
+    One authenticated chat WebSocket carrying turns for many conversations.
+
+    Client frames (JSON objects):
+        {"type": "send", "conversation_id": 1, "content": "..."}
+        {"type": "cancel", "conversation_id": 1}
+        {"type": "ping"}
+    Server frames (after {"type": "ready", "user_id"} once authenticated):
+        {"type": "started", "conversation_id", "message_id", "user_message_id"}
+        {"type": "delta", "conversation_id", "message_id", "seq", "content"}
+        {"type": "done", "conversation_id", "message_id", "cancelled"}
+        {"type": "error", "conversation_id", "status", "detail"}
+        {"type": "pong"}
+
+    Flow control is per socket: at most max_generations turns stream at once (one
+    per conversation), and outgoing frames pass through a bounded queue drained by
+    a single writer. Replies run as registry generations, so a slow reader only
+    falls behind in the generation buffer, and after a dropped socket the reply can
+    still be resumed over SSE (or is cancelled once abandoned).
+    """
+
+    def __init__(self, websocket: WebSocket, principal: Principal, service: OpenAIService):
+        self.websocket = websocket
+        self.principal = principal
+        self.service = service
+        self.max_generations = settings.ws_max_active_generations
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_send_queue_size)
+        self._turns: dict[int, asyncio.Task] = {}
+        self._generations: dict[int, Generation] = {}
+
+    async def run(self) -> None:
+        ws_active_connections.inc()
+        writer = asyncio.create_task(self._writer())
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                try:
+                    # Binary frames carry no "text"
+                    frame = json.loads(message["text"])
+                except (KeyError, TypeError, json.JSONDecodeError):
+                    await self._error(None, 400, "Frames must be JSON objects")
+                    continue
+                await self._dispatch(frame)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Stop reading; replies nobody resumes are cancelled after the abandon grace period
+            for task in self._turns.values():
+                task.cancel()
+            await asyncio.gather(*self._turns.values(), return_exceptions=True)
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+            ws_active_connections.dec()
+
+    async def _writer(self) -> None:
+        while True:
+            frame = await self._outbox.get()
+            await self.websocket.send_json(frame)
+
+    async def _send(self, frame: dict) -> None:
+        await self._outbox.put(frame)
+
+    async def _error(self, conversation_id: int | None, status_code: int, detail: str) -> None:
+        await self._send({"type": "error", "conversation_id": conversation_id, "status": status_code, "detail": detail})
+
+    async def _dispatch(self, frame) -> None:
+        frame_type = frame.get("type") if isinstance(frame, dict) else None
+        if frame_type == "send":
+            await self._start_turn(frame)
+        elif frame_type == "cancel":
+            conversation_id = frame.get("conversation_id")
+            if not isinstance(conversation_id, int) or isinstance(conversation_id, bool):
+                await self._error(None, 422, "conversation_id must be an integer")
+                return
+            generation = self._generations.get(conversation_id)
+            if generation is not None:
+                generation.cancel("user")
+            elif conversation_id in self._turns:
+                # Not streaming yet: abandon the turn before the upstream call
+                self._turns[conversation_id].cancel()
+        elif frame_type == "ping":
+            await self._send({"type": "pong"})
+        else:
+            await self._error(None, 400, f"Unknown frame type: {frame_type}")
+
+    async def _start_turn(self, frame: dict) -> None:
+        try:
+            message = MessageCreate(
+                conversation_id=frame.get("conversation_id"),
+                content=frame.get("content"),
+                role=MessageRole.USER
+            )
+        except ValidationError as e:
+            await self._error(frame.get("conversation_id"), 422, e.errors()[0]["msg"])
+            return
+        if message.conversation_id in self._turns:
+            await self._error(message.conversation_id, 409, "A reply is already streaming in this conversation")
+            return
+        if len(self._turns) >= self.max_generations:
+            await self._error(message.conversation_id, 429, "Too many replies streaming on this connection")
+            return
+        task = asyncio.create_task(self._run_turn(message))
+        self._turns[message.conversation_id] = task
+        task.add_done_callback(lambda _: self._turns.pop(message.conversation_id, None))
+
+    async def _run_turn(self, message: MessageCreate) -> None:
+        conversation_id = message.conversation_id
+        message_id = None
+        try:
+            # The session belongs to the generation once it starts, which closes it when done
+            db = AsyncSessionLocal()
+            turn = None
+            try:
+                # Re-check permissions per turn; served from the principal cache
+                principal = await AuthMiddleware.load_principal(self.principal.id, db)
+                if not principal.can_chat:
+                    raise HTTPException(status_code=403, detail="Chat access denied")
+                turn = await start_chat_turn(db, self.service, principal.id, message, lane=lane_for(principal.role))
+            except HTTPException as e:
+                await self._error(conversation_id, e.status_code, e.detail)
+                return
+            except ConversationNotFoundError:
+                await self._error(conversation_id, 404, "Conversation not found")
+                return
+            except LLMRateLimitedError as e:
+                await self._error(conversation_id, 429, f"Sending too quickly; retry in {math.ceil(e.retry_after)}s")
+                return
+            except LLMUnavailableError:
+                await self._error(conversation_id, 503, "AI service is not available. Please try again later.")
+                return
+            except Exception:
+                await self._error(conversation_id, 500, "Streaming failed")
+                return
+            finally:
+                if turn is None:
+                    await db.close()
+
+            generation = generation_registry.start(turn, principal.id, db)
+            message_id = generation.message_id
+            self._generations[conversation_id] = generation
+            ws_active_generations.inc()
+            try:
+                await self._send({
+                    "type": "started",
+                    "conversation_id": conversation_id,
+                    "message_id": message_id,
+                    "user_message_id": turn.user_message.id,
+                })
+                async for seq, content in generation.stream():
+                    await self._send({
+                        "type": "delta",
+                        "conversation_id": conversation_id,
+                        "message_id": message_id,
+                        "seq": seq,
+                        "content": content,
+                    })
+            except ResumeGapError:
+                await self._error(conversation_id, 409, "Reply outran this connection; reload the message")
+                return
+            finally:
+                self._generations.pop(conversation_id, None)
+                ws_active_generations.dec()
+                # Covers a turn cancelled before it began reading; otherwise already done by stream()
+                generation.abandon()
+            if generation.failed:
+                await self._error(conversation_id, 500, "Streaming failed")
+                return
+            await self._send({
+                "type": "done", "conversation_id": conversation_id, "message_id": message_id, "cancelled": generation.cancelled
+            })
+        except asyncio.CancelledError:
+            # Cancelled before streaming started, or the socket closed. Best effort: the
+            # writer is gone in the latter case
+            try:
+                self._outbox.put_nowait({
+                    "type": "done", "conversation_id": conversation_id, "message_id": message_id, "cancelled": True
+                })
+            except asyncio.QueueFull:
+                pass
+            raise
@@ -0,0 +1,126 @@
+from typing import AsyncIterator
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+from ..config import settings
+from ..models.conversation import Conversation
+from ..models.message import Message
+from ..schemas.message import MessageCreate
+from .message_buffer import MessageWriteBuffer
+from .llm_scheduler import LANE_INTERACTIVE
+from .openai_service import OpenAIService
+from .title_queue import title_queue, DEFAULT_TITLES
+from .token_counter import count_tokens
+
+# Completion budget for a chat reply
+REPLY_MAX_TOKENS = 1000
+
+
+class ConversationNotFoundError(LookupError):
+    """The conversation does not exist or belongs to another user"""
+
+
+class ChatTurn:
+    """A stored user message and the assistant reply being streamed for it"""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        conversation: Conversation,
+        user_message: Message,
+        assistant_message: Message,
+        deltas: AsyncIterator[str],
+        max_tokens: int = REPLY_MAX_TOKENS
+    ):
+        self.db = db
+        self.conversation = conversation
+        self.user_message = user_message
+        self.assistant_message = assistant_message
+        self.deltas = deltas
+        self.max_tokens = max_tokens
+
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        Yield the reply's content deltas while persisting them through a write-behind
+        buffer. The final flush also runs when the stream fails or the consumer stops
+        early, so partial replies are kept.
+        """
+        buffer = MessageWriteBuffer(self.db, self.assistant_message)
+        try:
+            async for content in self.deltas:
+                await buffer.append(content)
+                yield content
+        finally:
+            # Closes the upstream request when the consumer went away mid-stream
+            await self.deltas.aclose()
+            self.conversation.updated_at = func.now()
+            self.conversation.record_message_content(buffer.content)
+            self.assistant_message.token_count = count_tokens(buffer.content)
+            await buffer.flush()
+        if self.conversation.title in DEFAULT_TITLES:
+            # Generated in the background so the stream closes with the last token
+            title_queue.enqueue(self.conversation.id)
+
+
+async def start_chat_turn(
+    db: AsyncSession,
+    service: OpenAIService,
+    user_id: int,
+    message: MessageCreate,
+    lane: str = LANE_INTERACTIVE
+) -> ChatTurn:
+    """
+    Store a user message, build the context window and open the upstream stream.
+
+    An empty assistant placeholder is committed before the upstream call so the
+    reply has an id from the start; it is removed again if the call fails
+    (LLMUnavailableError, LLMRateLimitedError or anything else is re-raised).
+    The upstream call is scheduled in the given lane.
+    """
+    conversation = await db.scalar(select(Conversation).where(
+        Conversation.user_id == user_id, Conversation.id == message.conversation_id
+    ))
+    if not conversation:
+        raise ConversationNotFoundError(message.conversation_id)
+    user_message = Message(**message.model_dump(), user_id=user_id)
+    user_message.token_count = count_tokens(user_message.content)
+    db.add(user_message)
+    conversation.record_message(user_message.content)
+    conversation.updated_at = func.now()
+    await db.commit()
+    await db.refresh(user_message)
+    # Only the newest messages can fit in the context window, so don't load the whole thread
+    recent_messages = (await db.scalars(select(Message).where(
+        Message.conversation_id == message.conversation_id
+    ).order_by(Message.timestamp.desc(), Message.id.desc()).limit(settings.context_max_messages))).all()
+    conversation_messages = list(reversed(recent_messages))
+    for msg in conversation_messages:
+        # Backfill token counts for older rows; persisted with the next commit
+        if msg.token_count is None:
+            msg.token_count = count_tokens(msg.content)
+    message_dicts = [
+        {"role": msg.role, "content": msg.content, "token_count": msg.token_count}
+        for msg in conversation_messages
+    ]
+    formatted_messages = service.format_conversation_history(message_dicts)
+
+    assistant_message = Message(
+        conversation_id=message.conversation_id,
+        user_id=user_id,
+        content="",
+        role="assistant"
+    )
+    db.add(assistant_message)
+    conversation.record_message(assistant_message.content)
+    await db.commit()
+    await db.refresh(assistant_message)
+    try:
+        deltas = await service.stream_chat_completion(
+            formatted_messages, max_tokens=REPLY_MAX_TOKENS, user_id=user_id, lane=lane
+        )
+    except BaseException:
+        await db.delete(assistant_message)
+        conversation.message_count = Conversation.message_count - 1
+        await db.commit()
+        raise
+    return ChatTurn(db, conversation, user_message, assistant_message, deltas)
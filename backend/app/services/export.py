@@ -0,0 +1,196 @@
+import base64
+import json
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator
+from sqlalchemy import func, or_, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..models.conversation import Conversation
+from ..models.message import Message
+
+
+def encode_export_cursor(conversation_id: int, message_id: int) -> str:
+    """Encode an export position; message_id 0 means "before the conversation's first message" """
+    raw = json.dumps([conversation_id, message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_export_cursor(cursor: str) -> tuple[int, int]:
+    """Decode a token produced by encode_export_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        conversation_id, message_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(conversation_id), int(message_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+
+async def iter_export_rows(db: AsyncSession, user_id: int, after: str | None = None) -> AsyncIterator[list]:
+    """
+    Yield batches of (conversation, message) rows ordered by conversation id then message id.
+
+    Plain columns are selected (no ORM objects, so nothing accumulates in the
+    session) and streamed through a server-side cursor settings.export_batch_size
+    rows at a time. Conversations without messages appear once with a NULL message.
+    """
+    message_position = func.coalesce(Message.id, 0)
+    query = (
+        select(
+            Conversation.id.label("conversation_id"),
+            Conversation.title,
+            Conversation.created_at,
+            Conversation.updated_at,
+            Conversation.archived_at,
+            Message.id.label("message_id"),
+            Message.role,
+            Message.content,
+            Message.timestamp,
+        )
+        .outerjoin(Message, Message.conversation_id == Conversation.id)
+        .where(Conversation.user_id == user_id)
+        .order_by(Conversation.id, message_position)
+    )
+    if after:
+        conversation_id, message_id = decode_export_cursor(after)
+        query = query.where(or_(
+            Conversation.id > conversation_id,
+            and_(Conversation.id == conversation_id, message_position > message_id)
+        ))
+    result = await db.stream(query.execution_options(yield_per=settings.export_batch_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+def _conversation_record(row) -> dict:
+    return {
+        "id": row.conversation_id,
+        "title": row.title,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "archived_at": row.archived_at,
+    }
+
+
+def _message_record(row) -> dict:
+    return {
+        "id": row.message_id,
+        "conversation_id": row.conversation_id,
+        "role": row.role,
+        "content": row.content,
+        "timestamp": row.timestamp,
+    }
+
+
+async def stream_ndjson_export(db: AsyncSession, user_id: int, after: str | None = None) -> AsyncIterator[str]:
+    """
+    NDJSON export: a {"type": "conversation"} line before each conversation's
+    {"type": "message"} lines. Every line carries a cursor; passing the last one
+    received as after resumes the export (repeating the current conversation line).
+    """
+    current_conversation = None
+    async for rows in iter_export_rows(db, user_id, after):
+        lines = []
+        for row in rows:
+            if row.conversation_id != current_conversation:
+                current_conversation = row.conversation_id
+                lines.append(_dumps({
+                    "type": "conversation",
+                    **_conversation_record(row),
+                    "cursor": encode_export_cursor(row.conversation_id, 0),
+                }))
+            if row.message_id is not None:
+                lines.append(_dumps({
+                    "type": "message",
+                    **_message_record(row),
+                    "cursor": encode_export_cursor(row.conversation_id, row.message_id),
+                }))
+        # One chunk per database batch keeps writes large without holding more than a batch
+        yield "\n".join(lines) + "\n"
+
+
+class _ZipOutput:
+    """Write-only file object that hands bytes written by ZipFile back to the caller"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_zip_export(db: AsyncSession, user_id: int, after: str | None = None) -> AsyncIterator[bytes]:
+    """
+    Zip export with one conversations/<id>.json file per conversation
+    ({"conversation": {...}, "messages": [...]}) and a manifest.json whose cursor
+    resumes after the last exported message. The archive is compressed as it
+    streams, so only the current database batch is held in memory.
+    """
+    output = _ZipOutput()
+    archive = zipfile.ZipFile(output, mode="w", compression=zipfile.ZIP_DEFLATED)
+    entry = None
+    first_message = True
+    current_conversation = None
+    conversations = 0
+    messages = 0
+    last_cursor = after
+
+    def close_entry():
+        if entry is not None:
+            entry.write(b"]}")
+            entry.close()
+
+    async for rows in iter_export_rows(db, user_id, after):
+        for row in rows:
+            if row.conversation_id != current_conversation:
+                close_entry()
+                current_conversation = row.conversation_id
+                conversations += 1
+                entry = archive.open(f"conversations/{row.conversation_id}.json", mode="w", force_zip64=True)
+                entry.write(('{"conversation":' + _dumps(_conversation_record(row)) + ',"messages":[').encode())
+                first_message = True
+                last_cursor = encode_export_cursor(row.conversation_id, 0)
+            if row.message_id is not None:
+                entry.write(((b"" if first_message else b",") + _dumps(_message_record(row)).encode()))
+                first_message = False
+                messages += 1
+                last_cursor = encode_export_cursor(row.conversation_id, row.message_id)
+        data = output.drain()
+        if data:
+            yield data
+
+    close_entry()
+    archive.writestr("manifest.json", _dumps({
+        "user_id": user_id,
+        "exported_at": datetime.now(timezone.utc),
+        "conversations": conversations,
+        "messages": messages,
+        "resumed_after": after,
+        "cursor": last_cursor,
+    }))
+    archive.close()
+    yield output.drain()
@@ -0,0 +1,227 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from .chat_turns import ChatTurn
+from .metrics import llm_cancelled_tokens_saved_total, llm_generations_cancelled_total
+
+# Why a reply was cancelled: a cancel request, no client left reading it, or server shutdown
+CANCEL_REASONS = ("user", "disconnect", "shutdown")
+
+
+class ResumeGapError(Exception):
+    """The requested resume point has already dropped out of the generation's buffer"""
+
+
+class Generation:
+    """
+    An assistant reply streaming in a background task, detached from any one client.
+
+    Each delta gets a sequence number starting at 1, used as the SSE event id. The
+    most recent max_events deltas are kept in a ring buffer so readers can join
+    or rejoin at any point still buffered without another upstream call.
+
+    cancel() stops the reply: the upstream request is closed and the partial
+    content is persisted once. A reply nobody has been reading for abandon_grace
+    seconds is cancelled the same way, which leaves time to resume after a drop.
+    """
+
+    def __init__(self, turn: ChatTurn, user_id: int, max_events: int, abandon_grace: float = 0.0):
+        self.turn = turn
+        self.user_id = user_id
+        self.message_id = turn.assistant_message.id
+        self.conversation_id = turn.conversation.id
+        self.events: deque[str] = deque(maxlen=max_events)
+        self.last_event_id = 0
+        self.done = False
+        self.failed = False
+        self.cancel_reason: str | None = None
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self.readers = 0
+        self.abandon_grace = abandon_grace
+        self._abandon_timer: asyncio.TimerHandle | None = None
+        self._running = False
+        self._changed = asyncio.Condition()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    @property
+    def first_buffered_id(self) -> int:
+        return self.last_event_id - len(self.events) + 1
+
+    def cancel(self, reason: str) -> bool:
+        """Stop an unfinished reply; returns False if it already ended or is being cancelled"""
+        if self.done or self.cancelled or self.task is None:
+            return False
+        # Only the first cancel interrupts the task; a second one could cut the final flush short
+        self.cancel_reason = reason
+        if self._running:
+            self.task.cancel()
+        else:
+            # A task cancelled before its first step never enters run(), which would leave the
+            # upstream request and the session open; let it start, then interrupt it
+            asyncio.get_running_loop().call_soon(self.task.cancel)
+        return True
+
+    async def run(self, db: AsyncSession) -> None:
+        """Drain the upstream stream into the buffer; owns (and closes) the turn's session"""
+        self._running = True
+        try:
+            async for content in self.turn.stream():
+                async with self._changed:
+                    self.events.append(content)
+                    self.last_event_id += 1
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            # turn.stream() has closed the upstream request and persisted the partial reply
+            if self.cancel_reason is None:
+                self.cancel_reason = "shutdown"
+            llm_generations_cancelled_total.inc(reason=self.cancel_reason)
+            generated = self.turn.assistant_message.token_count or 0
+            llm_cancelled_tokens_saved_total.inc(max(self.turn.max_tokens - generated, 0))
+        except Exception:
+            self.failed = True
+        finally:
+            if self._abandon_timer is not None:
+                self._abandon_timer.cancel()
+            async with self._changed:
+                self.done = True
+                self.finished_at = time.monotonic()
+                self._changed.notify_all()
+            await db.close()
+
+    def abandon(self) -> None:
+        """Start the abandon grace period if nobody is reading the reply (cancel now without one)"""
+        if self.readers or self.done or self._abandon_timer is not None:
+            return
+        if self.abandon_grace <= 0:
+            self.cancel("disconnect")
+        else:
+            self._abandon_timer = asyncio.get_running_loop().call_later(self.abandon_grace, self._abandon_expired)
+
+    def _abandon_expired(self) -> None:
+        self._abandon_timer = None
+        if not self.readers:
+            self.cancel("disconnect")
+
+    def _reader_left(self) -> None:
+        self.readers -= 1
+        self.abandon()
+
+    async def stream(self, after: int = 0) -> AsyncIterator[tuple[int, str]]:
+        """Yield (event id, delta) pairs after the given event id until the reply ends"""
+        if after < 0 or after > self.last_event_id:
+            raise ResumeGapError(f"Unknown event id {after}")
+        position = after
+        self.readers += 1
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+        try:
+            while True:
+                async with self._changed:
+                    while position == self.last_event_id and not self.done:
+                        await self._changed.wait()
+                    if position + 1 < self.first_buffered_id:
+                        raise ResumeGapError(f"Event {position + 1} is no longer buffered")
+                    start = len(self.events) - (self.last_event_id - position)
+                    pending = list(self.events)[start:]
+                    done = self.done
+                for content in pending:
+                    position += 1
+                    yield position, content
+                if done and position == self.last_event_id:
+                    return
+        finally:
+            self._reader_left()
+
+
+class GenerationRegistry:
+    """
+    In-flight and recently completed generations, keyed by assistant message id.
+
+    Completed generations stay resumable for ttl_seconds; beyond max_entries the
+    oldest completed ones are dropped first. In-flight generations are never evicted.
+    The registry is per process, like the other in-memory caches, so resume and
+    cancel requests must reach the worker that started the reply.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_events: int, abandon_grace: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_events = max_events
+        self.abandon_grace = abandon_grace
+        self._entries: OrderedDict[int, Generation] = OrderedDict()
+        self.started = 0
+        self.resumed = 0
+
+    def start(self, turn: ChatTurn, user_id: int, db: AsyncSession) -> Generation:
+        self.prune()
+        generation = Generation(turn, user_id, self.max_events, self.abandon_grace)
+        # A fresh context, so the reply's queries are not charged to the request that started it
+        generation.task = asyncio.create_task(generation.run(db), context=contextvars.Context())
+        self._entries[generation.message_id] = generation
+        self.started += 1
+        return generation
+
+    def get(self, message_id: int, user_id: int) -> Generation | None:
+        self.prune()
+        generation = self._entries.get(message_id)
+        if generation is None or generation.user_id != user_id:
+            return None
+        return generation
+
+    def in_flight(self, conversation_id: int, user_id: int) -> list[Generation]:
+        return [
+            generation for generation in self._entries.values()
+            if generation.conversation_id == conversation_id and generation.user_id == user_id and not generation.done
+        ]
+
+    def prune(self) -> None:
+        now = time.monotonic()
+        completed = [
+            message_id for message_id, generation in self._entries.items()
+            if generation.done
+        ]
+        overflow = len(self._entries) - self.max_entries
+        for message_id in completed:
+            generation = self._entries[message_id]
+            if overflow > 0 or now - generation.finished_at >= self.ttl_seconds:
+                del self._entries[message_id]
+                overflow -= 1
+
+    async def stop(self) -> None:
+        for generation in self._entries.values():
+            generation.cancel("shutdown")
+        tasks = [generation.task for generation in self._entries.values() if generation.task]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        self.prune()
+        in_flight = sum(1 for generation in self._entries.values() if not generation.done)
+        return {
+            "buffered": len(self._entries),
+            "in_flight": in_flight,
+            "abandon_grace_seconds": self.abandon_grace,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "started": self.started,
+            "resumed": self.resumed,
+            "cancelled": {reason: int(llm_generations_cancelled_total.value(reason=reason)) for reason in CANCEL_REASONS},
+            "cancelled_tokens_saved": int(llm_cancelled_tokens_saved_total.value()),
+        }
+
+
+generation_registry = GenerationRegistry(
+    max_entries=settings.generation_buffer_max_entries,
+    ttl_seconds=settings.generation_buffer_ttl_seconds,
+    max_events=settings.generation_buffer_max_events,
+    abandon_grace=settings.generation_abandon_grace_seconds
+)
@@ -0,0 +1,229 @@
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable
+from pydantic import ValidationError
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from ..config import settings
+from ..database import async_engine
+from ..models.conversation import Conversation, make_preview
+from ..models.message import Message
+from ..models.user import User
+from ..schemas.conversation import ConversationImport
+
+MAX_REPORTED_ERRORS = 100
+
+CONVERSATION_COLUMNS = (
+    "id", "user_id", "title", "created_at", "updated_at",
+    "message_count", "last_message_at", "last_message_preview",
+)
+MESSAGE_COLUMNS = ("conversation_id", "user_id", "role", "content", "timestamp")
+# Longer titles would fail the whole batch's insert on Postgres (and be stored untruncated on SQLite)
+TITLE_MAX_LENGTH = Conversation.__table__.c.title.type.length
+
+
+class ImportStats:
+    """Progress counters for a bulk import"""
+
+    def __init__(self):
+        self.conversations = 0
+        self.messages = 0
+        self.skipped = 0
+        self.errors: list[str] = []
+        self.started = time.perf_counter()
+
+    def record_error(self, line_number: int, reason: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_number}: {reason}")
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return (self.conversations + self.messages) / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "conversations": self.conversations,
+            "messages": self.messages,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def _as_utc(value: datetime | None, default: datetime) -> datetime:
+    if value is None:
+        return default
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+class ConversationImporter:
+    """
+    Batched bulk loader for conversations and their messages.
+
+    Lines are validated with ConversationImport and buffered until batch_size
+    messages are pending; each batch is written in one transaction. On Postgres
+    (asyncpg) conversation ids are reserved from the sequence and both tables are
+    loaded with COPY; other databases use executemany inserts. The denormalized
+    conversation stats are computed here rather than per message.
+    """
+
+    def __init__(
+        self,
+        connection: AsyncConnection,
+        default_user_id: int | None = None,
+        batch_size: int | None = None,
+        on_batch: Callable[[ImportStats], None] | None = None
+    ):
+        self.connection = connection
+        self.default_user_id = default_user_id
+        self.batch_size = batch_size or settings.import_batch_size
+        self.on_batch = on_batch
+        self.stats = ImportStats()
+        self.use_copy = connection.dialect.driver == "asyncpg"
+        self._batch: list[tuple[int, ConversationImport]] = []
+        self._pending_messages = 0
+        self._known_users: set[int] = set()
+
+    async def run(self, lines: AsyncIterator[str]) -> ImportStats:
+        line_number = 0
+        async for line in lines:
+            line_number += 1
+            await self.add_line(line_number, line)
+        await self.flush()
+        return self.stats
+
+    async def add_line(self, line_number: int, line: str) -> None:
+        if not line.strip():
+            return
+        try:
+            conversation = ConversationImport.model_validate_json(line)
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            self.stats.record_error(line_number, f"{location}: {error['msg']}" if location else error["msg"])
+            return
+        if conversation.user_id is None and self.default_user_id is None:
+            self.stats.record_error(line_number, "user_id is required when no default user is given")
+            return
+        if conversation.title and len(conversation.title) > TITLE_MAX_LENGTH:
+            self.stats.record_error(line_number, f"title: longer than {TITLE_MAX_LENGTH} characters")
+            return
+        self._batch.append((line_number, conversation))
+        self._pending_messages += len(conversation.messages) + 1
+        if self._pending_messages >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch, self._pending_messages = self._batch, [], 0
+        await self._check_users(batch)
+
+        now = datetime.now(timezone.utc)
+        conversation_rows = []
+        message_rows = []
+        for line_number, conversation in batch:
+            user_id = self._user_id(conversation)
+            if user_id not in self._known_users:
+                self.stats.record_error(line_number, f"user {user_id} does not exist")
+                continue
+            created_at = _as_utc(conversation.created_at, now)
+            messages = [
+                (message.role.value, message.content, _as_utc(message.timestamp, created_at))
+                for message in conversation.messages
+            ]
+            last_message_at = messages[-1][2] if messages else None
+            conversation_rows.append({
+                "user_id": user_id,
+                "title": conversation.title or "New Chat",
+                "created_at": created_at,
+                "updated_at": _as_utc(conversation.updated_at, last_message_at or created_at),
+                "message_count": len(messages),
+                "last_message_at": last_message_at,
+                "last_message_preview": make_preview(messages[-1][1]) if messages else None,
+            })
+            message_rows.append([(user_id, role, content, timestamp) for role, content, timestamp in messages])
+
+        if conversation_rows:
+            conversation_ids = await self._insert_conversations(conversation_rows)
+            await self._insert_messages([
+                (conversation_id, *message)
+                for conversation_id, messages in zip(conversation_ids, message_rows)
+                for message in messages
+            ])
+            await self.connection.commit()
+            self.stats.conversations += len(conversation_rows)
+            self.stats.messages += sum(len(messages) for messages in message_rows)
+        if self.on_batch:
+            self.on_batch(self.stats)
+
+    def _user_id(self, conversation: ConversationImport) -> int:
+        return conversation.user_id if conversation.user_id is not None else self.default_user_id
+
+    async def _check_users(self, batch: list[tuple[int, ConversationImport]]) -> None:
+        unknown = {self._user_id(conversation) for _, conversation in batch} - self._known_users
+        if unknown:
+            found = await self.connection.scalars(select(User.id).where(User.id.in_(unknown)))
+            self._known_users.update(found)
+
+    async def _insert_conversations(self, rows: list[dict]) -> list[int]:
+        if self.use_copy:
+            ids = (await self.connection.scalars(
+                text("SELECT nextval(pg_get_serial_sequence('conversations', 'id')) FROM generate_series(1, :n)"),
+                {"n": len(rows)}
+            )).all()
+            await self._copy("conversations", CONVERSATION_COLUMNS, [
+                (conversation_id, *(row[column] for column in CONVERSATION_COLUMNS[1:]))
+                for conversation_id, row in zip(ids, rows)
+            ])
+            return ids
+        table = Conversation.__table__
+        if self.connection.dialect.name == "sqlite":
+            # Ordered RETURNING runs row by row on SQLite. The first insert takes the database
+            # write lock instead, so the following ids can be assigned without racing other writers.
+            first_id = (await self.connection.execute(insert(table).returning(table.c.id), rows[:1])).scalar_one()
+            ids = list(range(first_id, first_id + len(rows)))
+            if len(rows) > 1:
+                await self.connection.execute(insert(table), [
+                    {"id": conversation_id, **row} for conversation_id, row in zip(ids[1:], rows[1:])
+                ])
+            return ids
+        result = await self.connection.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            rows
+        )
+        return list(result.scalars())
+
+    async def _insert_messages(self, records: list[tuple]) -> None:
+        if not records:
+            return
+        if self.use_copy:
+            await self._copy("messages", MESSAGE_COLUMNS, records)
+            return
+        await self.connection.execute(
+            insert(Message.__table__),
+            [dict(zip(MESSAGE_COLUMNS, record)) for record in records]
+        )
+
+    async def _copy(self, table: str, columns: tuple[str, ...], records: list[tuple]) -> None:
+        raw_connection = await self.connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(table, records=records, columns=list(columns))
+
+
+async def import_jsonl(
+    lines: AsyncIterator[str],
+    default_user_id: int | None = None,
+    batch_size: int | None = None,
+    on_batch: Callable[[ImportStats], None] | None = None
+) -> ImportStats:
+    """Import JSONL conversations (see ConversationImport) on a dedicated connection"""
+    async with async_engine.connect() as connection:
+        importer = ConversationImporter(connection, default_user_id, batch_size, on_batch)
+        return await importer.run(lines)
@@ -0,0 +1,565 @@
+import asyncio
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List
+from urllib.parse import parse_qs, urlparse
+import httpx
+import openai
+from openai.types.chat import ChatCompletionMessageParam
+from ..config import settings
+from .metrics import llm_backend_requests_total, llm_circuit_state, llm_retries_total, llm_short_circuited_total
+
+# Circuit breaker states, in the order used for the llm_circuit_state gauge
+CIRCUIT_STATES = ("closed", "half_open", "open")
+
+# Upstream statuses worth retrying; other 4xx responses fail the same way every time
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429})
+
+# Most retries the budget can bank, so a quiet period cannot fund a retry storm later
+RETRY_BUDGET_MAX_BALANCE = 50
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no registered backend could serve a request"""
+
+
+class LLMCircuitOpenError(LLMUnavailableError):
+    """Every backend's circuit is open, so the request was refused without calling upstream"""
+
+
+class LLMBackend(ABC):
+    """
+    A chat completion endpoint.
+
+    stream_chat is an async generator of non-empty content deltas; errors
+    opening the upstream request surface on the first iteration.
+    """
+
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether a failed request might succeed if sent again"""
+        return isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError))
+
+    @abstractmethod
+    def stream_chat(
+        self,
+        messages: List[ChatCompletionMessageParam],
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[str]:
+        ...
+
+    @abstractmethod
+    async def complete(
+        self,
+        messages: List[ChatCompletionMessageParam],
+        max_tokens: int,
+        temperature: float
+    ) -> str:
+        ...
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    api.openai.com or any server speaking the OpenAI chat completions API.
+
+    Requests go through http_client, shared by all such backends so they reuse one
+    tuned connection pool. The SDK's own retries are disabled; the router retries.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        api_key: str,
+        base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None
+    ):
+        super().__init__(name, model)
+        self.base_url = base_url
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=http_client,
+            **({"timeout": http_client.timeout} if http_client is not None else {})
+        )
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+        return isinstance(error, openai.APIConnectionError) or super().is_retryable(error)
+
+    async def stream_chat(self, messages, max_tokens, temperature):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        try:
+            async for chunk in response:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    yield content
+        finally:
+            await response.response.aclose()
+
+    async def complete(self, messages, max_tokens, temperature):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        return response.choices[0].message.content or ""
+
+
+class LocalBackend(LLMBackend):
+    """
+    Deterministic stand-in for tests and local development.
+
+    Replies echo the last user message, so the same prompt always produces the
+    same tokens. ttft and tokens_per_second simulate upstream latency; fail
+    makes every request raise so failover can be exercised.
+    """
+
+    def __init__(
+        self,
+        name: str = "local",
+        model: str = "local-echo",
+        ttft: float = 0.0,
+        tokens_per_second: float = 0.0,
+        fail: bool = False
+    ):
+        super().__init__(name, model)
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.fail = fail
+
+    def reply_for(self, messages: List[ChatCompletionMessageParam], max_tokens: int) -> List[str]:
+        prompt = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        words = f"Local reply to: {prompt}".split()[:max_tokens]
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    async def _start(self) -> None:
+        if self.ttft:
+            await asyncio.sleep(self.ttft)
+        if self.fail:
+            raise ConnectionError(f"Local backend {self.name} is configured to fail")
+
+    async def stream_chat(self, messages, max_tokens, temperature):
+        await self._start()
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for i, token in enumerate(self.reply_for(messages, max_tokens)):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield token
+
+    async def complete(self, messages, max_tokens, temperature):
+        await self._start()
+        return "".join(self.reply_for(messages, max_tokens))
+
+
+class EndpointHealth:
+    """
+    Exponentially weighted latency and error rate for one backend, plus its circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and the backend
+    gets no traffic for cooldown_seconds. It then turns half-open: a single probe
+    request is let through, which closes the circuit on success or reopens it for
+    another cooldown on failure.
+    """
+
+    def __init__(self, alpha: float, failure_threshold: int, cooldown_seconds: float):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.latency_ewma: float | None = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.unavailable_until = 0.0
+        self.probing = False
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def state(self) -> str:
+        if not self.unavailable_until:
+            return "closed"
+        return "open" if self.unavailable_until > time.monotonic() else "half_open"
+
+    def allows_request(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def record_success(self, latency: float) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.unavailable_until = 0.0
+        self.error_rate *= 1 - self.alpha
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.alpha * (latency - self.latency_ewma)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.error_rate += self.alpha * (1 - self.error_rate)
+        # A failed half-open probe reopens the circuit straight away
+        if self.unavailable_until or self.consecutive_failures >= self.failure_threshold:
+            self.unavailable_until = time.monotonic() + self.cooldown_seconds
+
+    def score(self) -> float:
+        """Expected seconds until a successful first token; untried endpoints score 0 so they get probed"""
+        if self.latency_ewma is None:
+            return float("inf") if self.failures else 0.0
+        return self.latency_ewma / max(1 - self.error_rate, 0.05)
+
+    def snapshot(self) -> dict:
+        return {
+            "circuit": self.state,
+            "latency_ewma_ms": self.latency_ewma * 1000 if self.latency_ewma is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent traffic: every request deposits ratio and
+    every retry withdraws one, plus a steady min_per_second allowance so a quiet
+    service can still retry. When upstream is failing, retries stop at ratio extra
+    load instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.balance = min(min_per_second * 10, RETRY_BUDGET_MAX_BALANCE)
+        self.updated = time.monotonic()
+
+    def _refill(self, amount: float) -> None:
+        now = time.monotonic()
+        self.balance = min(
+            self.balance + amount + (now - self.updated) * self.min_per_second,
+            RETRY_BUDGET_MAX_BALANCE
+        )
+        self.updated = now
+
+    def deposit(self) -> None:
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill(0)
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class LLMRouter:
+    """
+    Routes requests across registered backends by observed latency and error rate.
+
+    Backends are tried fastest-first. A backend that errors or does not produce a
+    first token within first_token_timeout is skipped for the next one, and after
+    failure_threshold consecutive failures its circuit opens (see EndpointHealth).
+    Backends with an open circuit are not called at all; when every circuit is open
+    requests fail fast with LLMCircuitOpenError. Once a stream has produced its
+    first token it stays on that backend, since replaying on another would
+    duplicate text.
+
+    When every backend failed with a retryable error, the whole pass is retried up
+    to max_retries times after a full-jitter exponential backoff, as long as the
+    retry budget allows.
+    """
+
+    def __init__(
+        self,
+        first_token_timeout: float,
+        request_timeout: float,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        ewma_alpha: float = 0.2,
+        explore_ratio: float = 0.0,
+        max_retries: int = 0,
+        retry_base_delay: float = 0.25,
+        retry_max_delay: float = 4.0,
+        retry_budget: RetryBudget | None = None,
+        http_client: httpx.AsyncClient | None = None
+    ):
+        self.first_token_timeout = first_token_timeout
+        self.request_timeout = request_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.ewma_alpha = ewma_alpha
+        self.explore_ratio = explore_ratio
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.retry_budget = retry_budget or RetryBudget(ratio=0.2, min_per_second=1.0)
+        # Shared by the OpenAI-compatible backends; closed by aclose()
+        self.http_client = http_client
+        self.backends: list[LLMBackend] = []
+        self.health: dict[str, EndpointHealth] = {}
+
+    def register(self, backend: LLMBackend) -> LLMBackend:
+        if backend.name in self.health:
+            raise ValueError(f"LLM backend {backend.name!r} is already registered")
+        self.backends.append(backend)
+        self.health[backend.name] = EndpointHealth(self.ewma_alpha, self.failure_threshold, self.cooldown_seconds)
+        llm_circuit_state.set(0, backend=backend.name)
+        return backend
+
+    async def aclose(self) -> None:
+        if self.http_client is not None:
+            await self.http_client.aclose()
+
+    def _refresh_circuit(self, backend: LLMBackend) -> str:
+        state = self.health[backend.name].state
+        llm_circuit_state.set(CIRCUIT_STATES.index(state), backend=backend.name)
+        return state
+
+    def ordered(self) -> list[LLMBackend]:
+        """Backends that may be tried now, in the order they should be tried"""
+        closed = []
+        half_open = []
+        for backend in self.backends:
+            state = self._refresh_circuit(backend)
+            if state == "closed":
+                closed.append(backend)
+            elif self.health[backend.name].allows_request():
+                half_open.append(backend)
+        closed.sort(key=lambda b: self.health[b.name].score())
+        if len(closed) > 1 and self.explore_ratio and random.random() < self.explore_ratio:
+            # Occasionally probe a slower backend so its latency estimate can recover
+            closed.insert(0, closed.pop(random.randrange(1, len(closed))))
+        return closed + half_open
+
+    def _record_failure(self, backend: LLMBackend) -> None:
+        self.health[backend.name].record_failure()
+        self._refresh_circuit(backend)
+        llm_backend_requests_total.inc(backend=backend.name, outcome="error")
+
+    def _record_success(self, backend: LLMBackend, latency: float) -> None:
+        self.health[backend.name].record_success(latency)
+        self._refresh_circuit(backend)
+        llm_backend_requests_total.inc(backend=backend.name, outcome="success")
+
+    def _begin_attempt(self, backend: LLMBackend) -> None:
+        # A half-open backend takes one probe at a time; cleared when the attempt ends
+        health = self.health[backend.name]
+        health.probing = health.state == "half_open"
+
+    async def _attempts(self) -> AsyncIterator[list[LLMBackend]]:
+        """
+        Yield the backends to try on each pass; the caller breaks out on success or
+        on a non-retryable failure. Raises LLMCircuitOpenError when nothing may be tried.
+        """
+        self.retry_budget.deposit()
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                if not self.retry_budget.withdraw():
+                    llm_retries_total.inc(result="budget_exhausted")
+                    return
+                llm_retries_total.inc(result="retried")
+                delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+            backends = self.ordered()
+            if not backends:
+                if self.backends:
+                    llm_short_circuited_total.inc()
+                    raise LLMCircuitOpenError("Circuit open for every LLM backend")
+                return
+            yield backends
+
+    async def stream_chat(
+        self,
+        messages: List[ChatCompletionMessageParam],
+        max_tokens: int,
+        temperature: float
+    ) -> tuple[LLMBackend, AsyncIterator[str]]:
+        """Open a stream on the best backend that produces a first token in time"""
+        errors = []
+        async for backends in self._attempts():
+            retryable = False
+            for backend in backends:
+                self._begin_attempt(backend)
+                started = time.perf_counter()
+                stream = backend.stream_chat(messages, max_tokens=max_tokens, temperature=temperature)
+                try:
+                    first = await asyncio.wait_for(anext(stream), self.first_token_timeout)
+                except StopAsyncIteration:
+                    first = None
+                except Exception as e:
+                    await stream.aclose()
+                    self._record_failure(backend)
+                    errors.append(f"{backend.name}: {type(e).__name__}")
+                    retryable = retryable or backend.is_retryable(e)
+                    continue
+                finally:
+                    self.health[backend.name].probing = False
+                self._record_success(backend, time.perf_counter() - started)
+                return backend, self._relay(backend, first, stream)
+            if not retryable:
+                break
+        raise LLMUnavailableError(self._describe_failure(errors))
+
+    async def _relay(self, backend: LLMBackend, first: str | None, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        try:
+            if first is not None:
+                yield first
+            async for content in stream:
+                yield content
+        except Exception:
+            self._record_failure(backend)
+            raise
+        finally:
+            await stream.aclose()
+
+    async def complete(
+        self,
+        messages: List[ChatCompletionMessageParam],
+        max_tokens: int,
+        temperature: float
+    ) -> str:
+        """Run a non-streaming completion, failing over until one backend answers"""
+        errors = []
+        async for backends in self._attempts():
+            retryable = False
+            for backend in backends:
+                self._begin_attempt(backend)
+                started = time.perf_counter()
+                try:
+                    content = await asyncio.wait_for(
+                        backend.complete(messages, max_tokens=max_tokens, temperature=temperature),
+                        self.request_timeout
+                    )
+                except Exception as e:
+                    self._record_failure(backend)
+                    errors.append(f"{backend.name}: {type(e).__name__}")
+                    retryable = retryable or backend.is_retryable(e)
+                    continue
+                finally:
+                    self.health[backend.name].probing = False
+                self._record_success(backend, time.perf_counter() - started)
+                return content
+            if not retryable:
+                break
+        raise LLMUnavailableError(self._describe_failure(errors))
+
+    def _describe_failure(self, errors: list[str]) -> str:
+        if not self.backends:
+            return "No LLM backends are configured"
+        return "All LLM backends failed (" + ", ".join(errors) + ")"
+
+    def snapshot(self) -> dict:
+        return {
+            "order": [b.name for b in self.ordered()],
+            "backends": [
+                {"name": b.name, "model": b.model, **self.health[b.name].snapshot()}
+                for b in self.backends
+            ],
+            "max_retries": self.max_retries,
+            "retry_budget": round(self.retry_budget.balance, 2),
+            "retries": {
+                result: int(llm_retries_total.value(result=result)) for result in ("retried", "budget_exhausted")
+            },
+            "short_circuited": int(llm_short_circuited_total.value()),
+        }
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Connection pool and timeouts shared by the OpenAI-compatible backends"""
+    http2 = settings.llm_http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("Warning: LLM_HTTP2 requires the h2 package (pip install httpx[http2]); using HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive_connections,
+            keepalive_expiry=settings.llm_http_keepalive_expiry_seconds
+        ),
+        # read bounds the gap between streamed chunks, so a stalled stream fails instead of hanging
+        timeout=httpx.Timeout(
+            settings.llm_read_timeout_seconds,
+            connect=settings.llm_connect_timeout_seconds,
+            pool=settings.llm_connect_timeout_seconds
+        )
+    )
+
+
+def create_backend(name: str, url: str, http_client: httpx.AsyncClient | None = None) -> LLMBackend:
+    """
+    Build a backend from an LLM_BACKENDS entry.
+
+    local://?ttft=0.2&tokens_per_second=50 creates a LocalBackend; anything else
+    is an OpenAI-compatible base URL ("default" means api.openai.com). The model
+    and API key can be overridden per backend with LLM_BACKEND_<NAME>_MODEL and
+    LLM_BACKEND_<NAME>_API_KEY.
+    """
+    env_prefix = f"LLM_BACKEND_{name.upper()}_"
+    parsed = urlparse(url)
+    if parsed.scheme == "local":
+        options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        return LocalBackend(
+            name=name,
+            model=os.getenv(env_prefix + "MODEL", "local-echo"),
+            ttft=float(options.get("ttft", 0)),
+            tokens_per_second=float(options.get("tokens_per_second", 0)),
+            fail=options.get("fail", "false").lower() == "true"
+        )
+    return OpenAICompatibleBackend(
+        name=name,
+        model=os.getenv(env_prefix + "MODEL", settings.llm_model),
+        api_key=os.getenv(env_prefix + "API_KEY", settings.openai_api_key),
+        base_url=None if url == "default" else url,
+        http_client=http_client
+    )
+
+
+def create_router() -> LLMRouter:
+    router = LLMRouter(
+        first_token_timeout=settings.llm_first_token_timeout_seconds,
+        request_timeout=settings.llm_request_timeout_seconds,
+        failure_threshold=settings.llm_failure_threshold,
+        cooldown_seconds=settings.llm_failure_cooldown_seconds,
+        explore_ratio=settings.llm_explore_ratio,
+        max_retries=settings.llm_max_retries,
+        retry_base_delay=settings.llm_retry_base_delay_seconds,
+        retry_max_delay=settings.llm_retry_max_delay_seconds,
+        retry_budget=RetryBudget(
+            ratio=settings.llm_retry_budget_ratio,
+            min_per_second=settings.llm_retry_budget_min_per_second
+        ),
+        http_client=create_http_client()
+    )
+    # "name=url,name=url"; without LLM_BACKENDS a single backend uses the OpenAI settings
+    entries = [entry.strip() for entry in settings.llm_backends.split(",") if entry.strip()]
+    if not entries:
+        entries = [f"openai={settings.openai_base_url or 'default'}"]
+    for entry in entries:
+        name, _, url = entry.partition("=")
+        try:
+            router.register(create_backend(name.strip(), url.strip() or "default", router.http_client))
+        except Exception as e:
+            print(f"Warning: LLM backend {name.strip()!r} could not be initialized: {e}")
+    return router
+
+
+llm_router = create_router()
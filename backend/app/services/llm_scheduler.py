@@ -0,0 +1,275 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+from ..config import settings
+from ..models.user import UserRole
+from .llm_backends import LLMUnavailableError
+from .metrics import (
+    llm_scheduler_in_flight,
+    llm_scheduler_queue_depth,
+    llm_scheduler_rejections_total,
+    llm_scheduler_wait_seconds,
+)
+
+# Priority lanes, highest default weight first
+LANE_ADMIN = "admin"
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+LANES = (LANE_ADMIN, LANE_INTERACTIVE, LANE_BACKGROUND)
+
+# Per-user buckets kept; the least recently used are dropped beyond this
+MAX_TRACKED_USERS = 10000
+
+
+def lane_for(role: UserRole | str) -> str:
+    """Lane for a user's interactive requests"""
+    return LANE_ADMIN if role == UserRole.ADMIN else LANE_INTERACTIVE
+
+
+def parse_lane_weights(value: str) -> dict[str, float]:
+    """Parse "admin=4,interactive=3,background=1"; lanes left out keep weight 1"""
+    weights = dict.fromkeys(LANES, 1.0)
+    for entry in value.split(","):
+        name, _, weight = entry.partition("=")
+        if name.strip() in weights and weight.strip():
+            weights[name.strip()] = max(float(weight), 0.01)
+    return weights
+
+
+class LLMRateLimitedError(Exception):
+    """The user has used up their request budget; retry_after is seconds until the next request fits"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM request budget exhausted, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class LLMOverloadedError(LLMUnavailableError):
+    """The scheduler queue is full or a request waited past its deadline"""
+
+
+class TokenBucket:
+    """Allows bursts of up to capacity requests, refilling at rate requests per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        Take one token and return how many seconds until it is actually available
+        (0 if it is now). The balance may go negative; refund() gives it back.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class LLMScheduler:
+    """
+    Admission control in front of every upstream LLM call.
+
+    At most max_concurrency calls run at once. Each user has a token bucket of
+    user_burst requests refilling at user_rate per second; a request whose token
+    will not be available before its lane's deadline is rejected with
+    LLMRateLimitedError, otherwise it waits for the token.
+
+    When every slot is busy, requests queue per lane and per user. Free slots go
+    to lanes by weighted fair queueing (a lane with weight 3 gets three slots for
+    every one of a weight-1 lane while both are waiting) and round-robin across
+    users within a lane, so one user's backlog cannot starve the others. A request
+    still queued at its deadline, or arriving when max_queued are already waiting,
+    fails with LLMOverloadedError. A request that is rejected or cancelled before it
+    gets a slot gives its token back.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        lane_weights: dict[str, float],
+        user_burst: int,
+        user_rate: float,
+        max_queued: int,
+        queue_deadlines: dict[str, float]
+    ):
+        self.max_concurrency = max_concurrency
+        self.lane_weights = lane_weights
+        self.user_burst = user_burst
+        self.user_rate = user_rate
+        self.max_queued = max_queued
+        self.queue_deadlines = queue_deadlines
+        self.in_flight = 0
+        self.queued = 0
+        # lane -> user -> waiters, in arrival order
+        self._waiting: dict[str, OrderedDict[Hashable, deque[asyncio.Future]]] = {lane: OrderedDict() for lane in LANES}
+        self._lane_pass = dict.fromkeys(LANES, 0.0)
+        self._virtual_time = 0.0
+        self._buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+        self.granted = dict.fromkeys(LANES, 0)
+
+    def _bucket(self, user_id: Hashable) -> TokenBucket | None:
+        if self.user_rate <= 0:
+            return None
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_burst, self.user_rate)
+            while len(self._buckets) > MAX_TRACKED_USERS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        return bucket
+
+    def _reject(self, lane: str, reason: str) -> None:
+        llm_scheduler_rejections_total.inc(lane=lane, reason=reason)
+
+    async def acquire(self, user_id: Hashable, lane: str = LANE_INTERACTIVE) -> None:
+        """Wait for an upstream slot; every successful acquire must be paired with release()"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.queue_deadlines[lane]
+        bucket = self._bucket(user_id)
+        if bucket is not None:
+            delay = bucket.reserve()
+            if delay > self.queue_deadlines[lane]:
+                bucket.refund()
+                self._reject(lane, "rate_limited")
+                raise LLMRateLimitedError(delay)
+            if delay:
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    bucket.refund()
+                    raise
+
+        if self.in_flight < self.max_concurrency and not self.queued:
+            self._grant(lane)
+            llm_scheduler_wait_seconds.observe(loop.time() - started, lane=lane)
+            return
+        if self.queued >= self.max_queued:
+            if bucket is not None:
+                bucket.refund()
+            self._reject(lane, "queue_full")
+            raise LLMOverloadedError(f"{self.queued} LLM requests are already queued")
+
+        waiter = loop.create_future()
+        self._enqueue(lane, user_id, waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max(deadline - loop.time(), 0))
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we gave up: hand the slot on
+                self.release()
+            else:
+                waiter.cancel()
+                self._dequeue(lane, user_id, waiter)
+            # The request never ran, so it does not count against the user's budget
+            if bucket is not None:
+                bucket.refund()
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject(lane, "deadline")
+                raise LLMOverloadedError(f"LLM request waited longer than {self.queue_deadlines[lane]:g}s")
+            raise
+        llm_scheduler_wait_seconds.observe(loop.time() - started, lane=lane)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        llm_scheduler_in_flight.set(self.in_flight)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id: Hashable, lane: str = LANE_INTERACTIVE) -> AsyncIterator[None]:
+        await self.acquire(user_id, lane)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _grant(self, lane: str) -> None:
+        self.in_flight += 1
+        self.granted[lane] += 1
+        llm_scheduler_in_flight.set(self.in_flight)
+
+    def _enqueue(self, lane: str, user_id: Hashable, waiter: asyncio.Future) -> None:
+        users = self._waiting[lane]
+        if not users:
+            # A lane that was idle starts at the current virtual time instead of
+            # spending credit it accumulated while it had nothing to send
+            self._lane_pass[lane] = max(self._lane_pass[lane], self._virtual_time)
+        users.setdefault(user_id, deque()).append(waiter)
+        self.queued += 1
+        llm_scheduler_queue_depth.inc(lane=lane)
+
+    def _dequeue(self, lane: str, user_id: Hashable, waiter: asyncio.Future) -> None:
+        users = self._waiting[lane]
+        waiters = users.get(user_id)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del users[user_id]
+        self.queued -= 1
+        llm_scheduler_queue_depth.dec(lane=lane)
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.max_concurrency and self.queued:
+            lane = min((lane for lane in LANES if self._waiting[lane]), key=self._lane_pass.__getitem__)
+            users = self._waiting[lane]
+            user_id, waiters = next(iter(users.items()))
+            waiter = waiters.popleft()
+            # Round-robin: this user goes behind the others waiting in the lane
+            del users[user_id]
+            if waiters:
+                users[user_id] = waiters
+            self.queued -= 1
+            llm_scheduler_queue_depth.dec(lane=lane)
+            self._virtual_time = self._lane_pass[lane]
+            self._lane_pass[lane] += 1 / self.lane_weights[lane]
+            self._grant(lane)
+            waiter.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "max_queued": self.max_queued,
+            "lanes": {
+                lane: {
+                    "weight": self.lane_weights[lane],
+                    "queue_deadline_seconds": self.queue_deadlines[lane],
+                    "queued": sum(len(waiters) for waiters in self._waiting[lane].values()),
+                    "queued_users": len(self._waiting[lane]),
+                    "granted": self.granted[lane],
+                    "rejected": {
+                        reason: int(llm_scheduler_rejections_total.value(lane=lane, reason=reason))
+                        for reason in ("rate_limited", "queue_full", "deadline")
+                    },
+                }
+                for lane in LANES
+            },
+            "user_burst": self.user_burst,
+            "user_requests_per_minute": self.user_rate * 60,
+            "tracked_users": len(self._buckets),
+        }
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.llm_max_concurrency,
+    lane_weights=parse_lane_weights(settings.llm_lane_weights),
+    user_burst=settings.llm_user_burst,
+    user_rate=settings.llm_user_requests_per_minute / 60,
+    max_queued=settings.llm_max_queued,
+    queue_deadlines={
+        LANE_ADMIN: settings.llm_queue_deadline_seconds,
+        LANE_INTERACTIVE: settings.llm_queue_deadline_seconds,
+        LANE_BACKGROUND: settings.llm_background_queue_deadline_seconds,
+    }
+)
@@ -0,0 +1,80 @@
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..models.message import Message
+
+
+class StreamWriteStats:
+    """Process-wide counters for streamed message persistence"""
+
+    def __init__(self):
+        self.deltas = 0
+        self.flushes = 0
+
+    @property
+    def writes_saved(self) -> int:
+        # Without buffering every delta was its own UPDATE + COMMIT
+        return max(self.deltas - self.flushes, 0)
+
+    def snapshot(self) -> dict:
+        return {
+            "deltas": self.deltas,
+            "flushes": self.flushes,
+            "writes_saved": self.writes_saved,
+        }
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer for an assistant message that is being streamed.
+
+    Deltas are accumulated in memory and the row is only rewritten once
+    flush_interval seconds have passed or flush_chars characters are pending.
+    Callers must call flush() once more when the stream completes or fails.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        message: Message,
+        flush_interval: float | None = None,
+        flush_chars: int | None = None,
+        stats: "StreamWriteStats | None" = None
+    ):
+        self.db = db
+        self.message = message
+        self.flush_interval = settings.stream_flush_interval_seconds if flush_interval is None else flush_interval
+        self.flush_chars = settings.stream_flush_chars if flush_chars is None else flush_chars
+        self.stats = stats or stream_write_stats
+        self._parts: list[str] = [message.content or ""]
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+
+    @property
+    def content(self) -> str:
+        return "".join(self._parts)
+
+    def _flush_due(self) -> bool:
+        if self._pending_chars >= self.flush_chars:
+            return True
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    async def append(self, delta: str) -> None:
+        self._parts.append(delta)
+        self._pending_chars += len(delta)
+        self.stats.deltas += 1
+        if self._flush_due():
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Persist the accumulated content and commit"""
+        content = self.content
+        self._parts = [content]
+        self.message.content = content
+        await self.db.commit()
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        self.stats.flushes += 1
+
+
+stream_write_stats = StreamWriteStats()
@@ -0,0 +1,262 @@
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric(ABC):
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    @abstractmethod
+    def _render_samples(self) -> list[str]:
+        """Sample lines in the Prometheus text format"""
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def _render_samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in self._series.items():
+            cumulative = 0
+            labels = _format_labels(self.label_names, key)
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            cumulative += counts[-1]
+            bucket_labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-memory metric registry rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# HTTP
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency, including the full body of streamed responses", ("method", "route")
+))
+
+# Database
+db_queries_total = registry.register(Counter(
+    "db_queries_total", "SQL statements executed"
+))
+db_query_duration_seconds = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time"
+))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+))
+db_query_seconds_per_request = registry.register(Histogram(
+    "db_query_seconds_per_request", "Total SQL execution time per HTTP request", ("route",)
+))
+
+# Streaming and upstream LLM
+sse_active_streams = registry.register(Gauge(
+    "sse_active_streams", "Server-sent event chat streams currently open"
+))
+ws_active_connections = registry.register(Gauge(
+    "ws_active_connections", "Chat WebSocket connections currently open"
+))
+ws_active_generations = registry.register(Gauge(
+    "ws_active_generations", "Replies currently streaming over chat WebSockets"
+))
+llm_generations_cancelled_total = registry.register(Counter(
+    "llm_generations_cancelled_total", "Chat replies stopped before completion, by reason", ("reason",)
+))
+llm_cancelled_tokens_saved_total = registry.register(Counter(
+    "llm_cancelled_tokens_saved_total", "Completion token budget left unused by cancelled replies (upper bound on tokens saved)"
+))
+llm_backend_requests_total = registry.register(Counter(
+    "llm_backend_requests_total", "Upstream LLM requests by backend and outcome", ("backend", "outcome")
+))
+llm_circuit_state = registry.register(Gauge(
+    "llm_circuit_state", "Circuit breaker state per LLM backend (0 closed, 1 half-open, 2 open)", ("backend",)
+))
+llm_retries_total = registry.register(Counter(
+    "llm_retries_total", "LLM request retries, and retries skipped because the retry budget ran out", ("result",)
+))
+llm_short_circuited_total = registry.register(Counter(
+    "llm_short_circuited_total", "LLM requests refused without an upstream call because every circuit was open"
+))
+llm_time_to_first_token_seconds = registry.register(Histogram(
+    "llm_time_to_first_token_seconds", "Time from the upstream request to the first streamed token, including failover",
+    ("backend", "model")
+))
+llm_tokens_per_second = registry.register(Histogram(
+    "llm_tokens_per_second", "Streamed chunks (about one token each) per second after the first token", ("backend", "model"),
+    buckets=(5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+))
+llm_response_cache_lookups_total = registry.register(Counter(
+    "llm_response_cache_lookups_total", "Exact-match response cache lookups by result", ("result",)
+))
+llm_response_cache_saved_seconds_total = registry.register(Counter(
+    "llm_response_cache_saved_seconds_total", "Upstream streaming time avoided by response cache hits"
+))
+llm_title_generation_seconds = registry.register(Histogram(
+    "llm_title_generation_seconds", "Latency of conversation title generation calls", ("outcome",)
+))
+
+# LLM scheduler
+llm_scheduler_in_flight = registry.register(Gauge(
+    "llm_scheduler_in_flight", "Upstream LLM calls holding a scheduler slot"
+))
+llm_scheduler_queue_depth = registry.register(Gauge(
+    "llm_scheduler_queue_depth", "LLM calls waiting for a scheduler slot", ("lane",)
+))
+llm_scheduler_wait_seconds = registry.register(Histogram(
+    "llm_scheduler_wait_seconds", "Time LLM calls waited for their rate budget and a slot", ("lane",)
+))
+llm_scheduler_rejections_total = registry.register(Counter(
+    "llm_scheduler_rejections_total", "LLM calls refused by the scheduler", ("lane", "reason")
+))
+
+# Password hashing pool
+password_hash_in_flight = registry.register(Gauge(
+    "password_hash_in_flight", "Password hash/verify operations running or queued"
+))
+password_hash_operations_total = registry.register(Counter(
+    "password_hash_operations_total", "Password hash/verify operations by outcome", ("operation", "outcome")
+))
+
+
+class RequestQueryStats:
+    """Per-request SQL counters, reachable from engine events through a context variable"""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+current_request_queries: ContextVar[RequestQueryStats | None] = ContextVar("current_request_queries", default=None)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record SQL counts and durations for every statement run through engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        db_queries_total.inc()
+        db_query_duration_seconds.observe(elapsed)
+        request_stats = current_request_queries.get()
+        if request_stats is not None:
+            request_stats.count += 1
+            request_stats.seconds += elapsed
@@ -1,45 +1,121 @@
-import openai
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, AsyncIterator
 from openai.types.chat import ChatCompletionMessageParam
 from ..config import settings
+from .token_counter import count_tokens, MESSAGE_OVERHEAD_TOKENS
+from .metrics import llm_time_to_first_token_seconds, llm_tokens_per_second, llm_title_generation_seconds
+from .llm_backends import LLMRouter, LLMUnavailableError, llm_router
+from .llm_scheduler import LANE_BACKGROUND, LANE_INTERACTIVE, LLMRateLimitedError, LLMScheduler, llm_scheduler
+from .response_cache import response_cache
 from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 
 class OpenAIService:
-    def __init__(self):
-        # Initialize OpenAI client with proper error handling
+    def __init__(self, router: LLMRouter = llm_router, scheduler: LLMScheduler = llm_scheduler):
+        # Requests are routed across the configured LLM backends (see llm_backends.py)
+        # once the scheduler admits them (see llm_scheduler.py)
+        self.router = router
+        self.scheduler = scheduler
+    
+    @property
+    def available(self) -> bool:
+        return bool(self.router.backends)
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[ChatCompletionMessageParam],
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        user_id: int | None = None,
+        lane: str = LANE_INTERACTIVE
+    ) -> AsyncIterator[str]:
+        """
+        Open a streaming chat completion on the best available backend
+        
+        Failover happens here, before any content is produced; LLMUnavailableError
+        is raised if no backend answers. The returned iterator yields non-empty
+        content deltas and records time-to-first-token and tokens-per-second metrics.
+        With the response cache enabled, an identical earlier prompt is replayed
+        without calling upstream.
+        
+        Upstream calls first wait for a scheduler slot in the given lane, charged to
+        user_id's request budget (LLMRateLimitedError when it is used up). The slot
+        is held until the returned iterator is exhausted or closed.
+        """
+        if response_cache.enabled:
+            cached = response_cache.get(*(
+                response_cache.make_key(messages, model, max_tokens, temperature)
+                for model in self._routable_models()
+            ))
+            if cached is not None:
+                return response_cache.replay(cached)
+        await self.scheduler.acquire(user_id, lane)
+        # Upstream latency metrics start once admitted; queueing is in llm_scheduler_wait_seconds
+        started = time.perf_counter()
         try:
-            self.client = openai.OpenAI(api_key=settings.openai_api_key)
-        except Exception as e:
-            print(f"Warning: OpenAI client initialization failed: {e}")
-            self.client = None
+            backend, deltas = await self.router.stream_chat(messages, max_tokens=max_tokens, temperature=temperature)
+        except BaseException:
+            self.scheduler.release()
+            raise
+        cache_key = None
+        if response_cache.enabled:
+            # Stored under the model that actually answered, which may be a failover backend's
+            cache_key = response_cache.make_key(messages, backend.model, max_tokens, temperature)
+        return self._iterate_deltas(deltas, backend.name, backend.model, started, cache_key)
+
+    def _routable_models(self) -> list[str]:
+        """Models of the backends a request could be routed to now, best first"""
+        backends = self.router.ordered() or self.router.backends
+        return list(dict.fromkeys(backend.model for backend in backends))
+    
+    async def _iterate_deltas(
+        self,
+        deltas: AsyncIterator[str],
+        backend: str,
+        model: str,
+        started: float,
+        cache_key: str | None = None
+    ) -> AsyncIterator[str]:
+        first_token_at = None
+        chunks = 0
+        received = []
+        try:
+            async for content in deltas:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    llm_time_to_first_token_seconds.observe(first_token_at - started, backend=backend, model=model)
+                chunks += 1
+                if cache_key is not None:
+                    received.append(content)
+                yield content
+            if cache_key is not None:
+                # Only replies that streamed to the end are cached
+                response_cache.set(cache_key, received, time.perf_counter() - started)
+        finally:
+            await deltas.aclose()
+            self.scheduler.release()
+            if first_token_at is not None and chunks > 1:
+                elapsed = time.perf_counter() - first_token_at
+                if elapsed > 0:
+                    llm_tokens_per_second.observe((chunks - 1) / elapsed, backend=backend, model=model)
     
-    def get_chat_response(
+    async def get_chat_response(
         self, 
-        messages: List[ChatCompletionMessageParam], 
-        model: str = "gpt-4o-mini"
+        messages: List[ChatCompletionMessageParam]
     ) -> Response:
         """
-        Get AI response from OpenAI API
+        Get AI response as a server-sent event stream
         
         Args:
             messages: List of message dictionaries with 'role' and 'content'
-            model: OpenAI model to use
             
         Returns:
-            AI response content as string
+            StreamingResponse of content deltas
         """
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.7,
-                stream=True
-            )
+            deltas = await self.stream_chat_completion(messages)
             
-            def event_generator():
-                for chunk in response:
-                    content = chunk.choices[0].delta.content or ""
+            async def event_generator():
+                async for content in deltas:
                     yield f"data: {content}\n\n"
             return StreamingResponse(event_generator(), media_type="text/event-stream")
 
@@ -97,10 +173,10 @@ class OpenAIService:
         print(f"DEBUG: No substantial content found, should NOT generate title")
         return False
 
-    def generate_conversation_title(
+    async def generate_conversation_title(
         self,
         conversation_messages: List[Dict[str, Any]],
-        model: str = "gpt-4o-mini"
+        user_id: int | None = None
     ):
         try:
             prompt = """You are a helpful assistant that generates concise, descriptive titles for conversations. 
@@ -127,14 +203,16 @@ class OpenAIService:
                 {"role": "user", "content": f"Generate a title for this conversation:\n\n{conversation_text}"}
             ]
 
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=50,
-                temperature=0.3,
-            )
+            started = time.perf_counter()
+            try:
+                # Titles are background work: lowest lane, but still charged to the user
+                async with self.scheduler.slot(user_id, LANE_BACKGROUND):
+                    title = await self.router.complete(messages, max_tokens=50, temperature=0.3)
+            except Exception:
+                llm_title_generation_seconds.observe(time.perf_counter() - started, outcome="error")
+                raise
+            llm_title_generation_seconds.observe(time.perf_counter() - started, outcome="success")
 
-            title = response.choices[0].message.content
             if title:
                 title = title.strip()
                 # Remove all types of quotes and formatting
@@ -154,30 +232,48 @@ class OpenAIService:
             else:
                 title = "New Conversation"
             return title or "New Conversation"
+        except (LLMUnavailableError, LLMRateLimitedError):
+            # Upstream failures and scheduler rejections propagate so callers (e.g. the title queue) can retry
+            raise
         except Exception as e:
             return "New Conversation"
 
     def format_conversation_history(
         self, 
-        conversation_messages: List[Dict[str, Any]]
+        conversation_messages: List[Dict[str, Any]],
+        max_tokens: int | None = None
     ) -> List[ChatCompletionMessageParam]:
         """
         Format conversation history for OpenAI API
         
+        Keeps the newest messages that fit in the token budget. The newest
+        message is always kept, even if it alone exceeds the budget.
+        
         Args:
-            conversation_messages: List of message objects from database
+            conversation_messages: List of message objects from database, oldest first.
+                A precomputed "token_count" is used instead of re-tokenizing when present.
+            max_tokens: Prompt token budget, defaults to settings.context_max_tokens
             
         Returns:
             Formatted messages for OpenAI API
         """
+        budget = settings.context_max_tokens if max_tokens is None else max_tokens
         formatted_messages = []
+        used_tokens = 0
         
-        for message in conversation_messages:
+        for message in reversed(conversation_messages):
+            token_count = message.get("token_count")
+            if token_count is None:
+                token_count = count_tokens(message["content"])
+            used_tokens += token_count + MESSAGE_OVERHEAD_TOKENS
+            if formatted_messages and used_tokens > budget:
+                break
             formatted_messages.append({
                 "role": message["role"],
                 "content": message["content"]
             })
         
+        formatted_messages.reverse()
         return formatted_messages
 
 # Create service instance
@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(sort_value: datetime | int | str, row_id: int) -> str:
+    """Encode a (sort value, id) keyset position as an opaque URL-safe token"""
+    if isinstance(sort_value, datetime):
+        position = [sort_value.isoformat(), row_id]
+    else:
+        # Non-datetime sort values carry a type tag; untagged cursors hold datetimes
+        position = [sort_value, row_id, "i" if isinstance(sort_value, int) else "s"]
+    raw = json.dumps(position).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | int | str, int]:
+    """Decode a token produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id, *tag = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not tag:
+            return datetime.fromisoformat(sort_value), int(row_id)
+        if tag == ["i"]:
+            return int(sort_value), int(row_id)
+        if tag == ["s"] and isinstance(sort_value, str):
+            return sort_value, int(row_id)
+        raise ValueError(f"Unknown cursor type {tag}")
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_requested(mode: str | None, before: str | None, after: str | None) -> bool:
+    """
+    Whether a listing should use keyset pagination: offset paging stays the default
+    so existing clients keep their page/total fields, and cursor mode is opted into
+    with mode=cursor or by passing a cursor.
+    """
+    if mode is not None:
+        return mode == "cursor"
+    return bool(before or after)
+
+
+async def paginate_keyset(
+    db: AsyncSession,
+    query: Select,
+    sort_column: Any,
+    id_column: Any,
+    limit: int,
+    before: str | None = None,
+    after: str | None = None,
+    descending: bool = False,
+    start_at_end: bool = False,
+    sort_value: Callable[[Any], Any] | None = None
+) -> tuple[list[Any], str | None, str | None]:
+    """
+    Keyset pagination over (sort_column, id_column).
+
+    "before" and "after" are relative to the display order (descending or not):
+    before returns the rows just ahead of the cursor, after the rows just past it.
+    Without a cursor the first page is returned, or the last one if start_at_end.
+    Items always come back in display order, with a prev cursor (pass as
+    before) and a next cursor (pass as after) when more rows exist that way.
+    No COUNT(*) is issued; one extra row is fetched to detect more pages.
+    sort_value reads a row's sort key when sort_column is an expression rather
+    than a mapped column.
+    """
+    key = tuple_(sort_column, id_column)
+    forward = (sort_column.desc(), id_column.desc()) if descending else (sort_column.asc(), id_column.asc())
+    backward = (sort_column.asc(), id_column.asc()) if descending else (sort_column.desc(), id_column.desc())
+
+    if after:
+        anchor = tuple_(*decode_cursor(after))
+        query = query.where(key < anchor if descending else key > anchor)
+        reverse = False
+    elif before:
+        anchor = tuple_(*decode_cursor(before))
+        query = query.where(key > anchor if descending else key < anchor)
+        reverse = True
+    else:
+        reverse = start_at_end
+
+    rows = (await db.scalars(query.order_by(None).order_by(*(backward if reverse else forward)).limit(limit + 1))).all()
+    has_extra = len(rows) > limit
+    items = list(rows[:limit])
+    if reverse:
+        items.reverse()
+        has_prev, has_next = has_extra, bool(after or before)
+    else:
+        has_prev, has_next = bool(after or before), has_extra
+
+    def cursor_for(row: Any) -> str:
+        value = sort_value(row) if sort_value else getattr(row, sort_column.key)
+        return encode_cursor(value, getattr(row, id_column.key))
+
+    prev_cursor = cursor_for(items[0]) if has_prev and items else None
+    next_cursor = cursor_for(items[-1]) if has_next and items else None
+    return items, prev_cursor, next_cursor
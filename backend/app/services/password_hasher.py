@@ -0,0 +1,153 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from passlib.context import CryptContext
+from ..config import settings
+from .metrics import password_hash_in_flight, password_hash_operations_total
+
+# Per-scheme cost options read from settings; schemes without an entry use passlib defaults
+COST_SETTINGS = {
+    "bcrypt": "password_bcrypt_rounds",
+    "pbkdf2_sha256": "password_pbkdf2_rounds",
+}
+
+
+def crypt_context_config() -> dict:
+    """
+    CryptContext options from settings. The first scheme hashes new passwords and the
+    rest are only verified; hashes in another scheme or with a different cost are
+    reported as needing an update.
+    """
+    schemes = [scheme.strip() for scheme in settings.password_hash_schemes.split(",") if scheme.strip()]
+    config = {"schemes": schemes, "deprecated": "auto"}
+    for scheme in schemes:
+        cost = getattr(settings, COST_SETTINGS.get(scheme, ""), None)
+        if cost:
+            config.update({f"{scheme}__rounds": cost, f"{scheme}__min_rounds": cost, f"{scheme}__max_rounds": cost})
+    return config
+
+
+# Built once per process: in each pool worker by _init_worker, or lazily for inline use
+_context: CryptContext | None = None
+
+
+def _init_worker(config: dict) -> None:
+    global _context
+    _context = CryptContext(**config)
+
+
+def _get_context() -> CryptContext:
+    global _context
+    if _context is None:
+        _context = CryptContext(**crypt_context_config())
+    return _context
+
+
+def hash_password(password: str) -> str:
+    return _get_context().hash(password)
+
+
+def verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Return (matches, new hash or None); hashes passlib cannot identify never match"""
+    try:
+        return _get_context().verify_and_update(password, hashed_password)
+    except ValueError:
+        return False, None
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when too many hashing operations are already running or queued"""
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification off the event loop on a dedicated pool.
+
+    With workers > 0 a process pool is used, so bcrypt work neither holds the GIL
+    nor occupies the threadpool shared with request handlers; workers = 0 falls
+    back to that threadpool. At most one operation per worker runs, at most
+    max_pending more wait, and anything beyond that is rejected immediately with
+    PasswordHasherBusyError instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.capacity = max(workers, 1) + max_pending
+        self._pool: ProcessPoolExecutor | None = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def start(self) -> None:
+        if self.workers > 0 and self._pool is None:
+            # Workers are spawned rather than forked from the (threaded) server process
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(crypt_context_config(),)
+            )
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _executor(self) -> Executor | None:
+        self.start()
+        return self._pool
+
+    async def _run(self, operation: str, func, *args):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            password_hash_operations_total.inc(operation=operation, outcome="rejected")
+            raise PasswordHasherBusyError(f"{self.in_flight} password operations already in progress")
+        self.in_flight += 1
+        password_hash_in_flight.inc()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor(), func, *args)
+        except BrokenProcessPool:
+            # A worker died; replace the pool for later calls and shed this one
+            self.stop()
+            password_hash_operations_total.inc(operation=operation, outcome="error")
+            raise PasswordHasherBusyError("Password hashing pool restarted")
+        finally:
+            self.in_flight -= 1
+            password_hash_in_flight.dec()
+        self.completed += 1
+        password_hash_operations_total.inc(operation=operation, outcome="ok")
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Check a password against its stored hash. When it matches but the hash uses an
+        outdated scheme or cost, also return a replacement hash for the caller to store.
+        """
+        valid, new_hash = await self._run("verify", verify_and_update, password, hashed_password)
+        if valid and new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def snapshot(self) -> dict:
+        return {
+            "mode": "process" if self.workers > 0 else "thread",
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "schemes": crypt_context_config()["schemes"],
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending
+)
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, List
+from openai.types.chat import ChatCompletionMessageParam
+from ..config import settings
+from .metrics import llm_response_cache_lookups_total, llm_response_cache_saved_seconds_total
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A completed streamed reply, kept as the deltas the upstream produced"""
+    chunks: tuple[str, ...]
+    upstream_seconds: float
+
+
+class ResponseCache:
+    """
+    Bounded TTL + LRU cache of completed chat replies keyed by the exact prompt.
+
+    Keys hash the formatted message list together with the model that produced
+    the reply and the sampling parameters, so any change to the history, budget,
+    settings or serving model is a miss.
+    Only replies that streamed to completion are stored.
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: float, max_entries: int, max_chars: int):
+        self.enabled = enabled and ttl_seconds > 0 and max_entries > 0
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._entries: OrderedDict[str, tuple[float, CachedResponse]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.saved_upstream_seconds = 0.0
+
+    @staticmethod
+    def make_key(
+        messages: List[ChatCompletionMessageParam],
+        model: str,
+        max_tokens: int,
+        temperature: float
+    ) -> str:
+        payload = json.dumps(
+            {"messages": messages, "model": model, "max_tokens": max_tokens, "temperature": temperature},
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, *keys: str) -> CachedResponse | None:
+        """The first live entry among keys; the lookup counts as one hit or miss"""
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                continue
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_upstream_seconds += entry[1].upstream_seconds
+            llm_response_cache_lookups_total.inc(result="hit")
+            llm_response_cache_saved_seconds_total.inc(entry[1].upstream_seconds)
+            return entry[1]
+        self.misses += 1
+        llm_response_cache_lookups_total.inc(result="miss")
+        return None
+
+    def set(self, key: str, chunks: List[str], upstream_seconds: float) -> None:
+        if not self.enabled or not chunks or sum(len(chunk) for chunk in chunks) > self.max_chars:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, CachedResponse(tuple(chunks), upstream_seconds))
+        self._entries.move_to_end(key)
+        self.stores += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def replay(self, cached: CachedResponse) -> AsyncIterator[str]:
+        """Yield the cached deltas with their original chunking, letting each one flush"""
+        for chunk in cached.chunks:
+            yield chunk
+            await asyncio.sleep(0)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "saved_upstream_seconds": round(self.saved_upstream_seconds, 3),
+        }
+
+
+response_cache = ResponseCache(
+    enabled=settings.response_cache_enabled,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    max_entries=settings.response_cache_max_entries,
+    max_chars=settings.response_cache_max_chars
+)
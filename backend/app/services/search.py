@@ -0,0 +1,144 @@
+import html
+import re
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.conversation import Conversation
+from ..models.message import SEARCH_TEXT_CONFIG, Message
+
+# Control characters mark highlighted terms in raw snippets; they never occur in chat text
+# and are swapped for <mark> tags after the snippet has been HTML-escaped.
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+# Length of the excerpt around the first match when there is no full-text index to build snippets
+LIKE_SNIPPET_CHARS = 160
+
+POSTGRES_SEARCH = text(f"""
+    WITH search_query AS (SELECT websearch_to_tsquery('{SEARCH_TEXT_CONFIG}', :query) AS q),
+    hits AS (
+        SELECT m.id, m.conversation_id, m.role, m.timestamp, c.title,
+               ts_rank(m.search_vector, search_query.q) AS rank
+        FROM messages m
+        JOIN conversations c ON c.id = m.conversation_id
+        CROSS JOIN search_query
+        WHERE c.user_id = :user_id
+          AND (CAST(:conversation_id AS INTEGER) IS NULL OR m.conversation_id = :conversation_id)
+          AND m.search_vector @@ search_query.q
+        ORDER BY rank DESC, m.id DESC
+        LIMIT :limit OFFSET :offset
+    )
+    -- Headlines are only built for the rows on this page
+    SELECT hits.*, ts_headline('{SEARCH_TEXT_CONFIG}', m.content, search_query.q, :headline_options) AS snippet
+    FROM hits
+    JOIN messages m ON m.id = hits.id
+    CROSS JOIN search_query
+    ORDER BY hits.rank DESC, hits.id DESC
+""")
+
+SQLITE_SEARCH = text("""
+    SELECT m.id, m.conversation_id, m.role, m.timestamp, c.title,
+           -bm25(messages_fts) AS rank,
+           snippet(messages_fts, 0, :start, :stop, '...', 24) AS snippet
+    FROM messages_fts
+    JOIN messages m ON m.id = messages_fts.rowid
+    JOIN conversations c ON c.id = m.conversation_id
+    WHERE messages_fts MATCH :query
+      AND c.user_id = :user_id
+      AND (:conversation_id IS NULL OR m.conversation_id = :conversation_id)
+    ORDER BY rank DESC, m.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def to_fts5_query(query: str) -> str:
+    """Quote each term so user input is matched as words (implicit AND) rather than FTS5 syntax"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def like_snippet(content: str, terms: list[str]) -> str:
+    """Raw snippet around the first matched term with every match marked, like the FTS snippets"""
+    lowered = content.lower()
+    first = min((i for i in (lowered.find(term.lower()) for term in terms) if i >= 0), default=0)
+    start = max(first - LIKE_SNIPPET_CHARS // 4, 0)
+    end = start + LIKE_SNIPPET_CHARS
+    excerpt = content[start:end]
+    if terms:
+        pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+        excerpt = pattern.sub(lambda match: HIGHLIGHT_START + match.group(0) + HIGHLIGHT_STOP, excerpt)
+    return ("..." if start else "") + excerpt + ("..." if end < len(content) else "")
+
+
+async def like_search(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int,
+    offset: int = 0,
+    conversation_id: int | None = None
+) -> list[dict]:
+    """
+    Search for databases without a full-text index: every term must appear in the
+    message (case-insensitive substring match). Results are unranked, newest first.
+    """
+    terms = query.split()
+    statement = (
+        select(Message.id, Message.conversation_id, Message.role, Message.timestamp, Message.content, Conversation.title)
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(Conversation.user_id == user_id, *(Message.content.icontains(term, autoescape=True) for term in terms))
+        .order_by(Message.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    if conversation_id is not None:
+        statement = statement.where(Message.conversation_id == conversation_id)
+    rows = (await db.execute(statement)).mappings().all()
+    return [{**row, "rank": 0.0, "snippet": like_snippet(row["content"], terms)} for row in rows]
+
+
+def render_snippet(snippet: str | None) -> str:
+    """HTML-escape a raw snippet and turn the highlight markers into <mark> tags"""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int,
+    offset: int = 0,
+    conversation_id: int | None = None
+) -> list[dict]:
+    """
+    Ranked full-text search over a user's messages, best match first.
+
+    Uses the tsvector column and GIN index on Postgres and the messages_fts
+    FTS5 table on SQLite; other databases fall back to like_search. Returns up
+    to limit rows as dicts with a highlighted, HTML-safe snippet.
+    """
+    dialect = db.bind.dialect.name
+    params = {"user_id": user_id, "conversation_id": conversation_id, "limit": limit, "offset": offset}
+    if dialect == "postgresql":
+        params.update({
+            "query": query,
+            "headline_options": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=35, MinWords=15, MaxFragments=2",
+        })
+        rows = (await db.execute(POSTGRES_SEARCH, params)).mappings().all()
+    elif dialect == "sqlite":
+        params.update({"query": to_fts5_query(query), "start": HIGHLIGHT_START, "stop": HIGHLIGHT_STOP})
+        rows = (await db.execute(SQLITE_SEARCH, params)).mappings().all()
+    else:
+        rows = await like_search(db, user_id, query, limit, offset, conversation_id)
+
+    return [
+        {
+            "message_id": row["id"],
+            "conversation_id": row["conversation_id"],
+            "conversation_title": row["title"],
+            "role": row["role"],
+            "timestamp": row["timestamp"],
+            "rank": float(row["rank"]),
+            "snippet": render_snippet(row["snippet"]),
+        }
+        for row in rows
+    ]
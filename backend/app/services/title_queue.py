@@ -0,0 +1,159 @@
+import asyncio
+from sqlalchemy import select
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models.conversation import Conversation
+from ..models.message import Message
+
+# Titles only look at the start of a conversation, so don't load whole threads
+TITLE_CONTEXT_MESSAGES = 20
+
+# Titles that mean "not named yet" and may be replaced automatically
+DEFAULT_TITLES = (None, "New Chat")
+
+
+class TitleJob:
+    def __init__(self, conversation_id: int, force: bool):
+        self.conversation_id = conversation_id
+        self.force = force
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class TitleGenerationQueue:
+    """
+    In-process job queue for conversation title generation.
+
+    A bounded pool of worker tasks drains the queue. Jobs are deduplicated per
+    conversation, and failed upstream calls are retried with exponential backoff.
+    """
+
+    def __init__(self, workers: int, max_size: int, max_retries: int, retry_delay: float):
+        self.workers = workers
+        self.max_size = max_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._pending: dict[int, TitleJob] = {}
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.deduplicated = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._pending.values():
+            if not job.future.done():
+                job.future.cancel()
+        self._pending.clear()
+
+    def enqueue(self, conversation_id: int, force: bool = False) -> asyncio.Future | None:
+        """
+        Schedule a title for a conversation and return a future resolving to the
+        new title (or None if none was generated). Returns None if the queue is full.
+        """
+        self.start()
+        job = self._pending.get(conversation_id)
+        if job is not None:
+            job.force = job.force or force
+            self.deduplicated += 1
+            return job.future
+        job = TitleJob(conversation_id, force)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return None
+        self._pending[conversation_id] = job
+        return job.future
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                title = await self._run_with_retries(job)
+                if not job.future.done():
+                    job.future.set_result(title)
+            except Exception as e:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                    # Nobody may be awaiting a background job; mark the exception as seen
+                    job.future.exception()
+            finally:
+                self._pending.pop(job.conversation_id, None)
+                self._queue.task_done()
+
+    async def _run_with_retries(self, job: TitleJob) -> str | None:
+        attempt = 0
+        while True:
+            try:
+                title = await self._generate(job)
+                self.completed += 1
+                return title
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+                self.retried += 1
+                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+                attempt += 1
+
+    async def _generate(self, job: TitleJob) -> str | None:
+        # Imported here so the queue stays usable when the OpenAI service is not
+        from .openai_service import openai_service
+
+        async with AsyncSessionLocal() as db:
+            conversation = await db.get(Conversation, job.conversation_id)
+            if not conversation:
+                return None
+            if not job.force and conversation.title not in DEFAULT_TITLES:
+                return conversation.title
+            user_id = conversation.user_id
+            messages = (await db.scalars(select(Message).where(
+                Message.conversation_id == job.conversation_id
+            ).order_by(Message.timestamp, Message.id).limit(TITLE_CONTEXT_MESSAGES))).all()
+            message_dicts = [
+                {"role": msg.role, "content": msg.content}
+                for msg in messages
+            ]
+        if not openai_service.should_generate_title(message_dicts):
+            return None
+        # No connection is held while the call waits in the scheduler's background lane
+        title = await openai_service.generate_conversation_title(message_dicts, user_id=user_id)
+        async with AsyncSessionLocal() as db:
+            conversation = await db.get(Conversation, job.conversation_id)
+            if not conversation:
+                return None
+            if not job.force and conversation.title not in DEFAULT_TITLES:
+                # Renamed while the title was generating
+                return conversation.title
+            conversation.title = title
+            await db.commit()
+            return title
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "pending": len(self._pending),
+            "workers": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "deduplicated": self.deduplicated,
+        }
+
+
+title_queue = TitleGenerationQueue(
+    workers=settings.title_queue_workers,
+    max_size=settings.title_queue_max_size,
+    max_retries=settings.title_queue_max_retries,
+    retry_delay=settings.title_queue_retry_delay_seconds
+)
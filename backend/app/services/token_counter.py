@@ -0,0 +1,49 @@
+import logging
+import math
+from functools import lru_cache
+from ..config import settings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Per-message framing tokens added by the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Rough characters-per-token ratio used when no tokenizer is available
+ESTIMATED_CHARS_PER_TOKEN = 4
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """
+    Load the tokenizer for a model once per process; models tiktoken does not know use
+    settings.tokenizer_encoding, and None means fall back to the estimator
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception as e:
+        logger.warning("Tokenizer for %s not available, estimating tokens: %s", model, e)
+        return None
+    try:
+        return tiktoken.get_encoding(settings.tokenizer_encoding)
+    except Exception as e:
+        logger.warning("Tokenizer %s not available, estimating tokens: %s", settings.tokenizer_encoding, e)
+        return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """Count tokens in text with the tokenizer for model (default: settings.llm_model), or estimate them"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model or settings.llm_model)
+    if encoding is None:
+        return math.ceil(len(text) / ESTIMATED_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,90 @@
+import csv
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..models.user import NEVER_LOGGED_IN, User, UserRole, last_login_sort
+
+# sort name -> (keyset expression, reads a row's value for that expression).
+# Each one is backed by an index ending in users.id.
+USER_SORTS: dict[str, tuple[Any, Callable[[Any], Any]]] = {
+    "id": (User.id, lambda row: row.id),
+    "created_at": (User.created_at, lambda row: row.created_at),
+    "last_login_at": (last_login_sort, lambda row: row.last_login_at or NEVER_LOGGED_IN),
+    "username": (User.username, lambda row: row.username),
+}
+
+CSV_COLUMNS = (
+    "id", "username", "email", "role", "is_active", "is_verified",
+    "can_chat", "created_at", "last_login_at",
+)
+
+
+def filter_users(
+    query: Select,
+    role: UserRole | None = None,
+    is_active: bool | None = None,
+    can_chat: bool | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    last_login_after: datetime | None = None,
+    last_login_before: datetime | None = None
+) -> Select:
+    """Apply the admin listing filters; "after" bounds are inclusive, "before" bounds exclusive"""
+    if role is not None:
+        query = query.where(User.role == role)
+    if is_active is not None:
+        query = query.where(User.is_active == is_active)
+    if can_chat is not None:
+        query = query.where(User.can_chat == can_chat)
+    if created_after is not None:
+        query = query.where(User.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(User.created_at < created_before)
+    if last_login_after is not None:
+        query = query.where(User.last_login_at >= last_login_after)
+    if last_login_before is not None:
+        query = query.where(User.last_login_at < last_login_before)
+    return query
+
+
+def user_csv_query() -> Select:
+    """Plain column select for the CSV export, so no ORM objects are built per row"""
+    return select(*(getattr(User, column) for column in CSV_COLUMNS))
+
+
+# Spreadsheet apps evaluate cells starting with these as formulas (tab and carriage return per OWASP)
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UserRole):
+        return value.value
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        # Usernames and emails are user-chosen; keep them from running as formulas when the export is opened
+        return "'" + value
+    return "" if value is None else value
+
+
+async def stream_users_csv(db: AsyncSession, query: Select) -> AsyncIterator[str]:
+    """
+    CSV rows for the users matched by query (a select of CSV_COLUMNS), header first.
+
+    Rows are streamed through a server-side cursor settings.export_batch_size at a
+    time and each batch is written out as one chunk.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+
+    result = await db.stream(query.execution_options(yield_per=settings.export_batch_size))
+    async for rows in result.partitions():
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
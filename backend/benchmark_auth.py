@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for per-request token verification.
+Compares AuthService.verify_token with and without the verified-token cache.
+"""
+import sys
+import os
+import timeit
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.auth_service import auth_service
+
+def benchmark(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    per_call_us = seconds / number * 1_000_000
+    print(f"  {label:<28} {per_call_us:8.2f} µs/request")
+    return per_call_us
+
+def benchmark_verify_token(number=20000):
+    print("Benchmarking verify_token...")
+    token = auth_service.create_access_token(data={"sub": "1"})
+
+    def uncached():
+        auth_service.token_cache.clear()
+        auth_service.verify_token(token)
+
+    def cached():
+        auth_service.verify_token(token)
+
+    auth_service.verify_token(token)
+    before = benchmark("full jwt.decode (no cache)", uncached, number)
+    after = benchmark("cached payload", cached, number)
+    print(f"  Speedup: {before / after:.1f}x")
+    print(f"  Cache: {auth_service.token_cache.snapshot()}")
+
+if __name__ == "__main__":
+    benchmark_verify_token()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Local fake OpenAI-compatible chat completions server for load testing.
+Streams canned replies with a configurable time-to-first-token and tokens per second.
+
+Usage:
+    python fake_llm_server.py --port 9100 --ttft 0.3 --tokens-per-second 50 --tokens 200
+Then point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+
+WORDS = (
+    "Sure here is a detailed answer to your question about databases caching "
+    "and concurrency with a few practical examples you can try locally"
+).split()
+
+def create_app(ttft: float, tokens_per_second: float, tokens: int) -> FastAPI:
+    app = FastAPI(title="Fake LLM Server")
+
+    def chunk(completion_id: str, model: str, content: str | None, finish_reason: str | None = None) -> str:
+        delta = {"content": content} if content is not None else {}
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        reply_tokens = min(tokens, body.get("max_tokens") or tokens)
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft)
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "Fake Conversation Title"},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 3, "total_tokens": 3},
+            })
+
+        async def event_stream():
+            await asyncio.sleep(ttft)
+            interval = 1 / tokens_per_second if tokens_per_second > 0 else 0
+            for i in range(reply_tokens):
+                word = WORDS[i % len(WORDS)]
+                yield chunk(completion_id, model, word if i == 0 else f" {word}")
+                if interval:
+                    await asyncio.sleep(interval)
+            yield chunk(completion_id, model, None, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return app
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible streaming server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=100, help="Tokens per streamed reply")
+    args = parser.parse_args()
+
+    app = create_app(args.ttft, args.tokens_per_second, args.tokens)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Bulk import conversations from a JSONL file.
+
+Each line is one conversation with its messages, oldest first:
+    {"user_id": 3, "title": "Trip planning", "created_at": "2024-05-01T10:00:00Z",
+     "messages": [{"role": "user", "content": "Hi", "timestamp": "2024-05-01T10:00:00Z"},
+                  {"role": "assistant", "content": "Hello!"}]}
+
+Usage:
+    python import_conversations.py history.jsonl
+    python import_conversations.py history.jsonl --user-id 3 --batch-size 10000
+    python import_conversations.py - < history.jsonl
+"""
+import argparse
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import async_engine, create_tables
+from app.services.importer import ImportStats, import_jsonl
+import app.models  # noqa: F401  (register all tables)
+
+
+async def read_lines(path: str):
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def print_progress(stats: ImportStats):
+    print(
+        f"  {stats.conversations:>10,} conversations {stats.messages:>12,} messages "
+        f"{stats.rows_per_second:>10,.0f} rows/s",
+        flush=True
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bulk import conversations from JSONL")
+    parser.add_argument("path", help="JSONL file, or - for stdin")
+    parser.add_argument("--user-id", type=int, help="Owner for lines that do not set user_id")
+    parser.add_argument("--batch-size", type=int, help="Messages per transaction (default: IMPORT_BATCH_SIZE)")
+    parser.add_argument("--create-tables", action="store_true", help="Create missing tables first")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final report")
+    args = parser.parse_args()
+
+    if args.create_tables:
+        create_tables()
+
+    print(f"📥 Importing {args.path}...")
+    try:
+        stats = await import_jsonl(
+            read_lines(args.path),
+            default_user_id=args.user_id,
+            batch_size=args.batch_size,
+            on_batch=None if args.quiet else print_progress
+        )
+    finally:
+        await async_engine.dispose()
+
+    print(f"\n✅ Imported {stats.conversations:,} conversations and {stats.messages:,} messages "
+          f"in {stats.elapsed_seconds:.1f}s ({stats.rows_per_second:,.0f} rows/s)")
+    if stats.skipped:
+        print(f"⚠️  Skipped {stats.skipped:,} lines:")
+        for error in stats.errors:
+            print(f"   {error}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the chat backend.
+
+By default this starts fake_llm_server.py and the backend (uvicorn) against a
+local SQLite database, creates test users, then drives a weighted mix of
+login, list-conversations, page-messages and send_stream requests at the
+target concurrency. It reports throughput, p50/p95/p99 latency and
+time-to-first-token per endpoint.
+
+Usage:
+    python load_test.py --concurrency 50 --duration 30
+    python load_test.py --mix login=5,list=30,messages=40,stream=25 --llm-ttft 0.5
+    python load_test.py --base-url http://localhost:8000   # use an already running backend
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "Admin123*"
+USER_PASSWORD = "LoadTest123!"
+DEFAULT_MIX = "login=5,list=30,messages=40,stream=25"
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.ttfts: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.elapsed = 0.0
+
+    def record(self, name: str, latency: float, ok: bool, ttft: float | None = None):
+        self.latencies.setdefault(name, []).append(latency)
+        if ttft is not None:
+            self.ttfts.setdefault(name, []).append(ttft)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    unknown = set(weights) - set(ACTIONS)
+    if unknown:
+        raise SystemExit(f"Unknown actions in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+class VirtualUser:
+    def __init__(self, email: str, token: str, conversation_id: int):
+        self.email = email
+        self.token = token
+        self.conversation_id = conversation_id
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+async def request_or_none(request) -> httpx.Response | None:
+    """Await a request, counting transport failures (reset, timeout) as errors instead of aborting the run"""
+    try:
+        return await request
+    except httpx.HTTPError:
+        return None
+
+async def action_login(client: httpx.AsyncClient, user: VirtualUser, stats: Stats):
+    started = time.perf_counter()
+    response = await request_or_none(client.post("/api/auth/login", json={"email": user.email, "password": USER_PASSWORD}))
+    ok = response is not None and response.status_code == 200
+    if ok:
+        user.token = response.json()["access_token"]
+    stats.record("login", time.perf_counter() - started, ok)
+
+async def action_list(client: httpx.AsyncClient, user: VirtualUser, stats: Stats):
+    started = time.perf_counter()
+    response = await request_or_none(client.get("/api/chat/conversations", params={"limit": 20}, headers=user.headers))
+    stats.record("list_conversations", time.perf_counter() - started, response is not None and response.status_code == 200)
+
+async def action_messages(client: httpx.AsyncClient, user: VirtualUser, stats: Stats):
+    started = time.perf_counter()
+    response = await request_or_none(client.get(
+        f"/api/chat/conversations/{user.conversation_id}/messages",
+        params={"limit": 20},
+        headers=user.headers
+    ))
+    stats.record("page_messages", time.perf_counter() - started, response is not None and response.status_code == 200)
+
+async def action_stream(client: httpx.AsyncClient, user: VirtualUser, stats: Stats):
+    started = time.perf_counter()
+    ttft = None
+    ok = False
+    try:
+        async with client.stream(
+            "POST",
+            "/api/chat/send_stream",
+            json={"conversation_id": user.conversation_id, "role": "user", "content": "Explain how connection pooling works"},
+            headers=user.headers
+        ) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: ") and ttft is None:
+                    ttft = time.perf_counter() - started
+                if line == "data: [DONE]":
+                    ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    stats.record("send_stream", time.perf_counter() - started, ok, ttft)
+
+ACTIONS = {
+    "login": action_login,
+    "list": action_list,
+    "messages": action_messages,
+    "stream": action_stream,
+}
+
+async def setup_users(client: httpx.AsyncClient, count: int, seed_turns: int) -> list[VirtualUser]:
+    print(f"👥 Preparing {count} test users...")
+    response = await client.post("/api/auth/setup")
+    response.raise_for_status()
+    response = await client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    response.raise_for_status()
+    admin_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    emails = [f"loadtest_{i}@example.com" for i in range(count)]
+    for i, email in enumerate(emails):
+        await client.post(
+            "/api/users",
+            json={"username": f"loadtest_{i}", "email": email, "password": USER_PASSWORD},
+            headers=admin_headers
+        )
+    ids = {}
+    params = {"limit": 500}
+    while True:
+        response = await client.get("/api/users", params=params, headers=admin_headers)
+        response.raise_for_status()
+        ids.update({user["email"]: user["id"] for user in response.json()})
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["after"] = response.headers["X-Next-Cursor"]
+
+    users = []
+    for email in emails:
+        await client.put(f"/api/users/{ids[email]}/login_permission", json={"is_active": True}, headers=admin_headers)
+        await client.put(f"/api/users/{ids[email]}/can_chat", json={"can_chat": True}, headers=admin_headers)
+        response = await client.post("/api/auth/login", json={"email": email, "password": USER_PASSWORD})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        response = await client.post(
+            "/api/chat/conversations",
+            json={"title": "Load test"},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        response.raise_for_status()
+        users.append(VirtualUser(email, token, response.json()["id"]))
+
+    seed_stats = Stats()
+    for _ in range(seed_turns):
+        await asyncio.gather(*(action_stream(client, user, seed_stats) for user in users))
+    return users
+
+async def run_load(base_url: str, args) -> Stats:
+    mix = parse_mix(args.mix)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        users = await setup_users(client, args.users, args.seed_turns)
+        stats = Stats()
+        deadline = time.perf_counter() + args.duration
+        print(f"🚀 Running {args.concurrency} concurrent workers for {args.duration:.0f}s (mix: {args.mix})")
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                action = ACTIONS[random.choices(names, weights)[0]]
+                await action(client, random.choice(users), stats)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+def print_report(stats: Stats):
+    print("\n📊 Results")
+    header = f"{'endpoint':<20}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttft p50':>10}{'ttft p95':>10}{'ttft p99':>10}"
+    print(header)
+    print("-" * len(header))
+    total = 0
+    for name, latencies in sorted(stats.latencies.items()):
+        total += len(latencies)
+        ttfts = stats.ttfts.get(name, [])
+        ttft_cols = "".join(f"{percentile(ttfts, p) * 1000:>10.1f}" for p in (50, 95, 99)) if ttfts else f"{'-':>10}" * 3
+        print(
+            f"{name:<20}{len(latencies):>9}{stats.errors.get(name, 0):>8}{len(latencies) / stats.elapsed:>9.1f}"
+            + "".join(f"{percentile(latencies, p) * 1000:>9.1f}" for p in (50, 95, 99))
+            + ttft_cols
+        )
+    print("-" * len(header))
+    print(f"Total: {total} requests in {stats.elapsed:.1f}s ({total / stats.elapsed:.1f} req/s)")
+
+def wait_for(url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"❌ Timed out waiting for {url}")
+
+def start_servers(args) -> tuple[str, list[subprocess.Popen]]:
+    output = None if args.verbose else subprocess.DEVNULL
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    fake_llm = subprocess.Popen(
+        [
+            sys.executable, str(BACKEND_DIR / "fake_llm_server.py"),
+            "--port", str(args.llm_port),
+            "--ttft", str(args.llm_ttft),
+            "--tokens-per-second", str(args.llm_tokens_per_second),
+            "--tokens", str(args.llm_tokens),
+        ],
+        stdout=output, stderr=output
+    )
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url,
+        OPENAI_BASE_URL=f"{llm_url}/v1",
+        OPENAI_API_KEY="fake-key",
+        SECRET_KEY="load-test-secret-key",
+        DEBUG="False",
+    )
+    subprocess.run(
+        [sys.executable, "-c", "import app.models; from app.database import create_tables; create_tables()"],
+        cwd=BACKEND_DIR, env=env, check=True
+    )
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=output, stderr=output
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    wait_for(f"{llm_url}/docs")
+    wait_for(f"{base_url}/health")
+    return base_url, [backend, fake_llm]
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the chat backend")
+    parser.add_argument("--base-url", help="Use an already running backend instead of starting one")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent virtual clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run the mix")
+    parser.add_argument("--users", type=int, default=10, help="Test accounts to create")
+    parser.add_argument("--seed-turns", type=int, default=2, help="Chat turns per user before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted action mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=8100, help="Port for the started backend")
+    parser.add_argument("--database-url", default=f"sqlite:///{BACKEND_DIR / 'load_test.db'}")
+    parser.add_argument("--llm-port", type=int, default=9100)
+    parser.add_argument("--llm-ttft", type=float, default=0.3)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--llm-tokens", type=int, default=100)
+    parser.add_argument("--verbose", action="store_true", help="Show server output")
+    args = parser.parse_args()
+
+    processes = []
+    try:
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            print("🔧 Starting fake LLM server and backend...")
+            base_url, processes = start_servers(args)
+        stats = asyncio.run(run_load(base_url, args))
+        print_report(stats)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+if __name__ == "__main__":
+    main()
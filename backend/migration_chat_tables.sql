@@ -36,21 +36,65 @@ CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages(user_id);
 CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at DESC);
 CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp ASC);
 
--- Add trigger to update updated_at timestamp
-CREATE OR REPLACE FUNCTION update_updated_at_column()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at = CURRENT_TIMESTAMP;
-    RETURN NEW;
-END;
-$$ language 'plpgsql';
+-- Cached per-message token counts for the context window builder
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS token_count INTEGER;
+
+-- Composite indexes for keyset (cursor) pagination
+CREATE INDEX IF NOT EXISTS idx_conversations_user_updated_id ON conversations(user_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_timestamp_id ON messages(conversation_id, timestamp, id);
 
--- Create trigger for conversations table
+-- updated_at is maintained by the application (the ORM's onupdate). An earlier version of
+-- this script added a trigger that reset it on every UPDATE, which also moved conversations
+-- that were only archived, so drop it
 DROP TRIGGER IF EXISTS update_conversations_updated_at ON conversations;
-CREATE TRIGGER update_conversations_updated_at
-    BEFORE UPDATE ON conversations
-    FOR EACH ROW
-    EXECUTE FUNCTION update_updated_at_column();
+DROP FUNCTION IF EXISTS update_updated_at_column();
+
+-- Denormalized conversation stats for the sidebar
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_preview VARCHAR(200);
+
+-- Archived conversations are hidden from the default listing
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP WITH TIME ZONE;
+
+-- Backfill the stats from existing messages (updated_at, the sidebar order, is left alone)
+BEGIN;
+UPDATE conversations c
+SET message_count = stats.message_count,
+    last_message_at = stats.last_message_at
+FROM (
+    SELECT conversation_id, COUNT(*) AS message_count, MAX(timestamp) AS last_message_at
+    FROM messages
+    GROUP BY conversation_id
+) stats
+WHERE stats.conversation_id = c.id;
+
+UPDATE conversations c
+SET last_message_preview = CASE
+        WHEN LENGTH(latest.preview) > 200 THEN RTRIM(LEFT(latest.preview, 197)) || '...'
+        ELSE latest.preview
+    END
+FROM (
+    SELECT DISTINCT ON (conversation_id)
+        conversation_id,
+        TRIM(REGEXP_REPLACE(content, '\s+', ' ', 'g')) AS preview
+    FROM messages
+    WHERE content <> ''
+    ORDER BY conversation_id, timestamp DESC, id DESC
+) latest
+WHERE latest.conversation_id = c.id;
+
+COMMIT;
+
+-- Full-text search over message content (generated tsvector column + GIN index)
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED;
+CREATE INDEX IF NOT EXISTS idx_messages_search_vector ON messages USING GIN (search_vector);
+
+-- Keyset pagination and range filters for the admin user listing
+CREATE INDEX IF NOT EXISTS idx_users_created_at_id ON users(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_users_last_login_sort_id
+    ON users((coalesce(last_login_at, '1970-01-01 00:00:00+00:00')), id);
 
 -- Insert some sample data for testing (optional)
 -- INSERT INTO conversations (user_id, title) VALUES 
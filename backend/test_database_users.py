@@ -6,13 +6,13 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app.database import get_db
+from app.database import SessionLocal
 from app.models.user import User
 
 def test_database_users():
     print("Testing database user data...")
     
-    db = next(get_db())
+    db = SessionLocal()
     
     try:
         users = db.query(User).all()
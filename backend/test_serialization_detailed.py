@@ -8,13 +8,13 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.schemas.user import UserResponse
 from app.models.user import User, UserRole
-from app.database import get_db
+from app.database import SessionLocal
 from datetime import datetime, timezone
 
 def test_serialization_detailed():
     print("Testing detailed UserResponse serialization...")
     
-    db = next(get_db())
+    db = SessionLocal()
     
     try:
         # Get a real user from database
@@ -0,0 +1,81 @@
+"""
+Shared fixtures for the backend test suite.
+
+Settings are read from the environment when app.config is imported, so the test
+configuration is set here before anything under app is imported: a throwaway
+SQLite database, the deterministic local LLM backend and cheap password hashing
+on the threadpool.
+"""
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="chat-backend-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    "SECRET_KEY": "test-secret-key",
+    "OPENAI_API_KEY": "sk-test",
+    "LLM_BACKENDS": "local=local://",
+    "PASSWORD_HASH_WORKERS": "0",
+    "PASSWORD_BCRYPT_ROUNDS": "4",
+    "RESPONSE_CACHE_ENABLED": "False",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.database import SessionLocal, create_tables, drop_tables, engine
+from app.main import app
+from app.models.user import User, UserRole
+from app.services.auth_service import auth_service
+from app.services.password_hasher import hash_password
+from app.services.principal_cache import principal_cache
+from app.services.response_cache import response_cache
+from support import PASSWORD
+
+
+@pytest.fixture
+def db():
+    """Empty tables for each test"""
+    drop_tables()
+    with engine.begin() as connection:
+        # Not part of the metadata, so drop_all leaves it (and its stale rows) behind
+        connection.execute(text("DROP TABLE IF EXISTS messages_fts"))
+    create_tables()
+    principal_cache.clear()
+    auth_service.token_cache.clear()
+    response_cache.clear()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def make_user(db):
+    """Create a user directly in the database and return its id"""
+    counter = iter(range(1, 10000))
+
+    def make(role: UserRole = UserRole.USER, is_active: bool = True, can_chat: bool = True, **fields) -> int:
+        n = next(counter)
+        session = SessionLocal()
+        try:
+            user = User(
+                email=fields.pop("email", f"user{n}@example.com"),
+                username=fields.pop("username", f"user{n}"),
+                hashed_password=hash_password(PASSWORD),
+                is_active=is_active,
+                is_verified=True,
+                role=role,
+                can_chat=can_chat,
+                **fields
+            )
+            session.add(user)
+            session.commit()
+            return user.id
+        finally:
+            session.close()
+    return make
+
+
+@pytest.fixture
+def client(db):
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,20 @@
+"""Helpers shared by test modules (fixtures live in conftest.py)"""
+import asyncio
+from app.database import async_engine
+from app.services.auth_service import auth_service
+
+PASSWORD = "Passw0rd!"
+
+
+def run(coro):
+    """Run a coroutine on a fresh event loop, releasing async engine connections bound to it"""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(main())
+
+
+def auth_headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {auth_service.create_access_token({'sub': str(user_id)})}"}
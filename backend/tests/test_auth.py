@@ -0,0 +1,22 @@
+from sqlalchemy import event
+from app.database import async_engine
+from support import PASSWORD
+
+
+def test_login_records_the_time_with_a_single_select(client, make_user):
+    make_user()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/api/auth/login", json={"email": "user1@example.com", "password": PASSWORD})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    user = response.json()["user"]
+    assert user["last_login_at"] is not None and user["updated_at"] == user["last_login_at"]
+    assert statements.count("SELECT") == 1 and statements.count("UPDATE") == 1
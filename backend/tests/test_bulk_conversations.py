@@ -0,0 +1,100 @@
+import datetime as dt
+from pathlib import Path
+import pytest
+from sqlalchemy import func, select
+from app.database import SessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from support import auth_headers
+
+OLD = dt.datetime(2025, 1, 1)
+RECENT = dt.datetime(2026, 6, 1)
+CUTOFF = "2026-01-01T00:00:00"
+
+
+@pytest.fixture
+def owner(make_user):
+    """A user with an old conversation (2 messages), a recent one (1 message) and an old empty one"""
+    user_id = make_user()
+    session = SessionLocal()
+    old = Conversation(user_id=user_id, title="old", message_count=2, last_message_at=OLD, created_at=OLD, updated_at=OLD)
+    recent = Conversation(user_id=user_id, title="recent", message_count=1, last_message_at=RECENT, created_at=OLD, updated_at=RECENT)
+    empty = Conversation(user_id=user_id, title="empty", created_at=OLD, updated_at=OLD)
+    session.add_all([old, recent, empty])
+    session.flush()
+    session.add_all([
+        Message(conversation_id=old.id, user_id=user_id, role="user", content="a"),
+        Message(conversation_id=old.id, user_id=user_id, role="assistant", content="b"),
+        Message(conversation_id=recent.id, user_id=user_id, role="user", content="c"),
+    ])
+    session.commit()
+    ids = {"old": old.id, "recent": recent.id, "empty": empty.id}
+    session.close()
+    return user_id, ids
+
+
+def listed_titles(client, headers, **params) -> set[str]:
+    response = client.get("/api/chat/conversations", params=params, headers=headers)
+    return {conversation["title"] for conversation in response.json()["conversations"]}
+
+
+def test_delete_by_ids_cascades_to_messages(client, owner, make_user):
+    user_id, ids = owner
+    headers = auth_headers(user_id)
+    other_user = make_user()
+
+    response = client.post("/api/chat/conversations/bulk", json={
+        "action": "delete", "ids": [ids["old"], ids["recent"], 99999]
+    }, headers=headers)
+    assert response.json() == {"action": "delete", "conversations": 2, "messages": 3}
+    assert listed_titles(client, headers) == {"empty"}
+    with SessionLocal() as session:
+        assert session.scalar(select(func.count()).select_from(Message)) == 0
+
+    # Another user's ids are never matched
+    response = client.post("/api/chat/conversations/bulk", json={
+        "action": "delete", "ids": [ids["empty"]]
+    }, headers=auth_headers(other_user))
+    assert response.json()["conversations"] == 0
+
+
+def test_older_than_uses_last_activity(client, owner):
+    user_id, ids = owner
+    headers = auth_headers(user_id)
+    # A rename bumps updated_at but is not activity
+    client.put(f"/api/chat/conversations/{ids['old']}", json={"title": "renamed"}, headers=headers)
+
+    response = client.post("/api/chat/conversations/bulk", json={"action": "archive", "older_than": CUTOFF}, headers=headers)
+    assert response.json() == {"action": "archive", "conversations": 2, "messages": 2}
+    assert listed_titles(client, headers) == {"recent"}
+    assert listed_titles(client, headers, archived=True) == {"renamed", "empty"}
+
+    # Archiving did not make them look recent, so the same filter finds them again
+    response = client.post("/api/chat/conversations/bulk", json={"action": "unarchive", "older_than": CUTOFF}, headers=headers)
+    assert response.json()["conversations"] == 2
+    assert listed_titles(client, headers) == {"renamed", "recent", "empty"}
+
+
+def test_archiving_keeps_updated_at(client, owner):
+    user_id, ids = owner
+    with SessionLocal() as session:
+        before = session.get(Conversation, ids["recent"]).updated_at
+    client.post("/api/chat/conversations/bulk", json={"action": "archive", "ids": [ids["recent"]]}, headers=auth_headers(user_id))
+    with SessionLocal() as session:
+        conversation = session.get(Conversation, ids["recent"])
+        assert conversation.archived_at is not None
+        assert conversation.updated_at == before == RECENT
+
+
+def test_a_selector_is_required(client, owner):
+    user_id, _ = owner
+    response = client.post("/api/chat/conversations/bulk", json={"action": "delete"}, headers=auth_headers(user_id))
+    assert response.status_code == 400
+
+
+def test_postgres_migration_leaves_updated_at_to_the_application():
+    # A BEFORE UPDATE trigger resetting updated_at would undo the pinned value on Postgres
+    with open(Path(__file__).parent.parent / "migration_chat_tables.sql") as migration:
+        script = migration.read().upper()
+    assert "CREATE TRIGGER" not in script
+    assert "DROP TRIGGER IF EXISTS UPDATE_CONVERSATIONS_UPDATED_AT ON CONVERSATIONS" in script
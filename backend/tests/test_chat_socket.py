@@ -0,0 +1,125 @@
+import pytest
+from starlette.websockets import WebSocketDisconnect
+from app.services.llm_backends import LLMRouter, LocalBackend
+from app.services.openai_service import openai_service
+from support import auth_headers
+
+
+@pytest.fixture
+def slow_replies(monkeypatch):
+    """Local backend streaming about 200 tokens per second, so a reply can be cancelled mid-way"""
+    router = LLMRouter(first_token_timeout=1, request_timeout=1)
+    router.register(LocalBackend("local", tokens_per_second=200))
+    monkeypatch.setattr(openai_service, "router", router)
+
+
+@pytest.fixture
+def chat(client, make_user):
+    user_id = make_user()
+    headers = auth_headers(user_id)
+    conversation_ids = [client.post("/api/chat/conversations", json={}, headers=headers).json()["id"] for _ in range(3)]
+    return headers, conversation_ids
+
+
+def receive_until_done(ws, conversation_id) -> list[dict]:
+    frames = []
+    while True:
+        frame = ws.receive_json()
+        frames.append(frame)
+        if frame["type"] == "done" and frame["conversation_id"] == conversation_id:
+            return frames
+
+
+def test_authenticates_with_a_first_frame_or_header(client, chat):
+    headers, _ = chat
+    token = headers["Authorization"].split(" ")[1]
+    with client.websocket_connect("/api/chat/ws") as ws:
+        ws.send_json({"type": "auth", "token": token})
+        assert ws.receive_json()["type"] == "ready"
+    with client.websocket_connect("/api/chat/ws", headers=headers) as ws:
+        assert ws.receive_json()["type"] == "ready"
+    with client.websocket_connect("/api/chat/ws") as ws:
+        ws.send_json({"type": "auth", "token": "nope"})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+        assert closed.value.code == 1008
+    with client.websocket_connect("/api/chat/ws") as ws:
+        ws.send_bytes(b'{"type": "auth"}')
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+        assert closed.value.code == 1003
+
+
+def test_bad_frames_get_error_frames_and_keep_the_socket(client, chat):
+    headers, _ = chat
+    with client.websocket_connect("/api/chat/ws", headers=headers) as ws:
+        ws.receive_json()
+        ws.send_text("not json")
+        assert ws.receive_json()["status"] == 400
+        ws.send_bytes(b'{"type": "ping"}')
+        assert ws.receive_json() == {
+            "type": "error", "conversation_id": None, "status": 400, "detail": "Frames must be JSON objects"
+        }
+        ws.send_json({"type": "cancel", "conversation_id": [1]})
+        assert ws.receive_json()["status"] == 422
+        ws.send_json({"type": "send", "conversation_id": "x", "content": "hi"})
+        assert ws.receive_json()["status"] == 422
+        ws.send_json({"type": "bogus"})
+        assert ws.receive_json()["detail"] == "Unknown frame type: bogus"
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+
+
+def test_turn_streams_started_deltas_and_done(client, chat):
+    headers, (conversation_id, *_) = chat
+    with client.websocket_connect("/api/chat/ws", headers=headers) as ws:
+        ws.receive_json()
+        ws.send_json({"type": "send", "conversation_id": conversation_id, "content": "hello socket"})
+        frames = receive_until_done(ws, conversation_id)
+
+    assert frames[0]["type"] == "started"
+    deltas = [frame for frame in frames if frame["type"] == "delta"]
+    assert [frame["seq"] for frame in deltas] == list(range(1, len(deltas) + 1))
+    assert "".join(frame["content"] for frame in deltas) == "Local reply to: hello socket"
+    assert frames[-1]["cancelled"] is False
+    messages = client.get(f"/api/chat/conversations/{conversation_id}/messages", headers=headers).json()["messages"]
+    assert [m["content"] for m in messages] == ["hello socket", "Local reply to: hello socket"]
+
+
+def test_per_socket_limits_and_missing_conversations(client, chat, slow_replies, monkeypatch):
+    headers, (first, second, third) = chat
+    with client.websocket_connect("/api/chat/ws", headers=headers) as ws:
+        ws.receive_json()
+        monkeypatch.setattr("app.services.chat_socket.settings.ws_max_active_generations", 2)
+        long = " ".join(f"w{i}" for i in range(40))
+        ws.send_json({"type": "send", "conversation_id": first, "content": long})
+        ws.send_json({"type": "send", "conversation_id": first, "content": "again"})
+        ws.send_json({"type": "send", "conversation_id": 99999, "content": "x"})
+        errors = {}
+        while len(errors) < 2:
+            frame = ws.receive_json()
+            if frame["type"] == "error":
+                errors[frame["conversation_id"]] = frame["status"]
+        assert errors == {first: 409, 99999: 404}
+        receive_until_done(ws, first)
+
+
+def test_cancel_frame_stops_the_reply_and_keeps_the_partial_text(client, chat, slow_replies):
+    headers, (conversation_id, *_) = chat
+    with client.websocket_connect("/api/chat/ws", headers=headers) as ws:
+        ws.receive_json()
+        ws.send_json({"type": "send", "conversation_id": conversation_id, "content": " ".join(["word"] * 200)})
+        frames = []
+        while True:
+            frame = ws.receive_json()
+            frames.append(frame)
+            if frame["type"] == "delta" and frame["seq"] == 3:
+                ws.send_json({"type": "cancel", "conversation_id": conversation_id})
+            if frame["type"] == "done":
+                break
+
+    assert frames[-1]["cancelled"] is True
+    received = "".join(frame["content"] for frame in frames if frame["type"] == "delta")
+    messages = client.get(f"/api/chat/conversations/{conversation_id}/messages", headers=headers).json()["messages"]
+    assert messages[-1]["content"] == received
+    assert len(received.split()) < 200
@@ -0,0 +1,45 @@
+from app.models.conversation import LAST_MESSAGE_PREVIEW_CHARS, make_preview
+from app.services.llm_backends import LLMRouter, LocalBackend
+from app.services.openai_service import openai_service
+from support import auth_headers
+
+
+def test_make_preview_collapses_whitespace_and_truncates():
+    assert make_preview("  two\n\nlines\there ") == "two lines here"
+    preview = make_preview("word " * 100)
+    assert len(preview) <= LAST_MESSAGE_PREVIEW_CHARS
+    assert len(preview) == LAST_MESSAGE_PREVIEW_CHARS and preview.endswith("...")
+
+
+def test_streamed_turn_updates_count_and_preview(client, make_user):
+    headers = auth_headers(make_user())
+    conversation_id = client.post("/api/chat/conversations", json={}, headers=headers).json()["id"]
+
+    response = client.post("/api/chat/send_stream", json={
+        "conversation_id": conversation_id, "role": "user", "content": "How do   indexes work?"
+    }, headers=headers)
+    assert response.status_code == 200
+
+    conversation = client.get(f"/api/chat/conversations/{conversation_id}", headers=headers).json()
+    assert conversation["message_count"] == 2
+    assert conversation["last_message_preview"] == "Local reply to: How do indexes work?"
+    assert conversation["last_message_at"] is not None
+    messages = client.get(f"/api/chat/conversations/{conversation_id}/messages?page=1", headers=headers).json()
+    assert messages["total"] == 2
+
+
+def test_failed_upstream_call_leaves_only_the_user_message(client, make_user, monkeypatch):
+    router = LLMRouter(first_token_timeout=1, request_timeout=1)
+    router.register(LocalBackend("down", fail=True))
+    monkeypatch.setattr(openai_service, "router", router)
+    headers = auth_headers(make_user())
+    conversation_id = client.post("/api/chat/conversations", json={}, headers=headers).json()["id"]
+
+    response = client.post("/api/chat/send_stream", json={
+        "conversation_id": conversation_id, "role": "user", "content": "anyone there?"
+    }, headers=headers)
+    assert response.status_code == 503
+
+    conversation = client.get(f"/api/chat/conversations/{conversation_id}", headers=headers).json()
+    assert conversation["message_count"] == 1
+    assert conversation["last_message_preview"] == "anyone there?"
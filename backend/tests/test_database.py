@@ -0,0 +1,39 @@
+from sqlalchemy import func, select
+from app.database import AsyncSessionLocal, get_async_database_url, get_pool_options
+from app.models.conversation import Conversation
+from app.models.message import Message
+from support import run
+
+
+def test_async_database_url_uses_async_drivers():
+    assert get_async_database_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+    assert get_async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    # Already async, or a backend without a mapping, is left alone
+    assert get_async_database_url("postgresql+asyncpg://db/app") == "postgresql+asyncpg://db/app"
+    assert get_async_database_url("mysql://db/app") == "mysql://db/app"
+
+
+def test_pool_options_skip_sqlite():
+    assert get_pool_options("sqlite:///./app.db") == {}
+    options = get_pool_options("postgresql://db/app")
+    assert {"pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_pre_ping"} <= options.keys()
+
+
+def test_async_session_cascades_conversation_delete(make_user):
+    user_id = make_user()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            conversation = Conversation(user_id=user_id, title="t")
+            db.add(conversation)
+            await db.flush()
+            db.add_all([
+                Message(conversation_id=conversation.id, user_id=user_id, role="user", content=f"m{i}")
+                for i in range(3)
+            ])
+            await db.commit()
+            await db.delete(conversation)
+            await db.commit()
+            return await db.scalar(select(func.count(Message.id)))
+
+    assert run(scenario()) == 0
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.database import InstrumentedAsyncQueuePool
+from app.models.user import UserRole
+from support import auth_headers
+
+
+def test_instrumented_pool_counts_checkouts_and_timeouts(tmp_path):
+    stats = InstrumentedAsyncQueuePool.stats
+    checkouts, timeouts = stats.checkouts, stats.timeouts
+
+    async def scenario():
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+        )
+        try:
+            async with engine.connect() as held:
+                await held.execute(text("SELECT 1"))
+                with pytest.raises(exc.TimeoutError):
+                    async with engine.connect():
+                        pass
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+    assert stats.checkouts - checkouts == 2
+    assert stats.timeouts - timeouts == 1
+    assert stats.max_wait_seconds >= 0
+
+
+def test_pool_stats_are_admin_only(client, make_user):
+    response = client.get("/api/admin/db_pool_stats", headers=auth_headers(make_user()))
+    assert response.status_code == 403
+
+    response = client.get("/api/admin/db_pool_stats", headers=auth_headers(make_user(role=UserRole.ADMIN)))
+    assert response.status_code == 200
+    assert response.json()["pool_class"]
@@ -0,0 +1,60 @@
+from sqlalchemy import func, select
+from app.database import SessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.user import User, UserRole
+from support import auth_headers
+
+
+def start_conversation(client, headers) -> int:
+    conversation_id = client.post("/api/chat/conversations", json={}, headers=headers).json()["id"]
+    response = client.post("/api/chat/send_stream", json={
+        "conversation_id": conversation_id, "role": "user", "content": "keep this around"
+    }, headers=headers)
+    assert response.status_code == 200
+    return conversation_id
+
+
+def row_counts(user_id: int) -> tuple[int, int, int]:
+    session = SessionLocal()
+    try:
+        return (
+            session.scalar(select(func.count(User.id)).where(User.id == user_id)),
+            session.scalar(select(func.count(Conversation.id)).where(Conversation.user_id == user_id)),
+            session.scalar(select(func.count(Message.id)).where(Message.user_id == user_id)),
+        )
+    finally:
+        session.close()
+
+
+def test_admin_deletes_a_user_with_their_chats(client, make_user):
+    admin = auth_headers(make_user(role=UserRole.ADMIN))
+    user_id = make_user()
+    start_conversation(client, auth_headers(user_id))
+    assert row_counts(user_id) == (1, 1, 2)
+
+    response = client.delete(f"/api/users/{user_id}", headers=admin)
+    assert response.status_code == 200, response.text
+    assert row_counts(user_id) == (0, 0, 0)
+
+
+def test_user_deletes_their_own_profile(client, make_user):
+    user_id = make_user()
+    headers = auth_headers(user_id)
+    start_conversation(client, headers)
+
+    response = client.delete("/api/me", headers=headers)
+    assert response.status_code == 200, response.text
+    assert row_counts(user_id) == (0, 0, 0)
+
+
+def test_deleting_a_conversation_removes_its_messages(client, make_user):
+    user_id = make_user()
+    headers = auth_headers(user_id)
+    conversation_id = start_conversation(client, headers)
+    start_conversation(client, headers)
+
+    response = client.delete(f"/api/chat/conversations/{conversation_id}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert row_counts(user_id) == (1, 1, 2)
+    assert client.get(f"/api/chat/conversations/{conversation_id}", headers=headers).status_code == 404
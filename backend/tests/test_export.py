@@ -0,0 +1,91 @@
+import io
+import json
+import zipfile
+import pytest
+from app.config import settings
+from app.database import SessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.services.export import decode_export_cursor, encode_export_cursor
+from support import auth_headers
+
+
+@pytest.fixture
+def history(make_user, monkeypatch):
+    """A user with a 3-message conversation and an empty one; another user's conversation is never exported"""
+    monkeypatch.setattr(settings, "export_batch_size", 2)
+    owner, stranger = make_user(), make_user()
+    session = SessionLocal()
+    full = Conversation(user_id=owner, title="Full")
+    empty = Conversation(user_id=owner, title="Empty")
+    theirs = Conversation(user_id=stranger, title="Theirs")
+    session.add_all([full, empty, theirs])
+    session.flush()
+    session.add_all([
+        Message(conversation_id=full.id, user_id=owner, role=role, content=f"m{i} – ünïcode")
+        for i, role in enumerate(["user", "assistant", "user"])
+    ] + [Message(conversation_id=theirs.id, user_id=stranger, role="user", content="secret")])
+    session.commit()
+    ids = owner, full.id, empty.id
+    session.close()
+    return ids
+
+
+def export_lines(client, user_id, **params) -> list[dict]:
+    response = client.get("/api/chat/export", params=params, headers=auth_headers(user_id))
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_cursor_round_trip_and_validation():
+    assert decode_export_cursor(encode_export_cursor(12, 0)) == (12, 0)
+    assert decode_export_cursor(encode_export_cursor(3, 456)) == (3, 456)
+    for token in ("garbage", encode_export_cursor(1, 2)[:-2] + "!!"):
+        with pytest.raises(ValueError):
+            decode_export_cursor(token)
+
+
+def test_ndjson_export_lists_conversations_then_their_messages(client, history):
+    owner, full, empty = history
+    lines = export_lines(client, owner)
+    assert [(line["type"], line.get("title") or line.get("content")) for line in lines] == [
+        ("conversation", "Full"),
+        ("message", "m0 – ünïcode"),
+        ("message", "m1 – ünïcode"),
+        ("message", "m2 – ünïcode"),
+        ("conversation", "Empty"),
+    ]
+    assert lines[-1]["id"] == empty
+    assert all(line.get("conversation_id", full) == full for line in lines[:4])
+
+
+def test_ndjson_export_resumes_after_a_cursor(client, history):
+    owner, full, _ = history
+    lines = export_lines(client, owner)
+    resumed = export_lines(client, owner, after=lines[2]["cursor"])
+    # The current conversation line is repeated, then the export carries on
+    assert resumed[0] == lines[0] | {"cursor": encode_export_cursor(full, 0)}
+    assert [line["cursor"] for line in resumed[1:]] == [line["cursor"] for line in lines[3:]]
+    assert export_lines(client, owner, after=lines[-1]["cursor"]) == []
+
+
+def test_zip_export_has_a_file_per_conversation_and_a_manifest(client, history):
+    owner, full, empty = history
+    response = client.get("/api/chat/export", params={"format": "zip"}, headers=auth_headers(owner))
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == sorted([
+        f"conversations/{full}.json", f"conversations/{empty}.json", "manifest.json"
+    ])
+    conversation = json.loads(archive.read(f"conversations/{full}.json"))
+    assert conversation["conversation"]["title"] == "Full"
+    assert [m["content"][:2] for m in conversation["messages"]] == ["m0", "m1", "m2"]
+    assert json.loads(archive.read(f"conversations/{empty}.json"))["messages"] == []
+    manifest = json.loads(archive.read("manifest.json"))
+    assert (manifest["conversations"], manifest["messages"]) == (2, 3)
+    assert manifest["cursor"] == encode_export_cursor(empty, 0)
+
+
+def test_invalid_cursor_is_a_400(client, history):
+    owner, _, _ = history
+    response = client.get("/api/chat/export", params={"after": "garbage"}, headers=auth_headers(owner))
+    assert response.status_code == 400
@@ -0,0 +1,54 @@
+from support import auth_headers
+
+
+def parse_events(body: str) -> list[tuple[int | None, str]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((int(fields["id"]) if "id" in fields else None, fields["data"]))
+    return events
+
+
+def send(client, headers, content="resume me please"):
+    conversation_id = client.post("/api/chat/conversations", json={}, headers=headers).json()["id"]
+    response = client.post("/api/chat/send_stream", json={
+        "conversation_id": conversation_id, "role": "user", "content": content
+    }, headers=headers)
+    assert response.status_code == 200
+    return int(response.headers["X-Message-Id"]), parse_events(response.text)
+
+
+def test_resume_replays_events_after_last_event_id(client, make_user):
+    headers = auth_headers(make_user())
+    message_id, events = send(client, headers)
+    assert events[-1] == (None, "[DONE]")
+    assert [event_id for event_id, _ in events[:-1]] == list(range(1, len(events)))
+
+    resumed = client.get(f"/api/chat/generations/{message_id}/stream", headers={**headers, "Last-Event-ID": "2"})
+    assert resumed.status_code == 200
+    assert parse_events(resumed.text) == events[2:]
+    # Same resume point through the query parameter
+    resumed = client.get(f"/api/chat/generations/{message_id}/stream?after=2", headers=headers)
+    assert parse_events(resumed.text) == events[2:]
+
+
+def test_resume_rejects_unknown_points_and_other_users(client, make_user):
+    headers = auth_headers(make_user())
+    message_id, events = send(client, headers)
+
+    beyond = client.get(f"/api/chat/generations/{message_id}/stream", headers={**headers, "Last-Event-ID": str(len(events))})
+    assert beyond.status_code == 409
+    other = client.get(f"/api/chat/generations/{message_id}/stream", headers=auth_headers(make_user()))
+    assert other.status_code == 404
+    assert client.get("/api/chat/generations/99999/stream", headers=headers).status_code == 404
+
+
+def test_cancel_routes_report_whether_anything_was_stopped(client, make_user):
+    headers = auth_headers(make_user())
+    message_id, _ = send(client, headers)
+
+    response = client.post(f"/api/chat/generations/{message_id}/cancel", headers=headers)
+    assert response.json() == {"message_id": message_id, "cancelled": False}
+    assert client.post(f"/api/chat/generations/{message_id}/cancel", headers=auth_headers(make_user())).status_code == 404
+    response = client.post("/api/chat/conversations/1/cancel", headers=headers)
+    assert response.json() == {"conversation_id": 1, "cancelled": []}
@@ -0,0 +1,177 @@
+import asyncio
+from types import SimpleNamespace
+from app.services.generations import Generation, GenerationRegistry, ResumeGapError
+from app.services.metrics import (
+    RequestQueryStats,
+    current_request_queries,
+    llm_cancelled_tokens_saved_total,
+    llm_generations_cancelled_total,
+)
+from support import run
+
+
+class FakeTurn:
+    """Stands in for ChatTurn: yields tokens at a fixed interval and records how it ended"""
+
+    def __init__(self, tokens: int = 5, interval: float = 0.01):
+        self.tokens = tokens
+        self.interval = interval
+        self.conversation = SimpleNamespace(id=1)
+        self.assistant_message = SimpleNamespace(id=10, token_count=None)
+        self.max_tokens = 100
+        self.sent = 0
+        self.closed = False
+
+    async def stream(self):
+        try:
+            for i in range(self.tokens):
+                await asyncio.sleep(self.interval)
+                self.sent += 1
+                yield f"t{i}"
+        finally:
+            self.closed = True
+            self.assistant_message.token_count = self.sent
+
+
+class FakeSession:
+    async def close(self):
+        pass
+
+
+def start(turn: FakeTurn, **options) -> Generation:
+    generation = Generation(turn, user_id=1, **{"max_events": 100, **options})
+    generation.task = asyncio.create_task(generation.run(FakeSession()))
+    return generation
+
+
+def test_abandon_without_grace_cancels_at_once():
+    async def scenario():
+        turn = FakeTurn(tokens=100)
+        generation = start(turn)
+        generation.abandon()
+        await generation.task
+        return generation, turn
+
+    generation, turn = run(scenario())
+    assert generation.cancel_reason == "disconnect"
+    assert turn.closed and turn.sent < 100
+
+
+def test_abandon_waits_out_the_grace_period_and_a_reader_resets_it():
+    async def scenario():
+        turn = FakeTurn(tokens=30, interval=0.01)
+        generation = start(turn, abandon_grace=0.05)
+        generation.abandon()
+        generation.abandon()  # a second call does not start another timer
+        await asyncio.sleep(0.02)
+        # A reader joining inside the grace period keeps the reply alive to the end
+        events = [content async for _, content in generation.stream()]
+        await generation.task
+        return generation, events
+
+    generation, events = run(scenario())
+    assert generation.cancel_reason is None and generation.done
+    assert events[-1] == "t29"
+
+
+def test_abandon_is_a_no_op_while_someone_reads():
+    async def scenario():
+        turn = FakeTurn(tokens=10)
+        generation = start(turn)
+        reader = generation.stream()
+        await anext(reader)
+        generation.abandon()
+        rest = [content async for _, content in reader]
+        return generation, rest
+
+    generation, rest = run(scenario())
+    assert not generation.cancelled
+    assert len(rest) == 9
+
+
+def test_stream_resumes_after_an_event_id():
+    async def scenario():
+        generation = start(FakeTurn(tokens=6, interval=0))
+        await generation.task
+        return generation, [pair async for pair in generation.stream(after=4)]
+
+    generation, resumed = run(scenario())
+    assert resumed == [(5, "t4"), (6, "t5")]
+    assert generation.readers == 0
+
+
+def test_stream_rejects_resume_points_outside_the_buffer():
+    async def scenario():
+        generation = start(FakeTurn(tokens=6, interval=0), max_events=3)
+        await generation.task
+        errors = []
+        for after in (-1, 7, 2):
+            try:
+                [pair async for pair in generation.stream(after)]
+            except ResumeGapError as e:
+                errors.append(str(e))
+        return generation, errors, [pair async for pair in generation.stream(after=3)]
+
+    generation, errors, replay = run(scenario())
+    assert generation.first_buffered_id == 4
+    assert errors == ["Unknown event id -1", "Unknown event id 7", "Event 3 is no longer buffered"]
+    assert replay == [(4, "t3"), (5, "t4"), (6, "t5")]
+
+
+def test_cancel_keeps_the_partial_reply_and_counts_it_once():
+    cancelled_before = llm_generations_cancelled_total.value(reason="user")
+    saved_before = llm_cancelled_tokens_saved_total.value()
+
+    async def scenario():
+        turn = FakeTurn(tokens=100)
+        generation = start(turn)
+        await asyncio.sleep(0.035)
+        first = generation.cancel("user")
+        second = generation.cancel("shutdown")
+        await generation.task
+        return generation, turn, first, second, generation.cancel("user")
+
+    generation, turn, first, second, after_done = run(scenario())
+    assert (first, second, after_done) == (True, False, False)
+    assert generation.cancel_reason == "user" and generation.done and not generation.failed
+    assert turn.closed and 0 < turn.sent < 100
+    assert llm_generations_cancelled_total.value(reason="user") == cancelled_before + 1
+    assert llm_cancelled_tokens_saved_total.value() == saved_before + 100 - turn.sent
+
+
+def test_registry_lists_and_stops_in_flight_generations():
+    registry = GenerationRegistry(max_entries=10, ttl_seconds=60, max_events=100, abandon_grace=0)
+
+    async def scenario():
+        finished = registry.start(FakeTurn(tokens=1, interval=0), user_id=1, db=FakeSession())
+        await finished.task
+        busy = FakeTurn(tokens=100)
+        busy.assistant_message.id = 11
+        streaming = registry.start(busy, user_id=1, db=FakeSession())
+        in_flight = registry.in_flight(1, user_id=1), registry.in_flight(1, user_id=2)
+        await registry.stop()
+        return finished, streaming, in_flight
+
+    finished, streaming, (mine, theirs) = run(scenario())
+    assert mine == [streaming] and theirs == []
+    assert finished.cancel_reason is None
+    assert streaming.cancel_reason == "shutdown"
+    assert registry.snapshot()["in_flight"] == 0
+
+
+def test_generation_task_does_not_inherit_the_request_query_stats():
+    registry = GenerationRegistry(max_entries=10, ttl_seconds=60, max_events=100, abandon_grace=0)
+    seen = []
+
+    class ObservingTurn(FakeTurn):
+        async def stream(self):
+            seen.append(current_request_queries.get())
+            yield "t0"
+
+    async def scenario():
+        current_request_queries.set(RequestQueryStats())
+        generation = registry.start(ObservingTurn(), user_id=1, db=FakeSession())
+        await generation.task
+
+    run(scenario())
+    assert seen == [None]
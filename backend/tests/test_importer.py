@@ -0,0 +1,82 @@
+import json
+from typing import AsyncIterator
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.user import UserRole
+from app.services.importer import TITLE_MAX_LENGTH, import_jsonl
+from support import auth_headers, run
+
+
+async def lines_of(*records) -> AsyncIterator[str]:
+    for record in records:
+        yield record if isinstance(record, str) else json.dumps(record)
+
+
+def conversation(title="Imported", user_id=None, messages=2) -> dict:
+    record = {
+        "title": title,
+        "created_at": "2025-01-01T00:00:00Z",
+        "messages": [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}",
+             "timestamp": f"2025-01-01T00:00:0{i}Z"}
+            for i in range(messages)
+        ],
+    }
+    if user_id is not None:
+        record["user_id"] = user_id
+    return record
+
+
+def test_import_writes_conversations_with_their_stats(make_user):
+    user_id = make_user()
+    stats = run(import_jsonl(lines_of(conversation(messages=3), "", conversation(title=None, messages=0)),
+                             default_user_id=user_id, batch_size=2))
+    assert (stats.conversations, stats.messages, stats.skipped, stats.errors) == (2, 3, 0, [])
+
+    with SessionLocal() as session:
+        imported = session.scalars(select(Conversation).order_by(Conversation.id)).all()
+        assert [(c.title, c.message_count, c.last_message_preview) for c in imported] == [
+            ("Imported", 3, "message 2"), ("New Chat", 0, None)
+        ]
+        assert session.scalars(select(Message.content).order_by(Message.id)).all() == [
+            "message 0", "message 1", "message 2"
+        ]
+
+
+def test_bad_lines_are_counted_and_reported_without_stopping(make_user):
+    user_id = make_user()
+    stats = run(import_jsonl(lines_of(
+        conversation(),
+        "{not json",
+        {"title": "bad role", "messages": [{"role": "system", "content": "x"}]},
+        conversation(title="x" * (TITLE_MAX_LENGTH + 1)),
+        conversation(user_id=99999),
+        conversation(title="x" * TITLE_MAX_LENGTH),
+    ), default_user_id=user_id, batch_size=100))
+
+    assert (stats.conversations, stats.messages, stats.skipped) == (2, 4, 4)
+    assert [error.split(":")[0] for error in stats.errors] == ["line 2", "line 3", "line 4", "line 5"]
+    assert stats.errors[1].startswith("line 3: messages.0.role")
+    assert stats.errors[2] == f"line 4: title: longer than {TITLE_MAX_LENGTH} characters"
+    assert stats.errors[3] == "line 5: user 99999 does not exist"
+
+
+def test_owner_is_required(make_user):
+    stats = run(import_jsonl(lines_of(conversation()), batch_size=100))
+    assert stats.conversations == 0
+    assert stats.errors == ["line 1: user_id is required when no default user is given"]
+
+
+def test_import_endpoint_is_admin_only_and_streams_the_body(client, make_user):
+    user_id = make_user()
+    body = "\n".join(json.dumps(conversation()) for _ in range(3))
+
+    response = client.post("/api/admin/import/conversations", content=body, headers=auth_headers(user_id))
+    assert response.status_code == 403
+
+    admin = auth_headers(make_user(role=UserRole.ADMIN))
+    response = client.post(f"/api/admin/import/conversations?user_id={user_id}", content=body, headers=admin)
+    assert response.status_code == 200
+    assert (response.json()["conversations"], response.json()["messages"]) == (3, 6)
@@ -0,0 +1,205 @@
+import asyncio
+import time
+import httpx
+import openai
+import pytest
+from app.services.llm_backends import (
+    RETRY_BUDGET_MAX_BALANCE,
+    EndpointHealth,
+    LLMBackend,
+    LLMCircuitOpenError,
+    LLMRouter,
+    LLMUnavailableError,
+    LocalBackend,
+    OpenAICompatibleBackend,
+    RetryBudget,
+    create_backend,
+)
+from support import run
+
+MESSAGES = [{"role": "user", "content": "hello there"}]
+
+
+class BrokenMidStream(LocalBackend):
+    """Sends one token, then drops the connection"""
+
+    async def stream_chat(self, messages, max_tokens, temperature):
+        yield "partial"
+        raise ConnectionError("connection reset")
+
+
+def make_router(*backends, **options) -> LLMRouter:
+    router = LLMRouter(first_token_timeout=1, request_timeout=1, **options)
+    for backend in backends:
+        router.register(backend)
+    return router
+
+
+async def stream_text(router: LLMRouter) -> tuple[str, str]:
+    backend, deltas = await router.stream_chat(MESSAGES, max_tokens=20, temperature=0)
+    return backend.name, "".join([content async for content in deltas])
+
+
+def test_backends_must_implement_the_interface():
+    class Incomplete(LLMBackend):
+        async def complete(self, messages, max_tokens, temperature):
+            return ""
+
+    with pytest.raises(TypeError):
+        Incomplete("partial", "m")
+
+
+def test_create_backend_parses_entries(monkeypatch):
+    local = create_backend("dev", "local://?ttft=0.5&tokens_per_second=20&fail=true")
+    assert isinstance(local, LocalBackend)
+    assert (local.ttft, local.tokens_per_second, local.fail) == (0.5, 20.0, True)
+
+    monkeypatch.setenv("LLM_BACKEND_BACKUP_MODEL", "llama-3")
+    remote = create_backend("backup", "http://10.0.0.5:8000/v1")
+    assert isinstance(remote, OpenAICompatibleBackend)
+    assert (remote.model, remote.base_url) == ("llama-3", "http://10.0.0.5:8000/v1")
+    assert create_backend("openai", "default").base_url is None
+
+
+def test_backend_names_are_unique():
+    router = make_router(LocalBackend("a"))
+    with pytest.raises(ValueError):
+        router.register(LocalBackend("a"))
+
+
+def test_faster_backend_is_tried_first():
+    router = make_router(LocalBackend("slow"), LocalBackend("fast"))
+    router.health["slow"].record_success(0.5)
+    router.health["fast"].record_success(0.05)
+    assert [b.name for b in router.ordered()] == ["fast", "slow"]
+    assert run(stream_text(router))[0] == "fast"
+
+
+def test_slow_first_token_fails_over():
+    router = make_router(LocalBackend("stalled", ttft=5), LocalBackend("up"))
+    router.first_token_timeout = 0.05
+    name, text = run(stream_text(router))
+    assert (name, text) == ("up", "Local reply to: hello there")
+    assert router.health["stalled"].failures == 1
+
+
+def test_mid_stream_failure_is_not_replayed_elsewhere():
+    router = make_router(BrokenMidStream("flaky"), LocalBackend("up"))
+    router.health["up"].record_success(1.0)
+    router.health["flaky"].record_success(0.1)
+
+    with pytest.raises(ConnectionError):
+        run(stream_text(router))
+    assert router.health["flaky"].failures == 1
+    assert router.health["up"].successes == 1
+
+
+def test_complete_fails_over_and_reports_every_failure():
+    router = make_router(LocalBackend("down", fail=True), LocalBackend("up"))
+    assert run(router.complete(MESSAGES, max_tokens=20, temperature=0)) == "Local reply to: hello there"
+
+    router = make_router(LocalBackend("a", fail=True), LocalBackend("b", fail=True))
+    with pytest.raises(LLMUnavailableError, match="a: ConnectionError, b: ConnectionError"):
+        run(router.complete(MESSAGES, max_tokens=20, temperature=0))
+
+
+class FlakyBackend(LocalBackend):
+    """Fails the first `failures` requests with the given error, then answers"""
+
+    def __init__(self, name: str, failures: int, error: Exception):
+        super().__init__(name)
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def complete(self, messages, max_tokens, temperature):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return await super().complete(messages, max_tokens, temperature)
+
+
+def status_error(status_code: int) -> openai.APIStatusError:
+    request = httpx.Request("POST", "http://upstream/v1/chat/completions")
+    return openai.APIStatusError("upstream error", response=httpx.Response(status_code, request=request), body=None)
+
+
+def test_circuit_opens_probes_once_when_half_open_and_closes_or_reopens():
+    health = EndpointHealth(alpha=0.2, failure_threshold=2, cooldown_seconds=60)
+    health.record_failure()
+    assert health.state == "closed"
+    health.record_failure()
+    assert health.state == "open" and not health.allows_request()
+
+    health.unavailable_until = time.monotonic() - 1  # cooldown over
+    assert health.state == "half_open" and health.allows_request()
+    health.probing = True
+    assert not health.allows_request()
+    health.probing = False
+    health.record_failure()
+    assert health.state == "open"
+
+    health.unavailable_until = time.monotonic() - 1
+    health.record_success(0.1)
+    assert health.state == "closed" and health.consecutive_failures == 0
+
+
+def test_router_skips_open_circuits_and_fails_fast_when_all_are_open():
+    router = make_router(LocalBackend("down", fail=True), LocalBackend("up"), failure_threshold=1)
+    router.health["down"].record_success(0.01)
+    router.health["up"].record_success(1.0)
+    run(router.complete(MESSAGES, max_tokens=20, temperature=0))
+    assert router.health["down"].state == "open"
+    assert [b.name for b in router.ordered()] == ["up"]
+
+    router = make_router(LocalBackend("down", fail=True), failure_threshold=1)
+    with pytest.raises(LLMUnavailableError):
+        run(router.complete(MESSAGES, max_tokens=20, temperature=0))
+    with pytest.raises(LLMCircuitOpenError):
+        run(router.complete(MESSAGES, max_tokens=20, temperature=0))
+
+
+def test_retry_budget_allows_a_fraction_of_traffic():
+    budget = RetryBudget(ratio=0.5, min_per_second=0)
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.balance = RETRY_BUDGET_MAX_BALANCE
+    budget.deposit()
+    assert budget.balance == RETRY_BUDGET_MAX_BALANCE
+
+
+def test_openai_errors_are_classified_for_retries():
+    backend = OpenAICompatibleBackend("remote", "gpt", api_key="sk-test")
+    request = httpx.Request("POST", "http://upstream/v1/chat/completions")
+    assert backend.is_retryable(status_error(429))
+    assert backend.is_retryable(status_error(503))
+    assert not backend.is_retryable(status_error(400))
+    assert not backend.is_retryable(status_error(401))
+    assert backend.is_retryable(openai.APIConnectionError(request=request))
+    assert backend.is_retryable(asyncio.TimeoutError())
+    assert not backend.is_retryable(ValueError("bad payload"))
+
+
+def test_router_retries_retryable_failures_within_the_budget():
+    flaky = FlakyBackend("flaky", failures=2, error=ConnectionError("reset"))
+    router = make_router(flaky, max_retries=3, retry_base_delay=0, failure_threshold=10)
+    assert run(router.complete(MESSAGES, max_tokens=20, temperature=0)) == "Local reply to: hello there"
+    assert flaky.calls == 3
+
+    rejected = FlakyBackend("rejected", failures=5, error=ValueError("bad request"))
+    router = make_router(rejected, max_retries=3, retry_base_delay=0, failure_threshold=10)
+    with pytest.raises(LLMUnavailableError):
+        run(router.complete(MESSAGES, max_tokens=20, temperature=0))
+    assert rejected.calls == 1
+
+    broke = FlakyBackend("broke", failures=5, error=ConnectionError("reset"))
+    router = make_router(
+        broke, max_retries=3, retry_base_delay=0, failure_threshold=10,
+        retry_budget=RetryBudget(ratio=0, min_per_second=0.1)
+    )
+    with pytest.raises(LLMUnavailableError):
+        run(router.complete(MESSAGES, max_tokens=20, temperature=0))
+    assert broke.calls == 2
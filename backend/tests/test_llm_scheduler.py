@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from app.services.llm_scheduler import (
+    LANE_ADMIN, LANE_BACKGROUND, LANE_INTERACTIVE, LLMOverloadedError, LLMRateLimitedError, LLMScheduler,
+    TokenBucket, lane_for, parse_lane_weights,
+)
+from app.models.user import UserRole
+from support import run
+
+
+def make_scheduler(**overrides) -> LLMScheduler:
+    options = dict(
+        max_concurrency=1, lane_weights=parse_lane_weights(""), user_burst=100, user_rate=0,
+        max_queued=10, queue_deadlines=dict.fromkeys((LANE_ADMIN, LANE_INTERACTIVE, LANE_BACKGROUND), 1.0)
+    )
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+
+def test_lane_weights_and_lanes():
+    assert parse_lane_weights("admin=4, background=0.5,bogus=9") == {
+        LANE_ADMIN: 4.0, LANE_INTERACTIVE: 1.0, LANE_BACKGROUND: 0.5
+    }
+    assert lane_for(UserRole.ADMIN) == LANE_ADMIN
+    assert lane_for(UserRole.USER) == LANE_INTERACTIVE
+
+
+def test_token_bucket_reserves_ahead_and_refunds():
+    bucket = TokenBucket(capacity=2, rate=10)
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    bucket.refund()
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_over_budget_requests_are_rejected_without_spending_a_token():
+    scheduler = make_scheduler(max_concurrency=10, user_burst=1, user_rate=0.1)
+
+    async def scenario():
+        await scheduler.acquire("alice")
+        with pytest.raises(LLMRateLimitedError) as rejected:
+            await scheduler.acquire("alice")
+        await scheduler.acquire("bob")
+        return rejected.value.retry_after
+
+    assert run(scenario()) == pytest.approx(10, abs=0.1)
+    assert scheduler._buckets["alice"].tokens == pytest.approx(0, abs=0.01)
+
+
+def test_queue_full_and_deadline_rejections_refund_the_token():
+    scheduler = make_scheduler(max_queued=1, user_burst=5, user_rate=0.01, queue_deadlines=dict.fromkeys(
+        (LANE_ADMIN, LANE_INTERACTIVE, LANE_BACKGROUND), 0.05
+    ))
+
+    async def scenario():
+        await scheduler.acquire("holder")
+        queued = asyncio.create_task(scheduler.acquire("alice"))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError):
+            await scheduler.acquire("alice")
+        with pytest.raises(LLMOverloadedError):
+            await queued
+
+    run(scenario())
+    assert scheduler._buckets["alice"].tokens == pytest.approx(5, abs=0.01)
+    assert scheduler.queued == 0 and scheduler.in_flight == 1
+
+
+def test_cancelled_waiter_leaves_the_queue_and_refunds_the_token():
+    scheduler = make_scheduler(user_burst=5, user_rate=0.01)
+
+    async def scenario():
+        await scheduler.acquire("holder")
+        queued = asyncio.create_task(scheduler.acquire("alice"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        scheduler.release()
+
+    run(scenario())
+    assert scheduler._buckets["alice"].tokens == pytest.approx(5, abs=0.01)
+    assert scheduler.queued == 0 and scheduler.in_flight == 0
+
+
+def test_free_slots_go_round_robin_across_users_and_by_lane_weight():
+    scheduler = make_scheduler(lane_weights=parse_lane_weights("admin=3,interactive=1"), max_queued=100)
+    order = []
+
+    async def request(user_id, lane):
+        async with scheduler.slot(user_id, lane):
+            order.append((user_id, lane))
+            await asyncio.sleep(0)
+
+    async def scenario():
+        await scheduler.acquire("holder")
+        tasks = [asyncio.create_task(request("greedy", LANE_INTERACTIVE)) for _ in range(3)]
+        tasks.append(asyncio.create_task(request("polite", LANE_INTERACTIVE)))
+        tasks += [asyncio.create_task(request("root", LANE_ADMIN)) for _ in range(3)]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    run(scenario())
+    assert [lane for _, lane in order[:4]].count(LANE_ADMIN) == 3
+    interactive = [user_id for user_id, lane in order if lane == LANE_INTERACTIVE]
+    assert interactive == ["greedy", "polite", "greedy", "greedy"]
+    assert scheduler.in_flight == 0
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from app.schemas.message import MessageResponse
+from fake_llm_server import create_app
+from load_test import parse_mix, percentile
+
+
+def test_percentile_picks_the_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_parse_mix_rejects_unknown_actions():
+    assert parse_mix("login=5, stream=25") == {"login": 5.0, "stream": 25.0}
+    with pytest.raises(SystemExit):
+        parse_mix("login=5,upload=10")
+
+
+def test_fake_server_streams_openai_chunks():
+    client = TestClient(create_app(ttft=0, tokens_per_second=0, tokens=50))
+    response = client.post("/v1/chat/completions", json={"model": "m", "stream": True, "max_tokens": 3})
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks) == "Sure here is"
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+    title = client.post("/v1/chat/completions", json={"model": "m"}).json()
+    assert title["choices"][0]["message"]["content"] == "Fake Conversation Title"
+
+
+def test_message_response_allows_a_streaming_placeholder():
+    message = MessageResponse(
+        id=1, conversation_id=1, user_id=1, role="assistant", content="", timestamp=datetime.now()
+    )
+    assert message.content == ""
@@ -0,0 +1,56 @@
+from sqlalchemy import select
+from app.database import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.services.message_buffer import MessageWriteBuffer, StreamWriteStats
+from support import run
+
+
+async def stored_content(message_id: int) -> str:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(Message.content).where(Message.id == message_id))
+
+
+def test_buffer_flushes_on_size_and_on_final_flush(make_user):
+    user_id = make_user()
+    stats = StreamWriteStats()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            conversation = Conversation(user_id=user_id)
+            db.add(conversation)
+            await db.flush()
+            message = Message(conversation_id=conversation.id, user_id=user_id, role="assistant", content="")
+            db.add(message)
+            await db.commit()
+            buffer = MessageWriteBuffer(db, message, flush_interval=3600, flush_chars=10, stats=stats)
+            seen = []
+            for delta in ["Hello", " wor", "ld, how", " are", " you"]:
+                await buffer.append(delta)
+                seen.append(await stored_content(message.id))
+            await buffer.flush()
+            return seen, await stored_content(message.id)
+
+    seen, final = run(scenario())
+    # Only the delta that took pending text to 10+ characters caused a write
+    assert seen == ["", "", "Hello world, how", "Hello world, how", "Hello world, how"]
+    assert final == "Hello world, how are you"
+    assert stats.snapshot() == {"deltas": 5, "flushes": 2, "writes_saved": 3}
+
+
+def test_buffer_flushes_when_interval_elapsed(make_user):
+    user_id = make_user()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            conversation = Conversation(user_id=user_id)
+            db.add(conversation)
+            await db.flush()
+            message = Message(conversation_id=conversation.id, user_id=user_id, role="assistant", content="")
+            db.add(message)
+            await db.commit()
+            buffer = MessageWriteBuffer(db, message, flush_interval=0, flush_chars=10_000, stats=StreamWriteStats())
+            await buffer.append("a")
+            return await stored_content(message.id)
+
+    assert run(scenario()) == "a"
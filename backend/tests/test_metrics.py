@@ -0,0 +1,54 @@
+import pytest
+from app.config import settings
+from app.models.user import UserRole
+from app.services.metrics import Counter, Histogram, Metric, MetricsRegistry, http_requests_total
+from support import auth_headers
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("requests_total", "Requests", ("route",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)))
+    requests.inc(route='/a"b')
+    requests.inc(2, route='/a"b')
+    latency.observe(0.05)
+    latency.observe(5)
+
+    text = registry.render()
+    assert 'requests_total{route="/a\\"b"} 3' in text
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+
+
+def test_metrics_must_render_their_samples():
+    class Incomplete(Metric):
+        type_name = "gauge"
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "Never renders")
+
+
+def test_requests_are_counted_by_route_template(client, make_user):
+    headers = auth_headers(make_user())
+    before = http_requests_total.value(method="GET", route="/api/chat/conversations/{conversation_id}", status="404")
+    client.get("/api/chat/conversations/999", headers=headers)
+    after = http_requests_total.value(method="GET", route="/api/chat/conversations/{conversation_id}", status="404")
+    assert after == before + 1
+
+
+def test_metrics_require_an_admin(client, make_user):
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=auth_headers(make_user())).status_code == 403
+
+    response = client.get("/metrics", headers=auth_headers(make_user(role=UserRole.ADMIN)))
+    assert response.status_code == 200
+    assert "# TYPE http_requests_total counter" in response.text
+
+
+def test_metrics_accept_the_scrape_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "scrape-secret")
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
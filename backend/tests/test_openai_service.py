@@ -0,0 +1,81 @@
+import json
+import httpx
+import pytest
+from app.services.llm_backends import LLMRouter, LLMUnavailableError, LocalBackend, OpenAICompatibleBackend
+from app.services.llm_scheduler import LANES, LLMScheduler
+from app.services.openai_service import OpenAIService
+from support import run
+
+MESSAGES = [{"role": "user", "content": "how do indexes work"}]
+
+
+def make_scheduler(**overrides) -> LLMScheduler:
+    options = dict(
+        max_concurrency=4, lane_weights=dict.fromkeys(LANES, 1.0), user_burst=100, user_rate=0,
+        max_queued=10, queue_deadlines=dict.fromkeys(LANES, 1.0)
+    )
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+
+def make_service(*backends, **scheduler_options) -> OpenAIService:
+    router = LLMRouter(first_token_timeout=1, request_timeout=1)
+    for backend in backends:
+        router.register(backend)
+    return OpenAIService(router=router, scheduler=make_scheduler(**scheduler_options))
+
+
+async def collect(deltas) -> list[str]:
+    return [content async for content in deltas]
+
+
+def sse_transport(chunks: list[str | None]) -> httpx.MockTransport:
+    def handler(request):
+        body = "".join(
+            "data: " + json.dumps({
+                "id": "c", "object": "chat.completion.chunk", "created": 0, "model": "m",
+                "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+            }) + "\n\n"
+            for content in chunks
+        ) + "data: [DONE]\n\n"
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body.encode())
+    return httpx.MockTransport(handler)
+
+
+def test_openai_compatible_backend_streams_non_empty_deltas():
+    async def scenario():
+        async with httpx.AsyncClient(transport=sse_transport(["Hel", None, "", "lo"])) as http_client:
+            backend = OpenAICompatibleBackend("o", "m", "sk-test", "http://upstream/v1", http_client=http_client)
+            return await collect(backend.stream_chat(MESSAGES, max_tokens=10, temperature=0))
+
+    assert run(scenario()) == ["Hel", "lo"]
+
+
+def test_stream_chat_completion_yields_deltas_and_releases_slot():
+    service = make_service(LocalBackend("local"))
+
+    async def scenario():
+        deltas = await service.stream_chat_completion(MESSAGES, max_tokens=50)
+        assert service.scheduler.in_flight == 1
+        text = "".join(await collect(deltas))
+        return text, service.scheduler.in_flight
+
+    assert run(scenario()) == ("Local reply to: how do indexes work", 0)
+
+
+def test_stream_chat_completion_fails_over_before_first_token():
+    service = make_service(LocalBackend("down", fail=True), LocalBackend("up"))
+
+    async def scenario():
+        return "".join(await collect(await service.stream_chat_completion(MESSAGES)))
+
+    assert run(scenario()).startswith("Local reply to:")
+    assert service.router.health["down"].failures == 1
+
+
+def test_stream_chat_completion_raises_when_no_backend_answers():
+    service = make_service(LocalBackend("down", fail=True))
+
+    with pytest.raises(LLMUnavailableError):
+        run(service.stream_chat_completion(MESSAGES))
+    assert service.scheduler.in_flight == 0
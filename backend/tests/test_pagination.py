@@ -0,0 +1,112 @@
+import datetime as dt
+import pytest
+from app.database import SessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.services.pagination import decode_cursor, encode_cursor, keyset_requested
+from support import auth_headers
+
+BASE = dt.datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.mark.parametrize("sort_value", [
+    BASE,
+    dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc),
+    42,
+    "alice",
+    "2026-01-01T00:00:00",  # a string that looks like a date stays a string
+])
+def test_cursor_round_trip(sort_value):
+    token = encode_cursor(sort_value, 7)
+    assert "=" not in token
+    assert decode_cursor(token) == (sort_value, 7)
+
+
+@pytest.mark.parametrize("token", ["garbage", "", encode_cursor(1, 1)[:-3], "WzEsMiwieCJd"])
+def test_decode_cursor_rejects_malformed_tokens(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_keyset_only_when_requested():
+    assert not keyset_requested(None, None, None)
+    assert keyset_requested("cursor", None, None)
+    assert keyset_requested(None, "abc", None)
+    assert keyset_requested(None, None, "abc")
+    assert not keyset_requested("offset", "abc", None)
+
+
+@pytest.fixture
+def thread(make_user):
+    """A user with 25 messages in one conversation; timestamps repeat in pairs to exercise the id tiebreak"""
+    user_id = make_user()
+    session = SessionLocal()
+    conversation = Conversation(user_id=user_id, title="t", message_count=25)
+    session.add(conversation)
+    session.flush()
+    session.add_all([
+        Message(conversation_id=conversation.id, user_id=user_id, role="user", content=f"m{i}",
+                timestamp=BASE + dt.timedelta(seconds=i // 2))
+        for i in range(25)
+    ])
+    for i in range(7):
+        session.add(Conversation(user_id=user_id, title=f"c{i}", updated_at=BASE + dt.timedelta(seconds=i // 2)))
+    session.commit()
+    conversation_id = conversation.id
+    session.close()
+    return user_id, conversation_id
+
+
+def test_listings_default_to_offset_pagination(client, thread):
+    user_id, conversation_id = thread
+    headers = auth_headers(user_id)
+
+    body = client.get(f"/api/chat/conversations/{conversation_id}/messages", headers=headers).json()
+    assert (body["page"], body["total"], body["totalPages"], body["hasMore"]) == (1, 25, 3, True)
+    assert [m["content"] for m in body["messages"]] == [f"m{i}" for i in range(10)]
+
+    body = client.get("/api/chat/conversations", headers=headers).json()
+    assert (body["page"], body["total"], body["nextCursor"]) == (1, 8, None)
+
+
+def test_message_cursor_pages_walk_backwards_without_gaps(client, thread):
+    user_id, conversation_id = thread
+    headers = auth_headers(user_id)
+    url = f"/api/chat/conversations/{conversation_id}/messages"
+
+    seen = []
+    params = {"mode": "cursor", "limit": 10}
+    while True:
+        body = client.get(url, params=params, headers=headers).json()
+        assert body["total"] is None
+        seen = [m["content"] for m in body["messages"]] + seen
+        if not body["hasMore"]:
+            break
+        params = {"limit": 10, "before": body["prevCursor"]}
+    assert seen == [f"m{i}" for i in range(25)]
+
+    # Paging forward again from the oldest page
+    body = client.get(url, params={"limit": 5, "after": body["nextCursor"]}, headers=headers).json()
+    assert [m["content"] for m in body["messages"]] == [f"m{i}" for i in range(5, 10)]
+    assert body["hasMore"] is True
+
+
+def test_conversation_cursor_pages_cover_every_conversation_once(client, thread):
+    user_id, _ = thread
+    headers = auth_headers(user_id)
+
+    ids = []
+    params = {"mode": "cursor", "limit": 3}
+    while True:
+        body = client.get("/api/chat/conversations", params=params, headers=headers).json()
+        ids += [c["id"] for c in body["conversations"]]
+        if not body["hasMore"]:
+            break
+        params = {"limit": 3, "after": body["nextCursor"]}
+    assert len(ids) == len(set(ids)) == 8
+
+
+def test_invalid_cursor_is_a_400(client, thread):
+    user_id, conversation_id = thread
+    response = client.get("/api/chat/conversations", params={"before": "garbage"}, headers=auth_headers(user_id))
+    assert response.status_code == 400
@@ -0,0 +1,78 @@
+import asyncio
+import time
+import pytest
+from passlib.context import CryptContext
+from app.database import SessionLocal
+from app.models.user import User
+from app.services import password_hasher as password_hasher_module
+from app.services.password_hasher import (
+    PasswordHasher,
+    PasswordHasherBusyError,
+    hash_password,
+    password_hasher,
+    verify_and_update,
+)
+from support import PASSWORD, run
+
+
+def test_verify_and_update():
+    hashed = hash_password(PASSWORD)
+    assert verify_and_update(PASSWORD, hashed) == (True, None)
+    assert verify_and_update("wrong", hashed) == (False, None)
+    assert verify_and_update(PASSWORD, "not a hash") == (False, None)
+
+    # Same scheme, different cost: verified, and a replacement hash is offered
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(PASSWORD)
+    valid, new_hash = verify_and_update(PASSWORD, outdated)
+    assert valid and new_hash != outdated
+    assert verify_and_update(PASSWORD, new_hash) == (True, None)
+
+
+def test_process_pool_hashes_off_the_event_loop():
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    try:
+        hashed = run(hasher.hash(PASSWORD))
+        assert run(hasher.verify_and_update(PASSWORD, hashed)) == (True, None)
+        assert hasher.snapshot()["mode"] == "process"
+    finally:
+        hasher.stop()
+
+
+def test_operations_beyond_capacity_are_rejected(monkeypatch):
+    def slow_hash(password):
+        time.sleep(0.2)
+        return "hashed"
+    monkeypatch.setattr(password_hasher_module, "hash_password", slow_hash)
+    hasher = PasswordHasher(workers=0, max_pending=1)
+
+    async def scenario():
+        return await asyncio.gather(*(hasher.hash(PASSWORD) for _ in range(3)), return_exceptions=True)
+
+    results = run(scenario())
+    assert results[:2] == ["hashed", "hashed"]
+    assert isinstance(results[2], PasswordHasherBusyError)
+    assert (hasher.completed, hasher.rejected, hasher.in_flight) == (2, 1, 0)
+
+
+def test_login_upgrades_an_outdated_hash(client, make_user):
+    user_id = make_user()
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(PASSWORD)
+    with SessionLocal() as session:
+        session.get(User, user_id).hashed_password = outdated
+        session.commit()
+
+    rehashed = password_hasher.rehashed
+    response = client.post("/api/auth/login", json={"email": "user1@example.com", "password": PASSWORD})
+    assert response.status_code == 200
+    assert password_hasher.rehashed == rehashed + 1
+    with SessionLocal() as session:
+        stored = session.get(User, user_id).hashed_password
+    assert stored != outdated and verify_and_update(PASSWORD, stored) == (True, None)
+
+
+def test_login_sheds_load_when_the_hasher_is_busy(client, make_user, monkeypatch):
+    make_user()
+    monkeypatch.setattr(password_hasher, "capacity", 0)
+    response = client.post("/api/auth/login", json={"email": "user1@example.com", "password": PASSWORD})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,75 @@
+from app.models.user import UserRole
+from app.services import principal_cache as principal_cache_module
+from app.services.principal_cache import Principal, PrincipalCache, principal_cache
+from support import auth_headers
+
+
+def principal(user_id: int, role: UserRole = UserRole.USER) -> Principal:
+    return Principal(id=user_id, role=role, is_active=True, can_chat=True)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principal_cache_module.time, "monotonic", lambda: now[0])
+    cache = PrincipalCache(ttl_seconds=30, max_entries=10)
+    cache.set(principal(1))
+
+    now[0] += 29.9
+    assert cache.get(1) == principal(1)
+    now[0] += 0.1
+    assert cache.get(1) is None
+    assert cache.snapshot()["size"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PrincipalCache(ttl_seconds=30, max_entries=2)
+    cache.set(principal(1))
+    cache.set(principal(2))
+    cache.get(1)
+    cache.set(principal(3))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+
+
+def test_invalidate_and_disabled_cache():
+    cache = PrincipalCache(ttl_seconds=30, max_entries=10)
+    cache.set(principal(1))
+    cache.invalidate(1)
+    cache.invalidate(1)
+    assert cache.get(1) is None
+    assert cache.invalidations == 1
+
+    disabled = PrincipalCache(ttl_seconds=0, max_entries=10)
+    disabled.set(principal(1))
+    assert disabled.get(1) is None
+
+
+def test_requests_reuse_the_cached_principal(client, make_user):
+    user_id = make_user()
+    headers = auth_headers(user_id)
+    assert client.get("/api/chat/conversations", headers=headers).status_code == 200
+    hits = principal_cache.hits
+    assert client.get("/api/chat/conversations", headers=headers).status_code == 200
+    assert principal_cache.hits == hits + 1
+
+
+def test_admin_changes_take_effect_immediately(client, make_user):
+    admin = auth_headers(make_user(role=UserRole.ADMIN))
+    user_id = make_user()
+    headers = auth_headers(user_id)
+    assert client.get("/api/chat/conversations", headers=headers).status_code == 200
+
+    # Role change: the cached principal must not keep the old role
+    assert client.put(f"/api/users/{user_id}/role", json={"role": "admin"}, headers=admin).status_code == 200
+    assert client.get("/api/admin/auth_cache_stats", headers=headers).status_code == 200
+
+    # Deactivation: the next request is rejected even though the principal was cached
+    assert client.put(f"/api/users/{user_id}/login_permission", json={"is_active": False}, headers=admin).status_code == 200
+    assert client.get("/api/chat/conversations", headers=headers).status_code == 401
+
+    # Chat permission: the send path sees the revoked flag
+    client.put(f"/api/users/{user_id}/login_permission", json={"is_active": True}, headers=admin)
+    client.put(f"/api/users/{user_id}/can_chat", json={"can_chat": False}, headers=admin)
+    conversation = client.post("/api/chat/conversations", json={}, headers=headers)
+    assert conversation.status_code == 403
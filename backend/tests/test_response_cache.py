@@ -0,0 +1,68 @@
+from app.services import response_cache as response_cache_module
+from app.services.llm_backends import LocalBackend
+from app.services.response_cache import ResponseCache, response_cache
+from support import run
+from test_openai_service import MESSAGES, collect, make_service
+
+
+def test_entries_expire_and_the_oldest_is_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(enabled=True, ttl_seconds=60, max_entries=2, max_chars=100)
+    cache.set("a", ["x"], 1.0)
+    cache.set("b", ["y"], 1.0)
+    cache.get("a")
+    cache.set("c", ["z"], 1.0)
+    assert cache.get("b") is None
+    assert cache.get("a").chunks == ("x",)
+
+    now[0] += 60
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.snapshot()["size"] == 0
+
+
+def test_oversized_and_empty_replies_are_not_stored():
+    cache = ResponseCache(enabled=True, ttl_seconds=60, max_entries=10, max_chars=5)
+    cache.set("long", ["abc", "def"], 1.0)
+    cache.set("empty", [], 1.0)
+    assert cache.stores == 0
+
+
+def test_a_lookup_over_several_keys_counts_once():
+    cache = ResponseCache(enabled=True, ttl_seconds=60, max_entries=10, max_chars=100)
+    cache.set("b", ["hit"], 2.0)
+    assert cache.get("a", "b").chunks == ("hit",)
+    assert cache.get("a", "c") is None
+    assert (cache.hits, cache.misses, cache.saved_upstream_seconds) == (1, 1, 2.0)
+
+
+def test_key_depends_on_model_and_sampling():
+    key = ResponseCache.make_key(MESSAGES, "m", 100, 0.7)
+    assert key == ResponseCache.make_key([dict(m) for m in MESSAGES], "m", 100, 0.7)
+    assert key != ResponseCache.make_key(MESSAGES, "other", 100, 0.7)
+    assert key != ResponseCache.make_key(MESSAGES, "m", 50, 0.7)
+
+
+def test_replies_are_cached_under_the_model_that_served_them(monkeypatch):
+    monkeypatch.setattr(response_cache, "enabled", True)
+    down = LocalBackend("primary", model="big", fail=True)
+    service = make_service(down, LocalBackend("backup", model="small"))
+
+    async def reply() -> str:
+        return "".join(await collect(await service.stream_chat_completion(MESSAGES, max_tokens=50)))
+
+    run(reply())
+    assert response_cache.get(response_cache.make_key(MESSAGES, "small", 50, 0.7)) is not None
+    assert response_cache.get(response_cache.make_key(MESSAGES, "big", 50, 0.7)) is None
+
+    # Replayed while the backup is still routable
+    hits = response_cache.hits
+    run(reply())
+    assert response_cache.hits == hits + 1
+
+    # A backend set that cannot produce "small" misses
+    other = make_service(LocalBackend("primary", model="big"))
+    service.router = other.router
+    misses = response_cache.misses
+    run(reply())
+    assert response_cache.misses == misses + 1
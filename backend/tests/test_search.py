@@ -0,0 +1,125 @@
+import pytest
+from sqlalchemy import text
+from app.database import AsyncSessionLocal, SessionLocal, engine
+from app.models.conversation import Conversation
+from app.models.message import Message, ensure_search_index
+from app.services.search import like_search, like_snippet, render_snippet, to_fts5_query
+from support import auth_headers, run
+
+CONTENTS = [
+    "Postgres indexes are usually B-trees",
+    "Use a GIN index for full text search in Postgres",
+    "SQLite has FTS5 for full text search",
+    "Unrelated chatter about <b>lunch</b>",
+]
+
+
+@pytest.fixture
+def corpus(make_user):
+    """Two users; the first has two conversations holding CONTENTS, the second one Postgres message"""
+    owner, stranger = make_user(), make_user()
+    session = SessionLocal()
+    first = Conversation(user_id=owner, title="Databases")
+    second = Conversation(user_id=owner, title="Lunch")
+    theirs = Conversation(user_id=stranger, title="Theirs")
+    session.add_all([first, second, theirs])
+    session.flush()
+    session.add_all([
+        Message(conversation_id=first.id if i < 3 else second.id, user_id=owner, role="user", content=content)
+        for i, content in enumerate(CONTENTS)
+    ] + [Message(conversation_id=theirs.id, user_id=stranger, role="user", content="Postgres is great")])
+    session.commit()
+    ids = owner, first.id, second.id
+    session.close()
+    return ids
+
+
+def search(client, user_id, **params) -> dict:
+    response = client.get("/api/chat/search", params=params, headers=auth_headers(user_id))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_query_terms_are_quoted():
+    assert to_fts5_query('full "text" OR search*') == '"full" """text""" "OR" "search*"'
+    assert render_snippet("<b>\x02lunch\x03</b>") == "&lt;b&gt;<mark>lunch</mark>&lt;/b&gt;"
+
+
+def test_search_is_ranked_highlighted_and_scoped_to_the_user(client, corpus):
+    owner, first, _ = corpus
+    body = search(client, owner, q="postgres")
+    assert [r["conversation_id"] for r in body["results"]] == [first, first]
+    assert all("<mark>Postgres</mark>" in r["snippet"] for r in body["results"])
+    assert body["results"][0]["rank"] >= body["results"][1]["rank"]
+
+    # All terms must match
+    body = search(client, owner, q="full text sqlite")
+    assert [r["snippet"] for r in body["results"]] == [
+        "<mark>SQLite</mark> has FTS5 for <mark>full</mark> <mark>text</mark> search"
+    ]
+
+
+def test_search_filters_and_pages(client, corpus):
+    owner, first, second = corpus
+    assert search(client, owner, q="search", conversation_id=second)["results"] == []
+    page = search(client, owner, q="search", limit=1)
+    assert (len(page["results"]), page["hasMore"]) == (1, True)
+    page = search(client, owner, q="search", limit=1, page=2)
+    assert (len(page["results"]), page["hasMore"]) == (1, False)
+    # FTS5 operators in user input are plain words, not syntax errors
+    assert search(client, owner, q='lunch" OR (')["results"] == []
+
+
+def test_index_follows_edits_and_deletes(client, corpus):
+    owner, first, _ = corpus
+    with SessionLocal() as session:
+        message = session.query(Message).filter_by(content=CONTENTS[0]).one()
+        message.content = "Postgres indexes can also be hash indexes"
+        session.commit()
+        assert search(client, owner, q="hash")["results"][0]["message_id"] == message.id
+        assert search(client, owner, q="trees")["results"] == []
+        session.delete(message)
+        session.commit()
+    assert search(client, owner, q="hash")["results"] == []
+
+
+def test_startup_builds_a_missing_index_from_existing_messages(client, corpus):
+    owner, _, _ = corpus
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE messages_fts"))
+        for trigger in ("insert", "delete", "update"):
+            connection.execute(text(f"DROP TRIGGER messages_fts_{trigger}"))
+    with engine.begin() as connection:
+        ensure_search_index(connection)
+    assert len(search(client, owner, q="postgres")["results"]) == 2
+
+    # Running it again on an existing index changes nothing
+    with engine.begin() as connection:
+        ensure_search_index(connection)
+    assert len(search(client, owner, q="postgres")["results"]) == 2
+
+
+def test_like_snippet_marks_every_match_around_the_first():
+    content = "x" * 200 + " Full text search, FULL stop " + "y" * 200
+    snippet = like_snippet(content, ["full", "search"])
+    assert snippet.startswith("...") and snippet.endswith("...")
+    assert render_snippet(snippet).count("<mark>") == 3
+    assert "<mark>Full</mark> text <mark>search</mark>, <mark>FULL</mark>" in render_snippet(snippet)
+    assert like_snippet("short", []) == "short"
+
+
+def test_like_search_matches_every_term_for_databases_without_fts(client, corpus):
+    owner, first, second = corpus
+
+    async def scenario(query, **options):
+        async with AsyncSessionLocal() as db:
+            return await like_search(db, owner, query, limit=10, **options)
+
+    rows = run(scenario("POSTGRES"))
+    assert [row["content"] for row in rows] == [CONTENTS[1], CONTENTS[0]]
+    assert [row["snippet"] for row in run(scenario("full sqlite"))] == [
+        "\x02SQLite\x03 has FTS5 for \x02full\x03 text search"
+    ]
+    assert run(scenario("search", conversation_id=second)) == []
+    # LIKE wildcards in user input match literally
+    assert run(scenario("%")) == []
@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.services.llm_backends import LLMUnavailableError
+from app.services.openai_service import openai_service
+from app.services.title_queue import TitleGenerationQueue
+from support import run
+
+
+@pytest.fixture
+def conversation_id(make_user):
+    user_id = make_user()
+    session = SessionLocal()
+    conversation = Conversation(user_id=user_id, title="New Chat")
+    session.add(conversation)
+    session.flush()
+    session.add_all([
+        Message(conversation_id=conversation.id, user_id=user_id, role="user", content="How do Postgres indexes work?"),
+        Message(conversation_id=conversation.id, user_id=user_id, role="assistant", content="They are B-trees."),
+    ])
+    session.commit()
+    conversation_id = conversation.id
+    session.close()
+    return conversation_id
+
+
+async def stored_title(conversation_id: int) -> str:
+    async with AsyncSessionLocal() as db:
+        return (await db.get(Conversation, conversation_id)).title
+
+
+class FakeTitles:
+    """Stands in for generate_conversation_title: fails `failures` times, then answers"""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, messages, user_id=None):
+        self.calls.append(user_id)
+        await asyncio.sleep(self.delay)
+        if len(self.calls) <= self.failures:
+            raise LLMUnavailableError("down")
+        return "Postgres Index Basics"
+
+
+def make_queue(**options) -> TitleGenerationQueue:
+    return TitleGenerationQueue(**{"workers": 1, "max_size": 10, "max_retries": 2, "retry_delay": 0.001, **options})
+
+
+def test_title_is_generated_and_stored(monkeypatch, conversation_id):
+    titles = FakeTitles()
+    monkeypatch.setattr(openai_service, "generate_conversation_title", titles)
+
+    async def scenario():
+        queue = make_queue()
+        try:
+            title = await queue.enqueue(conversation_id)
+            return title, await stored_title(conversation_id), queue.snapshot()
+        finally:
+            await queue.stop()
+
+    title, stored, snapshot = run(scenario())
+    assert title == stored == "Postgres Index Basics"
+    assert snapshot["completed"] == 1 and snapshot["pending"] == 0
+    assert titles.calls == [1]
+
+
+def test_jobs_for_one_conversation_are_deduplicated(monkeypatch, conversation_id):
+    titles = FakeTitles(delay=0.01)
+    monkeypatch.setattr(openai_service, "generate_conversation_title", titles)
+
+    async def scenario():
+        queue = make_queue()
+        try:
+            first = queue.enqueue(conversation_id)
+            second = queue.enqueue(conversation_id, force=True)
+            assert first is second
+            await first
+            return queue.deduplicated
+        finally:
+            await queue.stop()
+
+    assert run(scenario()) == 1
+    assert len(titles.calls) == 1
+
+
+def test_upstream_failures_are_retried_then_reported(monkeypatch, conversation_id):
+    titles = FakeTitles(failures=5)
+    monkeypatch.setattr(openai_service, "generate_conversation_title", titles)
+
+    async def scenario():
+        queue = make_queue()
+        try:
+            with pytest.raises(LLMUnavailableError):
+                await queue.enqueue(conversation_id)
+            return queue.snapshot()
+        finally:
+            await queue.stop()
+
+    snapshot = run(scenario())
+    assert len(titles.calls) == 3
+    assert (snapshot["retried"], snapshot["failed"]) == (2, 1)
+
+
+def test_a_rename_during_generation_is_kept(monkeypatch, conversation_id):
+    async def slow_title(messages, user_id=None):
+        async with AsyncSessionLocal() as db:
+            (await db.get(Conversation, conversation_id)).title = "Renamed by user"
+            await db.commit()
+        return "Generated"
+    monkeypatch.setattr(openai_service, "generate_conversation_title", slow_title)
+
+    async def scenario():
+        queue = make_queue()
+        try:
+            return await queue.enqueue(conversation_id), await stored_title(conversation_id)
+        finally:
+            await queue.stop()
+
+    assert run(scenario()) == ("Renamed by user", "Renamed by user")
+
+
+def test_full_queue_rejects_new_jobs(monkeypatch, conversation_id):
+    monkeypatch.setattr(openai_service, "generate_conversation_title", FakeTitles(delay=1))
+
+    async def scenario():
+        queue = make_queue(max_size=1)
+        try:
+            assert queue.enqueue(conversation_id) is not None
+            await asyncio.sleep(0.01)  # the worker takes the first job
+            assert queue.enqueue(conversation_id + 1) is not None
+            return queue.enqueue(conversation_id + 2)
+        finally:
+            await queue.stop()
+
+    assert run(scenario()) is None
@@ -0,0 +1,77 @@
+import logging
+import pytest
+from app.config import settings
+from app.services import token_counter
+from app.services.openai_service import OpenAIService
+from app.services.token_counter import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+
+@pytest.fixture
+def fresh_encodings():
+    token_counter._get_encoding.cache_clear()
+    yield
+    token_counter._get_encoding.cache_clear()
+
+
+class FailingTiktoken:
+    def encoding_for_model(self, model):
+        raise RuntimeError("no network")
+
+
+class UnknownModelTiktoken:
+    def __init__(self):
+        self.requested = []
+
+    def encoding_for_model(self, model):
+        raise KeyError(model)
+
+    def get_encoding(self, name):
+        self.requested.append(name)
+        return WordEncoding()
+
+
+class WordEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+def test_count_tokens_defaults_to_the_configured_model(monkeypatch):
+    requested = []
+    monkeypatch.setattr(token_counter, "_get_encoding", lambda model: requested.append(model) or WordEncoding())
+    assert count_tokens("one two three") == 3
+    count_tokens("x", model="other-model")
+    assert requested == [settings.llm_model, "other-model"]
+
+
+def test_unknown_models_use_the_configured_encoding_once(monkeypatch, fresh_encodings):
+    fake = UnknownModelTiktoken()
+    monkeypatch.setattr(token_counter, "tiktoken", fake)
+    assert count_tokens("a b c", model="custom") == 3
+    assert count_tokens("a b", model="custom") == 2
+    assert fake.requested == [settings.tokenizer_encoding]
+
+
+def test_missing_tokenizer_falls_back_to_estimate_and_logs(monkeypatch, fresh_encodings, caplog):
+    monkeypatch.setattr(token_counter, "tiktoken", FailingTiktoken())
+    with caplog.at_level(logging.WARNING, logger=token_counter.__name__):
+        assert count_tokens("x" * 10) == 3
+    assert "estimating tokens" in caplog.text
+    assert count_tokens("") == 0
+
+
+def test_history_keeps_the_newest_messages_that_fit():
+    service = OpenAIService()
+    messages = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}", "token_count": 10}
+        for i in range(10)
+    ]
+    per_message = 10 + MESSAGE_OVERHEAD_TOKENS
+    formatted = service.format_conversation_history(messages, max_tokens=per_message * 3)
+    assert [m["content"] for m in formatted] == ["message 7", "message 8", "message 9"]
+    assert set(formatted[0]) == {"role", "content"}
+
+
+def test_history_always_keeps_the_newest_message():
+    service = OpenAIService()
+    messages = [{"role": "user", "content": "old", "token_count": 1}, {"role": "user", "content": "huge", "token_count": 10_000}]
+    assert service.format_conversation_history(messages, max_tokens=100) == [{"role": "user", "content": "huge"}]
@@ -0,0 +1,53 @@
+from datetime import timedelta
+from app.services import auth_service as auth_service_module
+from app.services.auth_service import AuthService, VerifiedTokenCache
+
+
+def test_entries_expire_with_the_token(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth_service_module.time, "time", lambda: now[0])
+    cache = VerifiedTokenCache(max_entries=10)
+    cache.set("k", {"sub": "1", "exp": 1060})
+
+    assert cache.get("k") == {"sub": "1", "exp": 1060}
+    now[0] = 1060
+    assert cache.get("k") is None
+    assert cache.snapshot()["size"] == 0
+
+
+def test_payloads_without_exp_are_not_cached_and_hits_are_copies():
+    cache = VerifiedTokenCache(max_entries=10)
+    cache.set("no-exp", {"sub": "1"})
+    assert cache.get("no-exp") is None
+
+    cache.set("k", {"sub": "1", "exp": 10**10})
+    cache.get("k")["sub"] = "2"
+    assert cache.get("k")["sub"] == "1"
+
+
+def test_cache_is_bounded():
+    cache = VerifiedTokenCache(max_entries=2)
+    for key in "abc":
+        cache.set(key, {"exp": 10**10})
+    assert cache.get("a") is None
+    assert cache.snapshot()["size"] == 2
+
+
+def test_verify_token_caches_valid_tokens_only():
+    service = AuthService()
+    token = service.create_access_token({"sub": "7"})
+
+    assert service.verify_token(token)["sub"] == "7"
+    assert service.verify_token(token)["sub"] == "7"
+    assert service.token_cache.hits == 1
+
+    assert service.verify_token(token[:-2] + "xx") is None
+    assert service.verify_token("not-a-jwt") is None
+    assert service.token_cache.snapshot()["size"] == 1
+
+
+def test_expired_tokens_are_rejected():
+    service = AuthService()
+    token = service.create_access_token({"sub": "7"}, expires_delta=timedelta(seconds=-1))
+    assert service.verify_token(token) is None
+    assert service.token_cache.snapshot()["size"] == 0
@@ -0,0 +1,65 @@
+import csv
+import io
+from app.models.user import UserRole
+from support import auth_headers
+
+
+def test_listing_is_a_plain_list_of_every_user(client, make_user):
+    admin = make_user(role=UserRole.ADMIN)
+    user_ids = [make_user() for _ in range(3)]
+    response = client.get("/api/users", headers=auth_headers(admin))
+    assert [user["id"] for user in response.json()] == [admin, *user_ids]
+    assert "X-Next-Cursor" not in response.headers
+
+    assert client.get("/api/users", headers=auth_headers(user_ids[0])).status_code == 403
+
+
+def test_filters_and_sort_apply_to_the_list(client, make_user):
+    admin = make_user(role=UserRole.ADMIN, username="zed")
+    inactive = make_user(is_active=False, username="amy")
+    make_user(can_chat=False, username="bob")
+    headers = auth_headers(admin)
+
+    response = client.get("/api/users", params={"is_active": False}, headers=headers)
+    assert [user["id"] for user in response.json()] == [inactive]
+    response = client.get("/api/users", params={"sort": "username", "order": "desc"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["zed", "bob", "amy"]
+
+
+def test_cursor_pages_are_returned_in_headers(client, make_user):
+    admin = make_user(role=UserRole.ADMIN)
+    for _ in range(6):
+        make_user()
+    headers = auth_headers(admin)
+
+    seen, params = [], {"limit": 3, "sort": "username", "order": "desc"}
+    while True:
+        response = client.get("/api/users", params=params, headers=headers)
+        page = [user["id"] for user in response.json()]
+        assert len(page) <= 3
+        seen += page
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["after"] = response.headers["X-Next-Cursor"]
+    assert sorted(seen) == sorted(set(seen)) and len(seen) == 7
+
+    # Walking back from the last page returns the page before it
+    response = client.get("/api/users", params={"limit": 3, "sort": "username", "order": "desc", "before": response.headers["X-Prev-Cursor"]}, headers=headers)
+    assert [user["id"] for user in response.json()] == seen[3:6]
+
+    response = client.get("/api/users", params={"after": "garbage"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_csv_export_escapes_formula_cells(client, make_user):
+    admin = make_user(role=UserRole.ADMIN)
+    make_user(email="=HYPERLINK(1)@example.com", username="mallory")
+    make_user(username="\t=1+1")
+    make_user(username="\r@SUM(A1)")
+    response = client.get("/api/users/export", params={"sort": "id"}, headers=auth_headers(admin))
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["username"] for row in rows] == ["user1", "mallory", "'\t=1+1", "'\r@SUM(A1)"]
+    assert rows[0]["role"] == "admin" and rows[0]["last_login_at"] == ""
+    assert rows[1]["email"] == "'=HYPERLINK(1)@example.com"
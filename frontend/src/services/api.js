@@ -72,6 +72,20 @@ export const sendMessageStream = async (conversationId, message) => {
   return response.body.getReader();
 };
 
+// Resume a dropped reply stream after the last received event id (the SSE "id:" line).
+// The message id comes from the X-Message-Id header of the original send_stream response.
+export const resumeMessageStream = async (messageId, lastEventId = 0) => {
+  const token = getAuthToken();
+  const headers = { 'Last-Event-ID': String(lastEventId) };
+  if (token) {
+    headers.Authorization = `Bearer ${token}`;
+  }
+
+  const response = await fetch(`http://localhost:8000/api/chat/generations/${messageId}/stream`, { headers });
+  if (!response.ok) throw new Error('Resuming stream failed');
+  return response.body.getReader();
+};
+
 // Update the getConversations function to support exclude_ids
 export const getConversations = async (page = 1, limit = 10, excludeIds = []) => {
   try {
@@ -138,10 +152,36 @@ export const deleteConversation = async (conversationId) => {
   }
 };
 
+// action: 'delete' | 'archive' | 'unarchive'; select by ids and/or olderThan (ISO date)
+export const bulkUpdateConversations = async (action, { ids = null, olderThan = null } = {}) => {
+  try {
+    const response = await api.post('/conversations/bulk', {
+      action,
+      ids,
+      older_than: olderThan
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error updating conversations in bulk:', error);
+    throw error;
+  }
+};
+
+// Stop a streaming reply (by its X-Message-Id); the partial reply is kept
+export const cancelMessageStream = async (messageId) => {
+  try {
+    const response = await api.post(`/generations/${messageId}/cancel`);
+    return response.data;
+  } catch (error) {
+    console.error('Error cancelling reply:', error);
+    throw error;
+  }
+};
+
 // Generate automatic title for a conversation
 export const generateConversationTitle = async (conversationId) => {
   try {
-    const response = await api.post(`/conversations/${conversationId}/title`);
+    const response = await api.post(`/conversations/${conversationId}/title`, null, { params: { wait: true } });
     return response.data;
   } catch (error) {
     console.error('Error when generate title', error);